@@ -0,0 +1,54 @@
+"""Article full-text search columns and GIN index
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(table: str):
+    inspector = sa.inspect(op.get_bind())
+    if table not in inspector.get_table_names():
+        return None
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def upgrade() -> None:
+    columns = _columns("articles")
+    if columns is None:
+        # Fresh database: the application creates the table with these columns
+        return
+
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+    if "search_text" not in columns:
+        op.add_column("articles", sa.Column("search_text", sa.Text(), nullable=True))
+    if "search_vector" not in columns:
+        vector_type = postgresql.TSVECTOR() if is_postgres else sa.Text()
+        op.add_column("articles", sa.Column("search_vector", vector_type, nullable=True))
+
+    if is_postgres:
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_articles_search_vector "
+            "ON articles USING gin (search_vector)"
+        )
+    else:
+        op.execute("CREATE INDEX IF NOT EXISTS ix_articles_search_vector ON articles (search_vector)")
+
+    # Existing rows are indexed by scripts/reindex_articles.py
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_articles_search_vector")
+    op.drop_column("articles", "search_vector")
+    op.drop_column("articles", "search_text")
@@ -0,0 +1,60 @@
+"""pg_trgm GIN indexes for list search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+# (table, column) pairs searched with ILIKE '%term%'; see models.trigram_index
+TRIGRAM_COLUMNS = [
+    ("tasks", "title"),
+    ("tasks", "description"),
+    ("users", "full_name"),
+    ("users", "email"),
+    ("users", "username"),
+    ("prompts", "name"),
+    ("prompts", "description"),
+    ("prompts", "content"),
+    ("sources", "name"),
+    ("sources", "url"),
+    ("sources", "category"),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        # The fallback search backend uses plain LIKE; nothing to index
+        return
+
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Build without blocking writes on large tables
+    with op.get_context().autocommit_block():
+        for table, column in TRIGRAM_COLUMNS:
+            if table not in tables:
+                continue
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_trgm "
+                f"ON {table} USING gin ({column} gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    with op.get_context().autocommit_block():
+        for table, column in TRIGRAM_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{column}_trgm")
@@ -0,0 +1,79 @@
+"""Composite and partial indexes for list filters and orderings
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns, partial-index predicate); mirrors __table_args__ in app/models.py
+INDEXES = [
+    ("ix_users_created_at_id", "users", ["created_at", "user_id"], None),
+    ("ix_users_department_id", "users", ["department_id"], None),
+    ("ix_tasks_created_at_id", "tasks", ["created_at", "id"], None),
+    ("ix_tasks_status_created_at", "tasks", ["status", "created_at", "id"], None),
+    ("ix_tasks_assignee_created_at", "tasks", ["assignee_id", "created_at", "id"], None),
+    ("ix_tasks_assignee_status", "tasks", ["assignee_id", "status"], None),
+    ("ix_tasks_department_status", "tasks", ["department_id", "status"], None),
+    ("ix_tasks_open_due_date", "tasks", ["due_date"], "status IN ('todo', 'in_progress')"),
+    ("ix_task_updates_task_created_at", "task_updates", ["task_id", "created_at"], None),
+    ("ix_articles_created_at_id", "articles", ["created_at", "article_id"], None),
+    ("ix_articles_status_created_at", "articles", ["status", "created_at", "article_id"], None),
+    ("ix_articles_created_by_status", "articles", ["created_by_id", "status"], None),
+    ("ix_scan_jobs_created_at_id", "scan_jobs", ["created_at", "scan_id"], None),
+    ("ix_scan_jobs_status_created_at", "scan_jobs", ["status", "created_at", "scan_id"], None),
+    ("ix_prompts_usage_created_at", "prompts", ["usage_count", "created_at", "prompt_id"], None),
+    ("ix_sources_total_scans_created_at", "sources", ["total_scans", "created_at", "source_id"], None),
+    ("ix_audit_logs_timestamp_id", "audit_logs", ["timestamp", "log_id"], None),
+    ("ix_audit_logs_user_timestamp", "audit_logs", ["user_id", "timestamp"], None),
+    ("ix_audit_logs_module_timestamp", "audit_logs", ["module", "timestamp"], None),
+    ("ix_chat_sessions_last_activity_id", "chat_sessions", ["last_activity", "session_id"], None),
+    ("ix_chat_sessions_user_last_activity", "chat_sessions", ["user_id", "last_activity", "session_id"], None),
+    ("ix_chat_sessions_started_at", "chat_sessions", ["started_at"], None),
+    ("ix_chat_messages_session_timestamp", "chat_messages", ["session_id", "timestamp"], None),
+    ("ix_chat_messages_timestamp", "chat_messages", ["timestamp"], None),
+    ("ix_notifications_user_created_at", "notifications", ["user_id", "created_at", "notification_id"], None),
+    ("ix_notifications_user_unread", "notifications", ["user_id", "created_at"], "is_read = false"),
+    ("ix_usage_tracking_created_at_action", "usage_tracking", ["created_at", "action"], None),
+    ("ix_usage_tracking_user_created_at", "usage_tracking", ["user_id", "created_at"], None),
+    ("ix_daily_rollups_entity_day", "daily_rollups", ["entity", "day"], None),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == "postgresql"
+    tables = set(sa.inspect(bind).get_table_names())
+    quote = bind.dialect.identifier_preparer.quote
+
+    # Build without blocking writes on large tables (Postgres)
+    concurrently = "CONCURRENTLY " if is_postgres else ""
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            if table not in tables:
+                # Fresh database: the application creates the table with its indexes
+                continue
+            if where and not is_postgres:
+                where = where.replace("false", "0")
+            op.execute(
+                f"CREATE INDEX {concurrently}IF NOT EXISTS {name} "
+                f"ON {table} ({', '.join(quote(column) for column in columns)})"
+                + (f" WHERE {where}" if where else "")
+            )
+
+
+def downgrade() -> None:
+    concurrently = "CONCURRENTLY " if op.get_bind().dialect.name == "postgresql" else ""
+    with op.get_context().autocommit_block():
+        for name, _, _, _ in INDEXES:
+            op.execute(f"DROP INDEX {concurrently}IF EXISTS {name}")
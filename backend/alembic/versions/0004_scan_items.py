@@ -0,0 +1,51 @@
+"""Scan items table
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if "scan_jobs" not in tables or "scan_items" in tables:
+        # Fresh database: the application creates the table
+        return
+
+    op.create_table(
+        "scan_items",
+        sa.Column("item_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "scan_id", postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("scan_jobs.scan_id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("url", sa.String(1000), nullable=False),
+        sa.Column("title", sa.String(500), nullable=True),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("content_type", sa.String(100), nullable=True),
+        sa.Column("size", sa.Integer(), nullable=True),
+        sa.Column("content_hash", sa.String(64), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("fetched_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_scan_items_scan_fetched_at", "scan_items", ["scan_id", "fetched_at", "item_id"])
+    op.create_index("ix_scan_items_scan_filename", "scan_items", ["scan_id", "filename"], unique=True)
+    op.create_index("ix_scan_items_content_hash", "scan_items", ["content_hash"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scan_items_content_hash", table_name="scan_items")
+    op.drop_index("ix_scan_items_scan_filename", table_name="scan_items")
+    op.drop_index("ix_scan_items_scan_fetched_at", table_name="scan_items")
+    op.drop_table("scan_items")
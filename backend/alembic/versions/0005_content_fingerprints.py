@@ -0,0 +1,63 @@
+"""Content fingerprints for duplicate detection
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    if "scan_items" not in tables:
+        # Fresh database: the application creates the tables
+        return
+
+    if "duplicate_of" not in {column["name"] for column in inspector.get_columns("scan_items")}:
+        op.add_column("scan_items", sa.Column("duplicate_of", sa.String(1000), nullable=True))
+
+    if "content_fingerprints" in tables:
+        return
+    op.create_table(
+        "content_fingerprints",
+        sa.Column("fingerprint_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("url_hash", sa.String(64), nullable=False, unique=True),
+        sa.Column("url", sa.String(1000), nullable=False),
+        sa.Column("simhash", sa.BigInteger(), nullable=True),
+        sa.Column("simhash_band0", sa.Integer(), nullable=True),
+        sa.Column("simhash_band1", sa.Integer(), nullable=True),
+        sa.Column("simhash_band2", sa.Integer(), nullable=True),
+        sa.Column("simhash_band3", sa.Integer(), nullable=True),
+        sa.Column(
+            "article_id", postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("articles.article_id", ondelete="SET NULL"), nullable=True
+        ),
+        sa.Column(
+            "scan_id", postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("scan_jobs.scan_id", ondelete="SET NULL"), nullable=True
+        ),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    for band in range(4):
+        op.create_index(
+            f"ix_content_fingerprints_band{band}", "content_fingerprints", [f"simhash_band{band}"]
+        )
+    op.create_index("ix_content_fingerprints_article_id", "content_fingerprints", ["article_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("content_fingerprints")
+    with op.batch_alter_table("scan_items") as batch_op:
+        batch_op.drop_column("duplicate_of")
@@ -0,0 +1,58 @@
+"""Source.next_scan_at for the auto-scan scheduler
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    is_postgres = bind.dialect.name == "postgresql"
+    inspector = sa.inspect(bind)
+    if "sources" not in inspector.get_table_names():
+        # Fresh database: the application creates the table
+        return
+    if "next_scan_at" in {column["name"] for column in inspector.get_columns("sources")}:
+        return
+
+    # SQLite cannot add a column with a non-constant default
+    op.add_column("sources", sa.Column(
+        "next_scan_at", sa.DateTime(timezone=True),
+        server_default=sa.func.now() if is_postgres else None
+    ))
+
+    # Continue each source's existing schedule; never-scanned sources are due now
+    if is_postgres:
+        op.execute(
+            "UPDATE sources SET next_scan_at = COALESCE(last_scan_at + CASE scan_frequency "
+            "WHEN 'hourly' THEN interval '1 hour' WHEN 'weekly' THEN interval '7 days' "
+            "ELSE interval '1 day' END, now())"
+        )
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_sources_next_scan_at "
+                "ON sources (next_scan_at) WHERE auto_scan AND is_active"
+            )
+    else:
+        op.execute("UPDATE sources SET next_scan_at = CURRENT_TIMESTAMP")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_sources_next_scan_at "
+            "ON sources (next_scan_at) WHERE auto_scan = 1 AND is_active = 1"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_sources_next_scan_at")
+    with op.batch_alter_table("sources") as batch_op:
+        batch_op.drop_column("next_scan_at")
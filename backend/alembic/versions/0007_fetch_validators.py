@@ -0,0 +1,38 @@
+"""HTTP validators for conditional fetching
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if "scan_jobs" not in tables or "fetch_validators" in tables:
+        # Fresh database: the application creates the table
+        return
+
+    op.create_table(
+        "fetch_validators",
+        sa.Column("url_hash", sa.String(64), primary_key=True),
+        sa.Column("url", sa.String(1000), nullable=False),
+        sa.Column("etag", sa.String(255), nullable=True),
+        sa.Column("last_modified", sa.String(64), nullable=True),
+        sa.Column("content_hash", sa.String(64), nullable=True),
+        sa.Column("checked_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("fetch_validators")
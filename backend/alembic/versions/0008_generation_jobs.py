@@ -0,0 +1,62 @@
+"""Generation jobs for the AI article queue
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    if "articles" not in tables or "generation_jobs" in tables:
+        # Fresh database: the application creates the table
+        return
+
+    op.create_table(
+        "generation_jobs",
+        sa.Column("job_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "article_id", postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("articles.article_id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column("created_by_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("idempotency_key", sa.String(255), nullable=True),
+        sa.Column("priority", sa.String(10), nullable=True),
+        sa.Column("status", sa.String(20), nullable=True),
+        sa.Column("stage", sa.String(20), nullable=True),
+        sa.Column("progress", sa.Integer(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("tokens_used", sa.Integer(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("completed_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_generation_jobs_article_created_at", "generation_jobs", ["article_id", "created_at"])
+    op.create_index(
+        "ix_generation_jobs_user_idempotency_key", "generation_jobs",
+        ["created_by_id", "idempotency_key"], unique=True
+    )
+    op.create_index(
+        "ix_generation_jobs_active_article", "generation_jobs", ["article_id"], unique=True,
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+        sqlite_where=sa.text("status IN ('queued', 'running')")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_generation_jobs_active_article", table_name="generation_jobs")
+    op.drop_index("ix_generation_jobs_user_idempotency_key", table_name="generation_jobs")
+    op.drop_index("ix_generation_jobs_article_created_at", table_name="generation_jobs")
+    op.drop_table("generation_jobs")
@@ -0,0 +1,36 @@
+"""Rolling conversation summary on chat sessions
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "chat_sessions" not in inspector.get_table_names():
+        # Fresh database: the application creates the table
+        return
+    if "summary" in {column["name"] for column in inspector.get_columns("chat_sessions")}:
+        return
+
+    op.add_column("chat_sessions", sa.Column("summary", sa.Text(), nullable=True))
+    op.add_column("chat_sessions", sa.Column("summary_through", sa.DateTime(timezone=True), nullable=True))
+    op.add_column("chat_sessions", sa.Column("summary_tokens", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("chat_sessions") as batch_op:
+        batch_op.drop_column("summary_tokens")
+        batch_op.drop_column("summary_through")
+        batch_op.drop_column("summary")
@@ -0,0 +1,32 @@
+"""Retry backoff deadline on generation jobs
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "generation_jobs" not in inspector.get_table_names():
+        # Fresh database: the application creates the table
+        return
+    if "next_attempt_at" in {column["name"] for column in inspector.get_columns("generation_jobs")}:
+        return
+
+    op.add_column("generation_jobs", sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("generation_jobs") as batch_op:
+        batch_op.drop_column("next_attempt_at")
@@ -0,0 +1,55 @@
+from typing import Any, Dict, Iterable, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def count_where(condition: Optional[ColumnElement] = None) -> ColumnElement:
+    """COUNT(*) over the rows matching condition (all rows if None)"""
+    if condition is None:
+        return func.count()
+    return func.count().filter(condition)
+
+
+def sum_where(column, condition: Optional[ColumnElement] = None) -> ColumnElement:
+    """SUM(column) over the rows matching condition, 0 when there are none"""
+    total = func.sum(column)
+    if condition is not None:
+        total = total.filter(condition)
+    return func.coalesce(total, 0)
+
+
+def count_by_value(column, values: Iterable[str]) -> Dict[str, ColumnElement]:
+    """One conditional COUNT per value of column, keyed by the value"""
+    return {value: count_where(column == value) for value in values}
+
+
+def aggregate(query: Query, columns: Dict[str, ColumnElement]) -> Dict[str, Any]:
+    """Evaluate all aggregate columns over the filtered query in a single scan"""
+    row = query.with_entities(
+        *[expression.label(name) for name, expression in columns.items()]
+    ).one()
+    return dict(row._mapping)
+
+
+def aggregate_buckets(
+    query: Query,
+    columns: Dict[str, ColumnElement],
+    groups: Dict[str, Dict[str, ColumnElement]]
+) -> Dict[str, Any]:
+    """Like aggregate, with grouped buckets returned as nested dicts
+
+    ``groups`` maps a result key (e.g. "by_status") to its named buckets; all
+    buckets and plain columns are computed by the same statement.
+    """
+    labelled = dict(columns)
+    for group, buckets in groups.items():
+        for name, expression in buckets.items():
+            labelled[f"{group}__{name}"] = expression
+
+    row = aggregate(query, labelled)
+
+    result = {name: row[name] for name in columns}
+    for group, buckets in groups.items():
+        result[group] = {name: row[f"{group}__{name}"] for name in buckets}
+    return result
@@ -0,0 +1,460 @@
+"""
+AI chat assistant turns, shared by the chat API and the WebSocket channel.
+
+``open_turn`` finds or creates the chat session and stores the user's
+message. ``build_context`` assembles the prompt for it within a token
+budget: the system prompts, the session's rolling summary, as many of the
+newest messages as fit ``CHAT_CONTEXT_TOKENS`` and the question. When
+older messages no longer fit, ``schedule_summary`` folds them into the
+summary (stored on the session) after the reply, so the input of a turn
+stays the same size however long the session grows.
+
+``stream_reply`` yields the reply as events, forwarding each text delta as
+soon as the model produces it:
+
+    chat_start  {session_id}
+    chat_token  {session_id, content}
+    chat_done   {session_id, message_id, content, timestamp, suggestions, quick_actions, tokens_used, ttft_ms}
+    chat_error  {session_id, message_id, error}
+
+The AI message and its ``UsageTracking`` row are written once, when the
+stream ends, with the token counts the API reports. A client that goes
+away mid-reply still gets the partial answer saved. Answers to repeated
+questions come from the response cache (app/response_cache.py) at no
+cost. Without ``OPENAI_API_KEY`` a canned reply is used, so development
+works offline.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+import anyio
+from fastapi import HTTPException
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import get_async_session
+from app.llm import ChatStream, LLMError, complete_chat, llm_configured
+from app.models import ChatMessage, ChatSession, UsageTracking
+from app.response_cache import lookup_chat, store_chat
+from app.tokenizer import TOKENS_PER_MESSAGE, get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = (
+    "Bạn là trợ lý AI của DocNhanh, hệ thống quản lý công việc và nội dung của Báo Công Thương. "
+    "Trả lời ngắn gọn, chính xác bằng tiếng Việt."
+)
+
+SUMMARY_HEADING = "Tóm tắt phần trước của cuộc trò chuyện:"
+
+SUMMARY_PROMPT = (
+    "Tóm tắt cuộc trò chuyện giữa người dùng và trợ lý AI để trợ lý tiếp tục trả lời. "
+    "Giữ lại các sự kiện, con số, tên, yêu cầu và quyết định quan trọng; bỏ lời chào và chi tiết thừa. "
+    "Gộp bản tóm tắt trước (nếu có) với các tin nhắn mới thành một bản tóm tắt duy nhất, viết bằng tiếng Việt."
+)
+
+SUGGESTIONS = ["Bạn có muốn tạo task mới?", "Xem thống kê công việc"]
+QUICK_ACTIONS = [
+    {
+        "label": "Tạo công việc",
+        "action": "create_task",
+        "icon": "plus"
+    }
+]
+
+
+async def open_turn(db, request, user) -> ChatMessage:
+    """Store the user's message in the request's chat session (created if needed)"""
+    session = None
+    if request.session_id:
+        session = await db.get(ChatSession, request.session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        if str(session.user_id) != str(user.user_id):
+            raise HTTPException(status_code=403, detail="Access denied")
+    else:
+        session = ChatSession(
+            user_id=user.user_id,
+            title=request.message[:50] + "..." if len(request.message) > 50 else request.message,
+            page_context=request.page_context
+        )
+        db.add(session)
+        await db.flush()
+
+    turn = ChatMessage(
+        session_id=session.session_id,
+        type="user",
+        content=request.message
+    )
+    db.add(turn)
+    session.last_activity = datetime.utcnow()
+    await db.commit()
+    return turn
+
+
+def _role(message: ChatMessage) -> str:
+    return "assistant" if message.type == "ai" else "user"
+
+
+def _unsummarized_query(session: ChatSession):
+    query = select(ChatMessage).where(ChatMessage.session_id == session.session_id)
+    if session.summary_through is not None:
+        query = query.where(ChatMessage.timestamp > session.summary_through)
+    return query
+
+
+async def _unsummarized(db, session: ChatSession, exclude_id=None, limit: int = None) -> list:
+    """Newest messages of session after its summary (at most CHAT_HISTORY_MAX_MESSAGES), newest first"""
+    query = _unsummarized_query(session)
+    if exclude_id is not None:
+        query = query.where(ChatMessage.message_id != exclude_id)
+    query = query.order_by(ChatMessage.timestamp.desc()).limit(limit or settings.chat_history_max_messages)
+    return list((await db.execute(query)).scalars().all())
+
+
+async def _oldest_unsummarized(db, session: ChatSession, before) -> list:
+    """Oldest messages of session after its summary and before ``before`` (None: no bound), oldest first"""
+    query = _unsummarized_query(session)
+    if before is not None:
+        query = query.where(ChatMessage.timestamp < before)
+    query = query.order_by(ChatMessage.timestamp).limit(settings.chat_history_max_messages)
+    return list((await db.execute(query)).scalars().all())
+
+
+def _fit(rows: list, budget: int) -> int:
+    """How many of rows (newest first) fit in budget tokens"""
+    counts = get_tokenizer().count_batch([row.content for row in rows])
+    used = 0
+    for fitted, count in enumerate(counts):
+        used += count + TOKENS_PER_MESSAGE + 1
+        if used > budget:
+            return fitted
+    return len(rows)
+
+
+async def build_context(db, turn: ChatMessage, context_data: Optional[dict] = None) -> Dict:
+    """Prompt messages for turn, how many history messages they carry and whether the summary needs folding"""
+    session = await db.get(ChatSession, turn.session_id)
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if context_data:
+        context = json.dumps(context_data, ensure_ascii=False, default=str)
+        messages.append({"role": "system", "content": f"Ngữ cảnh trang hiện tại: {context}"})
+
+    budget = settings.chat_context_tokens
+    if session.summary:
+        messages.append({"role": "system", "content": f"{SUMMARY_HEADING}\n{session.summary}"})
+        budget -= session.summary_tokens or get_tokenizer().count(session.summary)
+
+    # One row past the window tells whether older messages exist
+    rows = await _unsummarized(db, session, exclude_id=turn.message_id, limit=settings.chat_history_max_messages + 1)
+    older = len(rows) > settings.chat_history_max_messages
+    rows = rows[:settings.chat_history_max_messages]
+    fitted = _fit(rows, budget)
+    messages.extend({"role": _role(row), "content": row.content} for row in reversed(rows[:fitted]))
+    messages.append({"role": "user", "content": turn.content})
+    return {
+        "messages": messages,
+        "history_messages": fitted,
+        # Older messages were left out (or not read at all): fold them into the summary
+        "summarize": fitted < len(rows) or older,
+    }
+
+
+def _canned_reply() -> str:
+    """Offline reply used when no API key is configured"""
+    responses = [
+        "Tôi hiểu bạn đang hỏi về {}. Để giúp bạn tốt hơn, bạn có thể:",
+        "Dựa trên câu hỏi của bạn về {}, tôi khuyến nghị:",
+        "Để giải quyết vấn đề {}, bạn có thể thử:",
+        "Tôi có thể giúp bạn với {}. Dưới đây là một số gợi ý:"
+    ]
+    response = random.choice(responses).format("hệ thống DocNhanh")
+    return f"{response}\n\n1. Kiểm tra dashboard để xem tổng quan\n2. Tạo task mới nếu cần\n3. Xem báo cáo thống kê\n4. Quản lý nội dung AI"
+
+
+class _TextStream:
+    """ChatStream stand-in that streams a known reply (cached or offline) word by word"""
+
+    prompt_tokens = None
+    completion_tokens = None
+
+    def __init__(self, text: str):
+        self.text = text
+
+    async def __aiter__(self):
+        words = self.text.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+
+
+def _cached_usage(cached: Dict) -> Dict:
+    """Usage of a reply served from the response cache: nothing was charged"""
+    return {
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "counted_by": "cache",
+        "cache": cached["cache"],
+        "tokens_saved": cached["prompt_tokens"] + cached["completion_tokens"],
+    }
+
+
+def _usage(prompt_tokens: Optional[int], completion_tokens: Optional[int], messages: list, content: str) -> Dict:
+    """Token usage of a reply; counted locally when the API did not report it (offline, interrupted)"""
+    if prompt_tokens is not None and completion_tokens is not None:
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "counted_by": "api"}
+    tokenizer = get_tokenizer()
+    return {
+        "prompt_tokens": tokenizer.count_messages(messages),
+        "completion_tokens": tokenizer.count(content),
+        "counted_by": "tokenizer" if tokenizer.exact else "estimate",
+    }
+
+
+async def get_ai_response(messages: list) -> Dict:
+    """Whole AI reply to the prompt messages: content plus token usage"""
+    if not llm_configured():
+        content = _canned_reply()
+        return {"content": content, **_usage(None, None, messages, content)}
+
+    options = {"temperature": settings.chat_temperature}
+    cached = await lookup_chat(messages, settings.ai_model, **options)
+    if cached:
+        return {"content": cached["content"], **_cached_usage(cached)}
+    result = await complete_chat(messages, **options)
+    usage = _usage(result["prompt_tokens"], result["completion_tokens"], messages, result["content"])
+    if result["finish_reason"] == "stop":
+        await store_chat(
+            messages, settings.ai_model, result["content"], usage["prompt_tokens"], usage["completion_tokens"], **options
+        )
+    return {"content": result["content"], **usage}
+
+
+async def save_reply(db, session_id, user_id, content: str, usage: Dict, **details) -> ChatMessage:
+    """Store the AI message and its usage record (details go to the usage metadata)"""
+    ai_message = ChatMessage(
+        session_id=session_id,
+        type="ai",
+        content=content,
+        suggestions=SUGGESTIONS,
+        quick_actions=QUICK_ACTIONS
+    )
+    db.add(ai_message)
+    session = await db.get(ChatSession, session_id)
+    if session is not None:
+        session.last_activity = datetime.utcnow()
+    await db.flush()
+
+    tokens = usage["prompt_tokens"] + usage["completion_tokens"]
+    db.add(UsageTracking(
+        user_id=user_id,
+        action="ai_chat",
+        tokens_used=tokens,
+        cost_usd=round(tokens / 1000 * settings.ai_cost_per_1k_tokens, 6),
+        usage_metadata={
+            "session_id": str(session_id),
+            "message_id": str(ai_message.message_id),
+            "model": settings.ai_model,
+            **usage,
+            **details
+        }
+    ))
+    await db.commit()
+    await db.refresh(ai_message)
+    return ai_message
+
+
+def reply_data(ai_message: ChatMessage) -> Dict:
+    """JSON-ready view of an AI message"""
+    return {
+        "message_id": str(ai_message.message_id),
+        "type": "ai",
+        "content": ai_message.content,
+        "timestamp": ai_message.timestamp.isoformat() if ai_message.timestamp else None,
+        "suggestions": ai_message.suggestions,
+        "quick_actions": ai_message.quick_actions
+    }
+
+
+async def stream_reply(turn: ChatMessage, user_id, context_data: Optional[dict] = None) -> AsyncIterator[Dict]:
+    """Stream the AI reply to turn as chat_* events, saving it when the stream ends"""
+    session_id = turn.session_id
+    yield {"event": "chat_start", "data": {"session_id": str(session_id)}}
+    async with get_async_session() as db:
+        context = await build_context(db, turn, context_data)
+    messages = context["messages"]
+    options = {"temperature": settings.chat_temperature}
+    cached = None
+    if llm_configured():
+        cached = await lookup_chat(messages, settings.ai_model, **options)
+    if cached:
+        stream = _TextStream(cached["content"])
+    elif llm_configured():
+        stream = ChatStream(messages, **options)
+    else:
+        stream = _TextStream(_canned_reply())
+
+    started = time.perf_counter()
+    ttft_ms = None
+    parts = []
+    completed = False
+    error = None
+    ai_message = None
+    try:
+        async for delta in stream:
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - started) * 1000)
+            parts.append(delta)
+            yield {"event": "chat_token", "data": {"session_id": str(session_id), "content": delta}}
+        completed = True
+    except LLMError as e:
+        logger.warning("Chat reply for session %s failed: %s", session_id, e)
+        error = str(e)
+    finally:
+        # Also runs when the client disconnects; the save must not be cancelled with it
+        content = "".join(parts)
+        if content:
+            with anyio.CancelScope(shield=True):
+                if cached:
+                    usage = _cached_usage(cached)
+                else:
+                    usage = _usage(stream.prompt_tokens, stream.completion_tokens, messages, content)
+                async with get_async_session() as db:
+                    ai_message = await save_reply(
+                        db, session_id, user_id, content, usage,
+                        streamed=True,
+                        ttft_ms=ttft_ms,
+                        duration_ms=round((time.perf_counter() - started) * 1000),
+                        interrupted=not completed,
+                        history_messages=context["history_messages"]
+                    )
+
+    if error:
+        yield {"event": "chat_error", "data": {
+            "session_id": str(session_id),
+            "message_id": str(ai_message.message_id) if ai_message else None,
+            "error": "AI service is unavailable, please try again"
+        }}
+        return
+    if ai_message is None:
+        yield {"event": "chat_error", "data": {"session_id": str(session_id), "message_id": None, "error": "Empty response from the AI model"}}
+        return
+    yield {"event": "chat_done", "data": {
+        "session_id": str(session_id),
+        **reply_data(ai_message),
+        "tokens_used": usage["prompt_tokens"] + usage["completion_tokens"],
+        "ttft_ms": ttft_ms
+    }}
+    # After chat_done, so the client does not wait for the cache write
+    if isinstance(stream, ChatStream) and stream.finish_reason == "stop":
+        await store_chat(
+            messages, settings.ai_model, content, usage["prompt_tokens"], usage["completion_tokens"], **options
+        )
+    if context["summarize"]:
+        schedule_summary(session_id)
+
+
+_summaries: Dict[str, asyncio.Task] = {}
+
+
+def schedule_summary(session_id):
+    """Refresh the session's summary in the background (one refresh per session at a time)"""
+    key = str(session_id)
+    if not llm_configured() or key in _summaries:
+        return
+    task = asyncio.create_task(_refresh_logged(session_id))
+    _summaries[key] = task
+    task.add_done_callback(lambda _: _summaries.pop(key, None))
+
+
+async def _refresh_logged(session_id):
+    try:
+        await refresh_summary(session_id)
+    except LLMError as e:
+        logger.warning("Summary of chat session %s failed: %s", session_id, e)
+    except Exception:
+        logger.exception("Summary of chat session %s failed", session_id)
+
+
+async def refresh_summary(session_id) -> bool:
+    """Fold the messages outside the newest half of CHAT_CONTEXT_TOKENS into the session summary
+
+    Keeping half the budget verbatim leaves room for new turns, so a
+    session is summarized once per half budget of conversation, not on
+    every turn. Messages are folded oldest first, at most
+    CHAT_HISTORY_MAX_MESSAGES per refresh. No database connection is held
+    while the model writes the summary. Returns whether a new summary was
+    stored.
+    """
+    tokenizer = get_tokenizer()
+    async with get_async_session() as db:
+        session = await db.get(ChatSession, session_id)
+        if session is None:
+            return False
+        newest = await _unsummarized(db, session)
+        kept = _fit(newest, settings.chat_context_tokens // 2)
+        if kept == len(newest) < settings.chat_history_max_messages:
+            # Everything unsummarized fits in the verbatim half
+            return False
+        # Everything older than the oldest message kept verbatim
+        folded = await _oldest_unsummarized(db, session, newest[kept - 1].timestamp if kept else None)
+        user_id, previous_summary, summary_through = session.user_id, session.summary, session.summary_through
+        transcript_rows = [(row.type, row.content) for row in folded]
+        folded_through = folded[-1].timestamp if folded else None
+    if not folded:
+        return False
+
+    message_limit = settings.chat_context_tokens // 2
+    transcript = "\n\n".join(
+        f"{'Trợ lý' if kind == 'ai' else 'Người dùng'}: {tokenizer.truncate(content, message_limit)}"
+        for kind, content in transcript_rows
+    )
+    request = f"Bản tóm tắt trước:\n{previous_summary}\n\nTin nhắn mới:\n{transcript}" if previous_summary \
+        else f"Tin nhắn:\n{transcript}"
+    model = settings.chat_summary_model or settings.ai_model
+    result = await complete_chat(
+        [{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": request}],
+        model=model,
+        temperature=0.2,
+        max_tokens=settings.chat_summary_max_tokens
+    )
+    summary = result["content"].strip()
+    if not summary:
+        return False
+
+    async with get_async_session() as db:
+        # Another process may have folded the same messages meanwhile
+        previous = ChatSession.summary_through.is_(None) if summary_through is None \
+            else ChatSession.summary_through == summary_through
+        stored = await db.execute(
+            update(ChatSession)
+            .where(ChatSession.session_id == session_id, previous)
+            .values(summary=summary, summary_through=folded_through, summary_tokens=tokenizer.count(summary))
+        )
+        if stored.rowcount == 0:
+            await db.rollback()
+            return False
+
+        prompt_tokens = result["prompt_tokens"] or 0
+        completion_tokens = result["completion_tokens"] or 0
+        tokens = prompt_tokens + completion_tokens
+        db.add(UsageTracking(
+            user_id=user_id,
+            action="ai_chat_summary",
+            tokens_used=tokens,
+            cost_usd=round(tokens / 1000 * settings.ai_cost_per_1k_tokens, 6),
+            usage_metadata={
+                "session_id": str(session_id),
+                "model": model,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "messages_folded": len(folded)
+            }
+        ))
+        await db.commit()
+        return True
@@ -4,11 +4,15 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy import DateTime
 from app.config import settings
 from app.database import get_db
 from app.models import User
 from app.schemas import UserResponse
+from app.cache import create_cache
+import uuid
+from functools import lru_cache
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -16,6 +20,9 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # JWT token scheme
 security = HTTPBearer()
 
+# Authenticated user rows keyed by user_id, so most requests skip the users SELECT
+user_cache = create_cache("auth_user", settings.user_cache_ttl_seconds, settings.user_cache_backend)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -69,7 +76,7 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user = db.query(User).filter(User.user_id == user_id).first()
+    user = get_cached_user(user_id, db)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -86,63 +93,146 @@ def get_current_user(
     return user
 
 
+# Never cached; loaded from the database if a request actually needs it
+USER_CACHE_EXCLUDED = {"password_hash"}
+
+
+def _user_to_cache(user: User) -> dict:
+    """Column values of a user as JSON-compatible dict"""
+    data = {}
+    for column in User.__table__.columns:
+        if column.key in USER_CACHE_EXCLUDED:
+            continue
+        value = getattr(user, column.key)
+        if isinstance(value, (uuid.UUID, datetime)):
+            value = value.isoformat() if isinstance(value, datetime) else str(value)
+        data[column.key] = value
+    return data
+
+
+def _user_from_cache(data: dict) -> User:
+    """Rebuild a detached User from cached column values"""
+    values = {}
+    for column in User.__table__.columns:
+        if column.key not in data:
+            continue
+        value = data[column.key]
+        if value is not None:
+            if isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif column.type.python_type is uuid.UUID:
+                value = uuid.UUID(value)
+        values[column.key] = value
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+def get_cached_user(user_id: str, db: Session) -> Optional[User]:
+    """Load user by ID through the user cache
+
+    Cached rows are merged into ``db`` without a SELECT, so relationships
+    (e.g. ``user.department``) still lazy-load from the request session.
+    """
+    cached = user_cache.get(str(user_id))
+    if cached is not None:
+        return db.merge(_user_from_cache(cached), load=False)
+    
+    user = db.query(User).filter(User.user_id == user_id).first()
+    if user is not None:
+        user_cache.set(str(user_id), _user_to_cache(user))
+    return user
+
+
+def invalidate_cached_user(user_id) -> None:
+    """Drop a user from the cache after it is updated or deleted"""
+    user_cache.delete(str(user_id))
+
+
+# Permission rules: module -> action -> roles granted (ANY_ROLE grants everyone).
+# Actions not listed for a module are denied.
+ANY_ROLE = "*"
+PERMISSION_ACTIONS = ("view", "create", "edit", "delete", "assign", "approve", "export")
+PERMISSION_RULES = {
+    "giao-viec": {
+        "view": ANY_ROLE,
+        "create": ("editor_in_chief", "department_head", "admin"),
+        "edit": ("editor_in_chief", "department_head", "admin"),
+        "delete": ("editor_in_chief", "admin"),
+        "assign": ("editor_in_chief", "department_head", "admin"),
+        "approve": ("editor_in_chief", "department_head", "admin"),
+        "export": ANY_ROLE
+    },
+    "noi-dung-ai": {
+        "view": ANY_ROLE,
+        "create": ("editor_in_chief", "department_head", "reporter", "admin"),
+        "edit": ("editor_in_chief", "department_head", "reporter", "admin"),
+        "delete": ("editor_in_chief", "admin"),
+        "assign": ("editor_in_chief", "department_head", "admin"),
+        "approve": ("editor_in_chief", "admin"),
+        "export": ANY_ROLE
+    },
+    "nhan-su": {
+        "view": ("editor_in_chief", "admin"),
+        "create": ("editor_in_chief", "admin"),
+        "edit": ("editor_in_chief", "admin"),
+        "delete": ("editor_in_chief", "admin"),
+        "export": ("editor_in_chief", "admin")
+    },
+    "quan-tri": {
+        "view": ("editor_in_chief", "admin"),
+        "create": ("editor_in_chief", "admin"),
+        "edit": ("editor_in_chief", "admin"),
+        "delete": ("editor_in_chief", "admin"),
+        "export": ("editor_in_chief", "admin")
+    },
+    "bao-cao": {
+        "view": ("editor_in_chief", "department_head", "admin"),
+        "export": ("editor_in_chief", "department_head", "admin")
+    }
+}
+
+
+def _compile_permission_rules():
+    """Flatten PERMISSION_RULES into frozen lookup sets"""
+    public_grants = set()
+    role_grants = set()
+    for module, actions in PERMISSION_RULES.items():
+        for action, roles in actions.items():
+            if roles == ANY_ROLE:
+                public_grants.add((module, action))
+            else:
+                role_grants.update((role, module, action) for role in roles)
+    return frozenset(public_grants), frozenset(role_grants)
+
+
+# Compiled once at import: (module, action) granted to everyone, and (role, module, action) grants
+_PUBLIC_GRANTS, _ROLE_GRANTS = _compile_permission_rules()
+
+
+def has_permission(role: str, module: str, action: str) -> bool:
+    """O(1) permission check against the compiled rule tables"""
+    return (module, action) in _PUBLIC_GRANTS or (role, module, action) in _ROLE_GRANTS
+
+
+@lru_cache(maxsize=None)
+def _role_permission_table(role: str) -> tuple:
+    """Frozen module -> action -> bool table for a role"""
+    return tuple(
+        (module, tuple((action, has_permission(role, module, action)) for action in PERMISSION_ACTIONS))
+        for module in PERMISSION_RULES
+    )
+
+
 def get_user_permissions(user: User) -> dict:
     """Get user permissions based on role"""
-    permissions = {
-        "giao-viec": {
-            "view": True,
-            "create": user.role in ["editor_in_chief", "department_head", "admin"],
-            "edit": user.role in ["editor_in_chief", "department_head", "admin"],
-            "delete": user.role in ["editor_in_chief", "admin"],
-            "assign": user.role in ["editor_in_chief", "department_head", "admin"],
-            "approve": user.role in ["editor_in_chief", "department_head", "admin"],
-            "export": True
-        },
-        "noi-dung-ai": {
-            "view": True,
-            "create": user.role in ["editor_in_chief", "department_head", "reporter", "admin"],
-            "edit": user.role in ["editor_in_chief", "department_head", "reporter", "admin"],
-            "delete": user.role in ["editor_in_chief", "admin"],
-            "assign": user.role in ["editor_in_chief", "department_head", "admin"],
-            "approve": user.role in ["editor_in_chief", "admin"],
-            "export": True
-        },
-        "nhan-su": {
-            "view": user.role in ["editor_in_chief", "admin"],
-            "create": user.role in ["editor_in_chief", "admin"],
-            "edit": user.role in ["editor_in_chief", "admin"],
-            "delete": user.role in ["editor_in_chief", "admin"],
-            "assign": False,
-            "approve": False,
-            "export": user.role in ["editor_in_chief", "admin"]
-        },
-        "quan-tri": {
-            "view": user.role in ["editor_in_chief", "admin"],
-            "create": user.role in ["editor_in_chief", "admin"],
-            "edit": user.role in ["editor_in_chief", "admin"],
-            "delete": user.role in ["editor_in_chief", "admin"],
-            "assign": False,
-            "approve": False,
-            "export": user.role in ["editor_in_chief", "admin"]
-        },
-        "bao-cao": {
-            "view": user.role in ["editor_in_chief", "department_head", "admin"],
-            "create": False,
-            "edit": False,
-            "delete": False,
-            "assign": False,
-            "approve": False,
-            "export": user.role in ["editor_in_chief", "department_head", "admin"]
-        }
-    }
-    return permissions
+    return {module: dict(actions) for module, actions in _role_permission_table(user.role)}
 
 
 def require_permission(module: str, action: str):
     """Decorator to check user permissions"""
     def permission_checker(current_user: User = Depends(get_current_user)):
-        permissions = get_user_permissions(current_user)
-        if not permissions.get(module, {}).get(action, False):
+        if not has_permission(current_user.role, module, action):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"Permission denied: {module}:{action}"
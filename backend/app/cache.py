@@ -0,0 +1,199 @@
+"""
+Small key/value caches with per-entry TTL.
+
+``MemoryCache`` lives in the worker process; ``DiskCache`` is a SQLite file
+under ``settings.upload_dir``/cache, kept across restarts and shared by the
+processes of one host; ``RedisCache`` is shared by all workers through
+``settings.redis_url``. All store JSON-compatible values and expose the same
+get/set/delete API, so callers pick a backend from settings with
+``create_cache``.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Optional
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCache:
+    """In-process LRU cache with TTL"""
+
+    def __init__(self, namespace: str, ttl_seconds: int, max_entries: int = 10000):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """SQLite-backed cache with TTL and LRU eviction; errors degrade to cache misses"""
+
+    def __init__(self, namespace: str, ttl_seconds: int, max_entries: int = 10000, path: Optional[str] = None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = path or os.path.join(settings.upload_dir, "cache", f"{namespace}.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            # WAL lets readers in other processes proceed during a write
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_used_at ON entries (used_at)")
+
+    @contextmanager
+    def _connect(self):
+        # A connection per call: cheap for SQLite and safe across threads and processes
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[1] < now:
+                    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning("Disk cache get failed: %s", e)
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now + ttl, now)
+                )
+                conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+                excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    conn.execute(
+                        "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used_at LIMIT ?)",
+                        (excess,)
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Disk cache set failed: %s", e)
+
+    def delete(self, key: str):
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            logger.warning("Disk cache delete failed: %s", e)
+
+    def clear(self):
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM entries")
+        except sqlite3.Error as e:
+            logger.warning("Disk cache clear failed: %s", e)
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class RedisCache:
+    """Redis-backed cache with TTL; errors degrade to cache misses"""
+
+    def __init__(self, namespace: str, ttl_seconds: int, redis_url: Optional[str] = None):
+        import redis
+
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._client = redis.Redis.from_url(redis_url or settings.redis_url)
+
+    def _key(self, key: str) -> str:
+        return f"docnhanh:{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self._client.get(self._key(key))
+        except Exception as e:
+            logger.warning("Redis cache get failed: %s", e)
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        try:
+            self._client.set(self._key(key), json.dumps(value), ex=ttl)
+        except Exception as e:
+            logger.warning("Redis cache set failed: %s", e)
+
+    def delete(self, key: str):
+        try:
+            self._client.delete(self._key(key))
+        except Exception as e:
+            logger.warning("Redis cache delete failed: %s", e)
+
+    def clear(self):
+        try:
+            keys = list(self._client.scan_iter(match=self._key("*")))
+            if keys:
+                self._client.delete(*keys)
+        except Exception as e:
+            logger.warning("Redis cache clear failed: %s", e)
+
+
+def create_cache(namespace: str, ttl_seconds: int, backend: str = "memory", max_entries: int = 10000):
+    """Create a cache for the configured backend ("memory", "disk" or "redis")"""
+    if backend == "redis":
+        return RedisCache(namespace, ttl_seconds)
+    if backend == "disk":
+        return DiskCache(namespace, ttl_seconds, max_entries=max_entries)
+    return MemoryCache(namespace, ttl_seconds, max_entries=max_entries)
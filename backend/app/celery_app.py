@@ -0,0 +1,52 @@
+"""
+Celery application for background AI work.
+
+The broker and result backend are ``settings.redis_url``. Generation tasks
+go to one of three priority lanes (queues) and workers consume them in
+strict order, so a backlog of bulk ("low") jobs never delays an editor
+waiting on a "high" one:
+
+    celery -A app.celery_app:celery_app worker -Q generation.high,generation.default,generation.low
+
+Bulk jobs from scans go to the batch lane, generated together through the
+dispatcher (app/dispatcher.py). Its in-flight caps are per process, so the
+lane gets exactly one worker process:
+
+    celery -A app.celery_app:celery_app worker -Q generation.batch --concurrency 1
+
+Tasks are acknowledged after they finish and workers prefetch one task at
+a time: a worker that dies mid-generation leaves its task to be redelivered,
+and long LLM calls do not hold queued tasks hostage on a busy worker.
+"""
+
+from celery import Celery
+from app.config import settings
+
+PRIORITY_QUEUES = {
+    "high": "generation.high",
+    "default": "generation.default",
+    "low": "generation.low",
+}
+BATCH_QUEUE = "generation.batch"
+
+celery_app = Celery("docnhanh", broker=settings.redis_url, backend=settings.redis_url, include=["app.generation"])
+
+celery_app.conf.update(
+    task_default_queue=PRIORITY_QUEUES["default"],
+    task_serializer="json",
+    accept_content=["json"],
+    result_serializer="json",
+    result_expires=24 * 3600,
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    task_time_limit=settings.generation_task_timeout_seconds + 60,
+    task_soft_time_limit=settings.generation_task_timeout_seconds,
+    broker_connection_retry_on_startup=True,
+    broker_transport_options={
+        # Poll queues in the order given to -Q instead of round robin
+        "queue_order_strategy": "priority",
+        # Unacknowledged tasks are redelivered after this long; must exceed the task time limit
+        "visibility_timeout": settings.generation_task_timeout_seconds * 2 + 60,
+    },
+)
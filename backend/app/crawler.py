@@ -0,0 +1,292 @@
+"""
+Shared HTTP layer for fetching source sites.
+
+``Crawler`` is used by the scan worker and the source test endpoint:
+
+- one httpx client (connection pool) per host, kept alive between
+  requests and using HTTP/2 when the ``h2`` package is installed, so many
+  sources on one host share a few connections and a slow host cannot use
+  up the connections of the others;
+- a token bucket per domain (``CRAWLER_REQUESTS_PER_SECOND`` with bursts of
+  ``CRAWLER_BURST``), slowed further by a robots.txt ``Crawl-delay``;
+- robots.txt fetched once per origin and cached for
+  ``CRAWLER_ROBOTS_TTL_SECONDS``;
+- retries of timeouts, connection errors, 429 and 502-504 with exponential
+  backoff and full jitter, honouring ``Retry-After``.
+
+Limits are per process: each API or scan worker process has its own
+buckets.
+"""
+
+import asyncio
+import logging
+import random
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 30
+MAX_RETRY_AFTER_SECONDS = 60
+# Host clients kept open at once; the least recently used is closed
+MAX_HOST_CLIENTS = 256
+# A robots.txt that could not be fetched (5xx, network) is retried sooner
+ROBOTS_ERROR_TTL_SECONDS = 300
+
+
+class FetchError(Exception):
+    """A page could not be fetched"""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RobotsDisallowed(FetchError):
+    """robots.txt does not allow fetching a URL"""
+
+
+def _domain(host: str) -> str:
+    return host[4:] if host.startswith("www.") else host
+
+
+@lru_cache(maxsize=1)
+def _http2_enabled() -> bool:
+    if not settings.crawler_http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP/2 disabled: install httpx[http2] to enable it")
+        return False
+    return True
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), MAX_RETRY_AFTER_SECONDS)
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, `burst` at once"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def slow_down(self, rate: float):
+        if rate < self.rate:
+            self.rate = rate
+            self.capacity = 1
+            self.tokens = min(self.tokens, 1)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Crawler:
+    """Polite, retrying HTTP fetcher; use as ``async with Crawler() as crawler``"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport = None, respect_robots: bool = None):
+        self.transport = transport
+        self.respect_robots = settings.crawler_respect_robots if respect_robots is None else respect_robots
+        self.http2 = _http2_enabled() if transport is None else False
+        self.agent = settings.scan_user_agent.split("/")[0]
+        self._clients: "OrderedDict[str, httpx.AsyncClient]" = OrderedDict()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._robots: Dict[str, tuple] = {}
+        self._robots_locks: Dict[str, asyncio.Lock] = {}
+
+    async def __aenter__(self) -> "Crawler":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*[client.aclose() for client in clients], return_exceptions=True)
+
+    def _client(self, origin: str) -> httpx.AsyncClient:
+        client = self._clients.get(origin)
+        if client is not None:
+            self._clients.move_to_end(origin)
+            return client
+
+        per_host = settings.crawler_connections_per_host
+        client = httpx.AsyncClient(
+            http2=self.http2,
+            transport=self.transport,
+            timeout=settings.scan_request_timeout_seconds,
+            follow_redirects=True,
+            headers={"User-Agent": settings.scan_user_agent},
+            limits=httpx.Limits(max_connections=per_host, max_keepalive_connections=per_host),
+        )
+        self._clients[origin] = client
+        if len(self._clients) > MAX_HOST_CLIENTS:
+            _, evicted = self._clients.popitem(last=False)
+            asyncio.ensure_future(evicted.aclose())
+        return client
+
+    def _bucket(self, domain: str) -> TokenBucket:
+        bucket = self._buckets.get(domain)
+        if bucket is None:
+            bucket = TokenBucket(settings.crawler_requests_per_second, settings.crawler_burst)
+            self._buckets[domain] = bucket
+        return bucket
+
+    async def _robots_for(self, origin: str, domain: str) -> Optional[RobotFileParser]:
+        """Parsed robots.txt of origin (None: everything allowed)"""
+        cached = self._robots.get(origin)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        lock = self._robots_locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            cached = self._robots.get(origin)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+
+            ttl = settings.crawler_robots_ttl_seconds
+            parser = RobotFileParser()
+            try:
+                await self._bucket(domain).acquire()
+                response = await self._client(origin).get(f"{origin}/robots.txt")
+                if response.status_code >= 500:
+                    # RFC 9309: an unreachable robots.txt means nothing may be crawled
+                    parser.disallow_all = True
+                    ttl = ROBOTS_ERROR_TTL_SECONDS
+                elif response.status_code >= 400:
+                    parser = None
+                else:
+                    parser.parse(response.text.splitlines())
+            except httpx.HTTPError:
+                parser.disallow_all = True
+                ttl = ROBOTS_ERROR_TTL_SECONDS
+
+            if parser is not None:
+                delay = parser.crawl_delay(self.agent)
+                if delay:
+                    self._bucket(domain).slow_down(1 / float(delay))
+            self._robots[origin] = (time.monotonic() + ttl, parser)
+            return parser
+
+    async def allowed(self, url: str) -> bool:
+        """Whether robots.txt allows fetching url"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        parser = await self._robots_for(origin, _domain((parts.hostname or "").lower()))
+        return parser is None or parser.can_fetch(self.agent, url)
+
+    async def fetch(self, url: str, headers: Dict = None, max_bytes: int = None) -> Dict:
+        """GET url, reading at most max_bytes of the body (empty for 304 Not Modified)"""
+        max_bytes = max_bytes or settings.scan_max_page_bytes
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise FetchError(f"{url}: not an http(s) URL")
+        origin = f"{parts.scheme}://{parts.netloc}"
+        domain = _domain(parts.hostname.lower())
+
+        if self.respect_robots and not await self.allowed(url):
+            raise RobotsDisallowed(f"{url}: disallowed by robots.txt")
+
+        client = self._client(origin)
+        bucket = self._bucket(domain)
+        attempts = settings.crawler_max_retries + 1
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            await bucket.acquire()
+            delay = None
+            try:
+                async with client.stream("GET", url, headers=headers) as response:
+                    if response.status_code in RETRY_STATUSES and not last_attempt:
+                        delay = _retry_after(response)
+                        if delay is None:
+                            delay = self._backoff(attempt)
+                    elif response.status_code >= 400:
+                        raise FetchError(f"{url}: HTTP {response.status_code}", response.status_code)
+                    else:
+                        return await self._read(response, max_bytes)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if last_attempt:
+                    raise FetchError(f"{url}: {type(e).__name__} {e}".strip())
+                delay = self._backoff(attempt)
+            except httpx.HTTPError as e:
+                raise FetchError(f"{url}: {type(e).__name__} {e}".strip())
+            logger.debug("Retrying %s in %.1fs", url, delay)
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spread retries of many clients over the whole window
+        return random.uniform(0, min(MAX_BACKOFF_SECONDS, settings.crawler_retry_backoff_seconds * 2 ** attempt))
+
+    async def _read(self, response: httpx.Response, max_bytes: int) -> Dict:
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                break
+        return {
+            "url": str(response.url),
+            "status_code": response.status_code,
+            "content_type": response.headers.get("content-type", ""),
+            "encoding": response.encoding or "utf-8",
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "http_version": response.http_version,
+            "body": b"".join(chunks)[:max_bytes],
+            "truncated": size >= max_bytes,
+        }
+
+
+# One crawler per event loop: httpx clients cannot be shared between loops
+_crawlers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Crawler]" = weakref.WeakKeyDictionary()
+
+
+def get_crawler() -> Crawler:
+    """Crawler of the running event loop (created on first use)"""
+    loop = asyncio.get_running_loop()
+    if loop not in _crawlers:
+        _crawlers[loop] = Crawler()
+    return _crawlers[loop]
+
+
+async def close_crawler():
+    """Close the running loop's crawler, if any (application shutdown)"""
+    crawler = _crawlers.pop(asyncio.get_running_loop(), None)
+    if crawler is not None:
+        await crawler.aclose()
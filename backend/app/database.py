@@ -1,6 +1,10 @@
-from sqlalchemy import create_engine, MetaData
+import threading
+import time
+import uuid
+from sqlalchemy import create_engine, event, MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 from app.config import settings
 
 # Database engine
@@ -10,7 +14,115 @@ if "supabase.co" in db_url and "sslmode=" not in db_url:
     separator = "&" if "?" in db_url else "?"
     db_url = f"{db_url}{separator}sslmode=require"
 
-engine = create_engine(db_url)
+
+class PoolMetrics:
+    """Connection pool counters and checkout wait-time histogram"""
+
+    # Upper bounds (ms) of the wait-time histogram buckets
+    WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.connects = 0
+            self.invalidated = 0
+            self.wait_count = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.wait_histogram = [0] * (len(self.WAIT_BUCKETS_MS) + 1)
+
+    def record_wait(self, waited_ms: float):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total_ms += waited_ms
+            self.wait_max_ms = max(self.wait_max_ms, waited_ms)
+            for index, bound in enumerate(self.WAIT_BUCKETS_MS):
+                if waited_ms <= bound:
+                    self.wait_histogram[index] += 1
+                    break
+            else:
+                self.wait_histogram[-1] += 1
+
+    def snapshot(self, pool) -> dict:
+        """Current pool state plus accumulated counters"""
+        state = {"pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            state.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+
+        with self._lock:
+            histogram = {
+                f"le_{bound}ms": count
+                for bound, count in zip(self.WAIT_BUCKETS_MS, self.wait_histogram)
+            }
+            histogram["gt_{}ms".format(self.WAIT_BUCKETS_MS[-1])] = self.wait_histogram[-1]
+            state.update(
+                checkouts=self.checkouts,
+                connects=self.connects,
+                invalidated=self.invalidated,
+                wait_ms={
+                    "count": self.wait_count,
+                    "avg": round(self.wait_total_ms / self.wait_count, 3) if self.wait_count else 0.0,
+                    "max": round(self.wait_max_ms, 3),
+                    "histogram": histogram,
+                },
+            )
+        return state
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait((time.perf_counter() - started) * 1000)
+
+
+def get_engine_options(url: str) -> dict:
+    """Build create_engine keyword arguments from settings"""
+    if not url.startswith("postgresql"):
+        return {}
+
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+
+    if settings.db_pool_mode == "transaction":
+        # PgBouncer/Supavisor transaction pooling: the bouncer owns the pool,
+        # so connections are not held between checkouts and session-level
+        # state (server-side prepared statements, SET) is not relied upon.
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+
+    if settings.db_statement_timeout_ms and settings.db_pool_mode != "transaction":
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={settings.db_statement_timeout_ms}"
+        }
+
+    return options
+
+
+engine = create_engine(db_url, **get_engine_options(db_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base class for models
@@ -20,6 +132,42 @@ Base = declarative_base()
 metadata = MetaData()
 
 
+def _set_statement_timeout(connection):
+    # Startup options are not forwarded by transaction poolers, so scope the
+    # timeout to each transaction instead
+    connection.exec_driver_sql(
+        f"SET LOCAL statement_timeout = {int(settings.db_statement_timeout_ms)}"
+    )
+
+
+if db_url.startswith("postgresql") and settings.db_statement_timeout_ms \
+        and settings.db_pool_mode == "transaction":
+    event.listen(engine, "begin", _set_statement_timeout)
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    with pool_metrics._lock:
+        pool_metrics.connects += 1
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    with pool_metrics._lock:
+        pool_metrics.checkouts += 1
+
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    with pool_metrics._lock:
+        pool_metrics.invalidated += 1
+
+
+def get_pool_status() -> dict:
+    """Pool metrics for the application engine"""
+    return pool_metrics.snapshot(engine.pool)
+
+
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
@@ -27,3 +175,79 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async engine, created on first use so sync-only processes never import asyncpg
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_url(url: str) -> str:
+    """Map the configured database URL to its asyncio driver"""
+    if url.startswith("sqlite"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    scheme, rest = url.split("://", 1)
+    # asyncpg takes ssl=<mode> rather than libpq's sslmode=<mode>
+    rest = rest.replace("sslmode=", "ssl=")
+    return f"postgresql+asyncpg://{rest}"
+
+
+def get_async_engine_options(url: str) -> dict:
+    """Build create_async_engine keyword arguments from settings"""
+    if not url.startswith("postgresql"):
+        return {}
+
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+    connect_args = {}
+
+    if settings.db_pool_mode == "transaction":
+        # Prepared statements do not survive transaction pooling
+        options["poolclass"] = NullPool
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+        )
+        if settings.db_statement_timeout_ms:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings.db_statement_timeout_ms)
+            }
+
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def get_async_engine():
+    """Async engine for the configured database"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        async_url = get_async_url(db_url)
+        _async_engine = create_async_engine(async_url, **get_async_engine_options(async_url))
+        if async_url.startswith("postgresql") and settings.db_statement_timeout_ms \
+                and settings.db_pool_mode == "transaction":
+            event.listen(_async_engine.sync_engine, "begin", _set_statement_timeout)
+        # Attributes stay loaded after commit; lazy loads are not possible under asyncio
+        _async_session_factory = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+async def get_async_db():
+    """Dependency to get async database session"""
+    get_async_engine()
+    async with _async_session_factory() as db:
+        yield db
+
+
+def get_async_session():
+    """New async session for code running outside request handlers (workers)"""
+    get_async_engine()
+    return _async_session_factory()
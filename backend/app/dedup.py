@@ -0,0 +1,188 @@
+"""
+Duplicate detection for scanned pages and generated articles.
+
+News sources syndicate the same story under different URLs and scans see
+the same URL again on every run. ``content_fingerprints`` keeps one row per
+normalized URL with a 64-bit SimHash of the page text:
+
+- URLs are normalized (scheme, ``www.``, default ports, fragments, tracking
+  parameters and query order are ignored) and hashed, so one indexed lookup
+  finds a URL seen before.
+- SimHash fingerprints of near-identical texts differ in only a few bits.
+  The fingerprint is stored as four 16-bit bands; two fingerprints within
+  ``NEAR_DUPLICATE_DISTANCE`` bits share at least one band exactly, so
+  candidates come from four indexed equality lookups and are confirmed by
+  Hamming distance in Python.
+
+The scan worker marks duplicate items (``ScanItem.duplicate_of``) and the
+article endpoints refuse to start AI generation for content that already
+has an article.
+"""
+
+import hashlib
+import re
+from collections import Counter
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import ContentFingerprint
+from app.utils import fold_accents, strip_html
+
+SIMHASH_BITS = 64
+BAND_BITS = 16
+NEAR_DUPLICATE_DISTANCE = 3
+SHINGLE_SIZE = 3  # Vietnamese words are syllables; shingles of 3 carry meaning
+
+# Texts shorter than this (listing and navigation pages) are not fingerprinted
+MIN_FINGERPRINT_WORDS = 50
+MAX_FINGERPRINT_WORDS = 20000
+
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "zarsrc", "gidzl", "ref", "cmpid"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of url used to recognise the same page"""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    scheme = parts.scheme.lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+    # http and https copies of a page are the same page
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def url_hash(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode()).hexdigest()
+
+
+def _to_signed(value: int) -> int:
+    return value - (1 << SIMHASH_BITS) if value >= 1 << (SIMHASH_BITS - 1) else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value & ((1 << SIMHASH_BITS) - 1)
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash (signed, as stored) of plain text; None if text is too short"""
+    words = re.findall(r"[a-z0-9]+", fold_accents(text or ""))[:MAX_FINGERPRINT_WORDS]
+    if len(words) < MIN_FINGERPRINT_WORDS:
+        return None
+
+    shingles = Counter(
+        " ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)
+    )
+    weights = [0] * SIMHASH_BITS
+    for shingle, count in shingles.items():
+        value = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+
+    fingerprint = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    return _to_signed(fingerprint)
+
+
+def html_simhash(html: str) -> Optional[int]:
+    return simhash(strip_html(html or ""))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(_to_unsigned(a) ^ _to_unsigned(b)).count("1")
+
+
+def simhash_bands(fingerprint: int) -> list:
+    value = _to_unsigned(fingerprint)
+    mask = (1 << BAND_BITS) - 1
+    return [value >> (BAND_BITS * i) & mask for i in range(SIMHASH_BITS // BAND_BITS)]
+
+
+def _band_columns():
+    return (
+        ContentFingerprint.simhash_band0, ContentFingerprint.simhash_band1,
+        ContentFingerprint.simhash_band2, ContentFingerprint.simhash_band3,
+    )
+
+
+def find_duplicate(
+    db: Session,
+    url: str,
+    fingerprint: Optional[int] = None,
+    with_article: bool = False
+) -> Optional[ContentFingerprint]:
+    """Earlier fingerprint for the same URL or near-identical text, if any
+
+    A page seen before at the same URL only counts when its text has not
+    changed since. ``with_article`` restricts matches to content that
+    already has an article.
+    """
+    key = url_hash(url)
+    if fingerprint is None:
+        # Text fingerprint from a scan that fetched this URL, if any
+        fingerprint = db.query(ContentFingerprint.simhash)\
+            .filter(ContentFingerprint.url_hash == key).scalar()
+
+    conditions = [ContentFingerprint.url_hash == key]
+    if fingerprint is not None:
+        conditions += [
+            column == band for column, band in zip(_band_columns(), simhash_bands(fingerprint))
+        ]
+    # The URL's own row first, so the cap only ever drops band candidates
+    query = db.query(ContentFingerprint).filter(or_(*conditions))\
+        .order_by((ContentFingerprint.url_hash == key).desc())
+    if with_article:
+        query = query.filter(ContentFingerprint.article_id.isnot(None))
+
+    best, best_distance = None, None
+    for candidate in query.limit(50).all():
+        if candidate.simhash is None or fingerprint is None:
+            # Only the URL can be compared
+            distance = 0 if candidate.url_hash == key else None
+        else:
+            distance = hamming_distance(candidate.simhash, fingerprint)
+        if distance is None or distance > NEAR_DUPLICATE_DISTANCE:
+            continue
+        if best is None or distance < best_distance:
+            best, best_distance = candidate, distance
+    return best
+
+
+def remember(
+    db: Session,
+    url: str,
+    fingerprint: Optional[int] = None,
+    article_id=None,
+    scan_id=None
+) -> ContentFingerprint:
+    """Create or update the fingerprint row of url (flushed, not committed)"""
+    key = url_hash(url)
+    row = db.query(ContentFingerprint).filter(ContentFingerprint.url_hash == key).first()
+    if row is None:
+        row = ContentFingerprint(url_hash=key, url=url[:1000], scan_id=scan_id)
+        try:
+            with db.begin_nested():
+                db.add(row)
+        except IntegrityError:
+            # Registered concurrently by another worker
+            row = db.query(ContentFingerprint).filter(ContentFingerprint.url_hash == key).one()
+
+    if fingerprint is not None:
+        row.simhash = fingerprint
+        (row.simhash_band0, row.simhash_band1,
+         row.simhash_band2, row.simhash_band3) = simhash_bands(fingerprint)
+    if article_id is not None:
+        row.article_id = article_id
+    db.flush()
+    return row
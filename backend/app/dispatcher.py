@@ -0,0 +1,262 @@
+"""
+Dispatcher for bulk AI generation requests.
+
+The batch generation task (app/generation.py) hands it the completions of
+many articles at once:
+
+- Requests that share a system prompt (the article's ``Prompt.content``)
+  are sent as a group. When the shared prompt is long enough for the
+  provider's prompt cache (``GENERATION_PREFIX_CACHE_MIN_TOKENS``), the
+  first request of a group is sent alone and the rest follow once it
+  answers, so they reuse the cached prefix instead of racing to fill it.
+- Every API key (``OPENAI_API_KEY`` plus ``OPENAI_EXTRA_API_KEYS``) has a
+  cap on requests in flight. The cap adapts per key (AIMD): it halves on
+  a 429 and the key pauses for Retry-After, it shrinks when responses are
+  slower than ``GENERATION_TARGET_LATENCY_SECONDS``, and it grows by about
+  one per round of fast responses, up to ``GENERATION_MAX_IN_FLIGHT_PER_KEY``.
+
+Rate-limited requests are retried here, after the pause, up to
+``GENERATION_RATE_LIMIT_ATTEMPTS`` times; other errors are returned to the
+caller with the request's result slot.
+
+``get_dispatcher`` returns the process's dispatcher, so the limits and
+pauses learned in one batch carry over to the next. Each batch runs in its
+own event loop (``asyncio.run`` in the Celery task); the loop-bound parts,
+the wait condition and the HTTP clients, are made per loop.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from app.config import settings
+from app.tokenizer import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+MIN_PAUSE_SECONDS = 1.0
+MAX_PAUSE_SECONDS = 60.0
+
+
+def api_keys() -> List[str]:
+    keys = [settings.openai_api_key] + [key.strip() for key in settings.openai_extra_api_keys.split(",")]
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+def _retry_after(error) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class KeyLimit:
+    """Adaptive cap on the requests in flight with one API key"""
+
+    def __init__(self, api_key: str, max_in_flight: int, target_latency: float):
+        self.api_key = api_key
+        self.max_in_flight = max_in_flight
+        self.target_latency = target_latency
+        self.limit = float(max(1, max_in_flight // 2))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.rate_limited = 0
+
+    @property
+    def capacity(self) -> int:
+        return max(1, int(self.limit))
+
+    def ready(self, now: float) -> bool:
+        return self.paused_until <= now and self.in_flight < self.capacity
+
+    def on_success(self, latency: float):
+        if latency > self.target_latency:
+            self.limit = max(1.0, self.limit * 0.9)
+        else:
+            self.limit = min(float(self.max_in_flight), self.limit + 1 / self.limit)
+
+    def on_rate_limited(self, retry_after: Optional[float]):
+        self.rate_limited += 1
+        self.limit = max(1.0, self.limit / 2)
+        pause = retry_after if retry_after is not None else MIN_PAUSE_SECONDS * (1 + random.random())
+        self.paused_until = max(self.paused_until, time.monotonic() + min(pause, MAX_PAUSE_SECONDS))
+
+
+class Dispatcher:
+    """Sends many chat completions, grouped by system prompt and paced per API key"""
+
+    def __init__(self, keys: Sequence[str] = None, clients: Dict[str, object] = None, model: str = None,
+                 max_in_flight: int = None, target_latency: float = None):
+        keys = list(keys or api_keys())
+        if not keys:
+            raise ValueError("No OpenAI API key configured")
+        self.model = model or settings.ai_model
+        self.keys = [
+            KeyLimit(
+                key,
+                max_in_flight or settings.generation_max_in_flight_per_key,
+                target_latency or settings.generation_target_latency_seconds
+            )
+            for key in keys
+        ]
+        self._given_clients = clients or {}
+        self._clients: Dict[str, object] = {}
+        self._loop = None
+        self._changed: Optional[asyncio.Condition] = None
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "cached_tokens": 0, "prompt_tokens": 0}
+
+    def _bind(self):
+        """Loop-bound state for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._changed = asyncio.Condition()
+            self._clients = dict(self._given_clients)
+            # Requests of an earlier loop that was torn down never released
+            for key in self.keys:
+                key.in_flight = 0
+
+    def _client(self, api_key: str):
+        if api_key not in self._clients:
+            import openai
+
+            # Retries are the dispatcher's (429) and the task's (everything else)
+            self._clients[api_key] = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=settings.openai_base_url,
+                timeout=settings.generation_request_timeout_seconds,
+                max_retries=0
+            )
+        return self._clients[api_key]
+
+    async def aclose(self):
+        """Close the HTTP clients of the running loop (limits and pauses are kept)"""
+        for client in self._clients.values():
+            await client.close()
+        self._clients = {}
+
+    async def _acquire(self) -> KeyLimit:
+        async with self._changed:
+            while True:
+                now = time.monotonic()
+                ready = [key for key in self.keys if key.ready(now)]
+                if ready:
+                    key = max(ready, key=lambda k: k.capacity - k.in_flight)
+                    key.in_flight += 1
+                    return key
+                paused = [key.paused_until for key in self.keys if key.paused_until > now]
+                try:
+                    await asyncio.wait_for(self._changed.wait(), min(paused) - now if paused else None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, key: KeyLimit, latency: float = None, rate_limited: bool = False, retry_after: float = None):
+        async with self._changed:
+            key.in_flight -= 1
+            if rate_limited:
+                key.on_rate_limited(retry_after)
+            elif latency is not None:
+                key.on_success(latency)
+            self._changed.notify_all()
+
+    async def complete(self, messages: List[Dict], **options) -> Dict:
+        """One completion: content, finish_reason, prompt_tokens, completion_tokens, cached_tokens"""
+        import openai
+
+        self._bind()
+        for attempt in range(settings.generation_rate_limit_attempts):
+            key = await self._acquire()
+            started = time.monotonic()
+            try:
+                response = await self._client(key.api_key).chat.completions.create(
+                    model=self.model, messages=messages, **options
+                )
+            except openai.RateLimitError as e:
+                await self._release(key, rate_limited=True, retry_after=_retry_after(e))
+                self.stats["rate_limited"] += 1
+                logger.info("Rate limited on key ...%s, in-flight limit now %d", key.api_key[-4:], key.capacity)
+                if attempt + 1 == settings.generation_rate_limit_attempts:
+                    raise
+                continue
+            except BaseException:
+                # Errors, and requests cancelled at the batch deadline
+                await self._release(key)
+                self.stats["errors"] += 1
+                raise
+            await self._release(key, latency=time.monotonic() - started)
+            break
+
+        usage = response.usage
+        details = getattr(usage, "prompt_tokens_details", None) if usage else None
+        cached_tokens = (details.get("cached_tokens") if isinstance(details, dict) else getattr(details, "cached_tokens", None)) or 0
+        self.stats["requests"] += 1
+        self.stats["cached_tokens"] += cached_tokens
+        self.stats["prompt_tokens"] += usage.prompt_tokens if usage else 0
+        return {
+            "content": response.choices[0].message.content or "",
+            "finish_reason": response.choices[0].finish_reason,
+            "prompt_tokens": usage.prompt_tokens if usage else None,
+            "completion_tokens": usage.completion_tokens if usage else None,
+            "cached_tokens": cached_tokens,
+        }
+
+    async def _settle(self, messages: List[Dict], options: Dict) -> Union[Dict, Exception]:
+        try:
+            return await self.complete(messages, **options)
+        except Exception as e:
+            return e
+
+    async def run(self, requests: Sequence[Tuple[List[Dict], Dict]], timeout: float = None) -> List[Union[Dict, Exception]]:
+        """Results of (messages, options) requests, in order; a failed request's slot holds its exception
+
+        Requests still unanswered after timeout seconds are cancelled and
+        their slots hold ``asyncio.TimeoutError``.
+        """
+        self._bind()
+        groups: Dict[str, List[int]] = {}
+        for index, (messages, _) in enumerate(requests):
+            prefix = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+            groups.setdefault(prefix, []).append(index)
+
+        results: List[Union[Dict, Exception]] = [None] * len(requests)
+
+        async def settle(index: int):
+            # Stored as soon as it settles, so the deadline only drops requests still unanswered
+            results[index] = await self._settle(*requests[index])
+
+        async def send(indexes: List[int]):
+            await asyncio.gather(*[settle(i) for i in indexes])
+
+        async def run_group(prefix: str, indexes: List[int]):
+            if len(indexes) > 1 and get_tokenizer(self.model).count(prefix) >= settings.generation_prefix_cache_min_tokens:
+                # Warm the provider's prompt cache with one request, then fan out
+                await send(indexes[:1])
+                indexes = indexes[1:]
+            await send(indexes)
+
+        # Largest groups first; the per-key caps keep the total in flight bounded
+        ordered = sorted(groups.items(), key=lambda item: -len(item[1]))
+        tasks = [asyncio.ensure_future(run_group(prefix, indexes)) for prefix, indexes in ordered]
+        _, unfinished = await asyncio.wait(tasks, timeout=timeout)
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+        return [asyncio.TimeoutError("Not answered before the batch deadline") if result is None else result for result in results]
+
+    def snapshot(self) -> Dict:
+        return dict(self.stats, limits={key.api_key[-4:]: round(key.limit, 2) for key in self.keys})
+
+
+_dispatcher: Optional[Dispatcher] = None
+
+
+def get_dispatcher() -> Dispatcher:
+    """The process's dispatcher, created on first use"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = Dispatcher()
+    return _dispatcher
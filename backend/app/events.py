@@ -0,0 +1,62 @@
+"""
+Real-time events from background workers to WebSocket clients.
+
+Celery workers do not hold users' WebSocket connections, so they publish
+events to the Redis channel ``docnhanh:events``. Every API process runs
+``relay_events`` (started with the application), which forwards each
+event to the user's connection in that process's ``ConnectionManager``,
+if the user is connected to it. Events are best effort: a Redis outage
+loses events, never the work that produced them; clients that reconnect
+read the current state from the API.
+"""
+
+import asyncio
+import json
+import logging
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "docnhanh:events"
+RECONNECT_SECONDS = 5
+
+_publisher = None
+
+
+def publish_event(user_id, event: str, data: dict):
+    """Send an event to user_id's WebSocket connections (blocking; failures are logged)"""
+    global _publisher
+    try:
+        if _publisher is None:
+            import redis
+
+            _publisher = redis.Redis.from_url(settings.redis_url)
+        message = json.dumps({"user_id": str(user_id), "event": event, "data": data}, default=str)
+        _publisher.publish(EVENTS_CHANNEL, message)
+    except Exception as e:
+        logger.warning("Could not publish %s event: %s", event, e)
+
+
+async def relay_events(manager):
+    """Forward published events to connections in manager until cancelled"""
+    import redis.asyncio as aioredis
+
+    while True:
+        client = aioredis.Redis.from_url(settings.redis_url)
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    await manager.send_personal_message(
+                        {"event": payload["event"], "data": payload["data"]}, payload["user_id"]
+                    )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Event relay lost Redis (%s), reconnecting in %ss", e, RECONNECT_SECONDS)
+            await asyncio.sleep(RECONNECT_SECONDS)
+        finally:
+            await client.aclose()
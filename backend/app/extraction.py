@@ -0,0 +1,361 @@
+"""
+Article extraction from fetched HTML.
+
+``parse_article`` feeds the body to lxml's HTML parser in chunks with a
+target object, so no tree is built: title, description, author, publish
+date, language, canonical URL, images and the main text are collected
+while the document streams through. Sources for each field, best first:
+OpenGraph/article meta tags, JSON-LD (``NewsArticle`` etc.), then the
+markup itself (``<title>``, ``<h1>``, ``<time>``, ``rel=author``).
+
+The main text is the set of paragraphs inside ``<article>`` (or an
+``itemprop=articleBody`` element) when it holds enough text, otherwise the
+paragraphs of the container element with the most paragraph text.
+Navigation, headers, footers, forms and link lists are skipped.
+
+Parsing is CPU-bound, so async callers never run it on the event loop:
+``parse_in_pool`` hands the body to a process pool of
+``EXTRACTION_WORKERS`` processes. Synchronous callers (``extract_url``)
+parse in their own process. Bodies are capped at
+``EXTRACTION_MAX_BYTES`` before they are fetched further or parsed.
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+from lxml import etree
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+SKIP_TAGS = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg", "button", "select", "template"}
+BLOCK_TAGS = {"p", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "li"}
+CONTAINER_TAGS = {"body", "main", "article", "section", "div", "td"}
+# Paragraph text inside <article> needed to trust it as the main text
+MIN_ARTICLE_CHARS = 200
+MAX_IMAGES = 20
+MIN_IMAGE_SIZE = 100  # px; smaller images are icons and tracking pixels
+JSON_LD_TYPES = {"Article", "NewsArticle", "BlogPosting", "ReportageNewsArticle", "WebPage"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ExtractionError(Exception):
+    """A page could not be parsed"""
+
+
+def _clean(text: Optional[str], limit: int = None) -> Optional[str]:
+    text = " ".join((text or "").split())
+    return (text[:limit] if limit else text) or None
+
+
+def _image_size_ok(attrib: Dict) -> bool:
+    for name in ("width", "height"):
+        value = attrib.get(name, "").strip().rstrip("px")
+        if value.isdigit() and int(value) < MIN_IMAGE_SIZE:
+            return False
+    return True
+
+
+class _ArticleTarget:
+    """lxml parser target collecting article fields as the document streams"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.meta: Dict[str, str] = {}
+        self.json_ld: List[str] = []
+        self.title = ""
+        self.h1 = None
+        self.language = None
+        self.canonical_url = None
+        self.author_link = None
+        self.time = None
+        self.blocks: List[tuple] = []  # (container id, in article, text)
+        self.images: List[tuple] = []  # (container id, in article, url)
+
+        self._stack: List[tuple] = []  # (tag, container id, in article)
+        self._containers = 0
+        self._skip = 0
+        self._capture = None  # tag whose text is being captured: title, h1, script or a
+        self._captured: List[str] = []
+        self._block = None  # [tag, parts, link chars]
+        self._in_link = 0
+
+    def _context(self):
+        return (self._stack[-1][1], self._stack[-1][2]) if self._stack else (0, False)
+
+    def start(self, tag, attrib):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        container, in_article = self._context()
+        if tag in CONTAINER_TAGS:
+            self._containers += 1
+            container = self._containers
+        if tag == "article" or attrib.get("itemprop") == "articleBody":
+            in_article = True
+        self._stack.append((tag, container, in_article))
+
+        if tag == "html":
+            self.language = attrib.get("lang")
+        elif tag == "meta":
+            key = (attrib.get("property") or attrib.get("name") or attrib.get("itemprop") or "").lower()
+            if key and attrib.get("content") and key not in self.meta:
+                self.meta[key] = attrib["content"]
+        elif tag == "link":
+            rel = (attrib.get("rel") or "").lower().split()
+            if "canonical" in rel and attrib.get("href"):
+                self.canonical_url = urljoin(self.url, attrib["href"])
+        elif tag == "script" and (attrib.get("type") or "").lower() == "application/ld+json":
+            self._begin_capture("script")
+        elif tag == "title" and not self.title:
+            self._begin_capture("title")
+
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        if self._skip:
+            return
+
+        if tag == "h1" and self.h1 is None:
+            self._begin_capture("h1")
+        elif tag == "a":
+            self._in_link += 1
+            if "author" in (attrib.get("rel") or "").lower().split() and self.author_link is None:
+                self._begin_capture("a")
+        elif tag == "time" and self.time is None:
+            self.time = attrib.get("datetime")
+        elif tag == "img":
+            src = attrib.get("data-src") or attrib.get("src") or ""
+            if src and not src.startswith("data:") and _image_size_ok(attrib):
+                self.images.append((container, in_article, urljoin(self.url, src)))
+        elif tag == "br" and self._block is not None:
+            self._block[1].append(" ")
+        elif tag in BLOCK_TAGS and self._block is None:
+            self._block = [tag, [], 0]
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if self._capture == tag:
+            self._end_capture()
+        if tag in SKIP_TAGS and self._skip:
+            self._skip -= 1
+        elif not self._skip:
+            if tag == "a" and self._in_link:
+                self._in_link -= 1
+            elif self._block is not None and tag == self._block[0]:
+                self._end_block()
+        if self._stack:
+            self._stack.pop()
+
+    def data(self, data):
+        if self._capture:
+            self._captured.append(data)
+        if self._skip or self._block is None:
+            return
+        self._block[1].append(data)
+        if self._in_link:
+            self._block[2] += len(data.strip())
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self
+
+    def _begin_capture(self, tag: str):
+        if self._capture is None:
+            self._capture = tag
+            self._captured = []
+
+    def _end_capture(self):
+        text = "".join(self._captured)
+        if self._capture == "title":
+            self.title = text
+        elif self._capture == "h1":
+            self.h1 = text
+        elif self._capture == "script":
+            self.json_ld.append(text)
+        elif self._capture == "a":
+            self.author_link = text
+        self._capture = None
+        self._captured = []
+
+    def _end_block(self):
+        text = _clean("".join(self._block[1]))
+        link_chars = self._block[2]
+        self._block = None
+        # Link lists (menus, related articles) are not body text
+        if text and link_chars * 2 < len(text):
+            container, in_article = self._context()
+            self.blocks.append((container, in_article, text))
+
+
+def _json_ld_article(scripts: List[str]) -> Dict:
+    """The first Article-like JSON-LD object on the page"""
+    for script in scripts:
+        try:
+            data = json.loads(script)
+        except ValueError:
+            continue
+        candidates = data if isinstance(data, list) else data.get("@graph", [data]) if isinstance(data, dict) else []
+        for item in candidates:
+            if not isinstance(item, dict):
+                continue
+            types = item.get("@type")
+            types = types if isinstance(types, list) else [types]
+            if JSON_LD_TYPES.intersection(t for t in types if isinstance(t, str)):
+                return item
+    return {}
+
+
+def _json_ld_name(value) -> Optional[str]:
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("url")
+    return value if isinstance(value, str) else None
+
+
+def _main_blocks(target: _ArticleTarget) -> tuple:
+    """Paragraphs of the main text and the container (id, or True for <article>) they come from"""
+    in_article = [text for _, article, text in target.blocks if article]
+    if sum(len(text) for text in in_article) >= MIN_ARTICLE_CHARS:
+        return in_article, True
+
+    totals: Dict[int, int] = {}
+    for container, _, text in target.blocks:
+        totals[container] = totals.get(container, 0) + len(text)
+    if not totals:
+        return [], None
+    best = max(totals, key=totals.get)
+    return [text for container, _, text in target.blocks if container == best], best
+
+
+def parse_article(body: bytes, url: str, encoding: str = None) -> Dict:
+    """Article fields of an HTML page (CPU-bound; see parse_in_pool)"""
+    target = _ArticleTarget(url)
+    parser = etree.HTMLParser(target=target, encoding=encoding, no_network=True, recover=True)
+    try:
+        for start in range(0, len(body), CHUNK_SIZE):
+            parser.feed(body[start:start + CHUNK_SIZE])
+        parser.close()
+    except etree.XMLSyntaxError:
+        # Nothing parseable (empty or binary body): the fields stay empty
+        pass
+    except etree.LxmlError as e:
+        raise ExtractionError(f"{url}: {e}")
+
+    meta = target.meta
+    ld = _json_ld_article(target.json_ld)
+    paragraphs, source = _main_blocks(target)
+    text = "\n\n".join(paragraphs)
+
+    images = []
+    lead_image = meta.get("og:image") or _json_ld_name(ld.get("image"))
+    if lead_image:
+        images.append(urljoin(url, lead_image))
+    for container, in_article, image in target.images:
+        if len(images) >= MAX_IMAGES:
+            break
+        if (in_article if source is True else container == source) and image not in images:
+            images.append(image)
+
+    author = meta.get("author") or meta.get("article:author") or _json_ld_name(ld.get("author")) or target.author_link
+    if author and author.startswith(("http://", "https://")):
+        # article:author is often a profile URL
+        author = _json_ld_name(ld.get("author")) or target.author_link
+    return {
+        "url": url,
+        "canonical_url": target.canonical_url,
+        "title": _clean(meta.get("og:title") or ld.get("headline") or target.title or target.h1, 500),
+        "description": _clean(meta.get("description") or meta.get("og:description") or ld.get("description"), 1000),
+        "author": _clean(author, 255),
+        "published_date": _clean(
+            meta.get("article:published_time") or meta.get("datepublished") or ld.get("datePublished")
+            or meta.get("pubdate") or meta.get("date") or target.time, 64
+        ),
+        "language": _clean(target.language, 20),
+        "image_url": images[0] if images else None,
+        "images": images,
+        "text": text,
+        "word_count": len(text.split()),
+    }
+
+
+def declared_encoding(page: Dict) -> Optional[str]:
+    """Charset the server declared for a fetched page; otherwise lxml reads <meta charset>"""
+    return page["encoding"] if "charset=" in page["content_type"].lower() else None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool for parsing (created on first use)"""
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs threads and an event loop is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.extraction_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def parse_in_pool(body: bytes, url: str, encoding: str = None) -> Dict:
+    """parse_article in the process pool, with the body capped at EXTRACTION_MAX_BYTES"""
+    global _pool
+    body = body[:settings.extraction_max_bytes]
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_pool(), parse_article, body, url, encoding)
+    except BrokenProcessPool:
+        # A parser process died (out of memory, crash); start a fresh pool next time
+        logger.error("Extraction process pool broken while parsing %s", url)
+        _pool = None
+        raise ExtractionError(f"{url}: parser process failed")
+
+
+async def _fetch_html(url: str, crawler) -> Dict:
+    page = await crawler.fetch(url, max_bytes=settings.extraction_max_bytes)
+    content_type = page["content_type"]
+    if content_type and "html" not in content_type:
+        raise ExtractionError(f"{url}: not an HTML page ({content_type})")
+    return page
+
+
+async def extract_article(url: str, crawler=None) -> Dict:
+    """Fetch url (at most EXTRACTION_MAX_BYTES) and extract its article"""
+    from app.crawler import get_crawler
+
+    page = await _fetch_html(url, crawler or get_crawler())
+    article = await parse_in_pool(page["body"], page["url"], declared_encoding(page))
+    article["truncated"] = page["truncated"]
+    return article
+
+
+def extract_url(url: str) -> Dict:
+    """extract_article for synchronous callers (scripts, Celery tasks); not for the event loop
+
+    The page is parsed in the calling process: a prefork Celery worker
+    child is daemonic and cannot start the parser pool.
+    """
+    from app.crawler import Crawler
+
+    async def fetch():
+        async with Crawler() as crawler:
+            return await _fetch_html(url, crawler)
+
+    page = asyncio.run(fetch())
+    article = parse_article(page["body"], page["url"], declared_encoding(page))
+    article["truncated"] = page["truncated"]
+    return article
@@ -0,0 +1,78 @@
+"""
+Conditional fetching of source pages.
+
+After a page is fetched, its ``ETag``, ``Last-Modified`` and body hash are
+kept in ``fetch_validators``. The next fetch sends ``If-None-Match`` /
+``If-Modified-Since``; a 304, or a 200 whose body hashes the same (servers
+that ignore validators), means the page is unchanged and the caller skips
+parsing it. Validators are per exact URL and only written by scans, so
+"unchanged" always means "unchanged since the last scan".
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import FetchValidator
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def load_validator(db: Session, url: str) -> Optional[Dict]:
+    """Validators of the last fetch of url as a plain dict (None if never fetched)"""
+    row = db.get(FetchValidator, url_key(url))
+    if row is None:
+        return None
+    return {
+        "etag": row.etag,
+        "last_modified": row.last_modified,
+        "content_hash": row.content_hash,
+    }
+
+
+def conditional_headers(validator: Optional[Dict]) -> Dict[str, str]:
+    """Request headers that let the server answer 304 Not Modified"""
+    headers = {}
+    if validator and validator.get("etag"):
+        headers["If-None-Match"] = validator["etag"]
+    if validator and validator.get("last_modified"):
+        headers["If-Modified-Since"] = validator["last_modified"]
+    return headers
+
+
+def is_unchanged(validator: Optional[Dict], page: Dict) -> bool:
+    """Whether a fetched page is the same as at the last fetch"""
+    if validator is None:
+        return False
+    if page["status_code"] == 304:
+        return True
+    return validator.get("content_hash") is not None and validator["content_hash"] == body_hash(page["body"])
+
+
+def save_validator(db: Session, url: str, page: Dict, content_hash: Optional[str]):
+    """Record the validators of a fetched page (not committed)"""
+    now = datetime.now(timezone.utc)
+    key = url_key(url)
+    row = db.get(FetchValidator, key)
+    if row is None:
+        row = FetchValidator(url_hash=key, url=url[:1000], changed_at=now)
+        try:
+            with db.begin_nested():
+                db.add(row)
+        except IntegrityError:
+            # Saved concurrently by another worker
+            row = db.get(FetchValidator, key)
+    if page["status_code"] != 304:
+        if row.content_hash != content_hash:
+            row.changed_at = now
+        row.etag = (page.get("etag") or "")[:255] or None
+        row.last_modified = (page.get("last_modified") or "")[:64] or None
+        row.content_hash = content_hash
+    row.checked_at = now
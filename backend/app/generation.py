@@ -0,0 +1,546 @@
+"""
+AI article generation pipeline.
+
+The article endpoints create the article (status "processing") together
+with a ``GenerationJob``, hand the job to Celery with ``enqueue`` and
+return at once, so API latency does not depend on the LLM. The worker
+(app/celery_app.py) runs ``generate_article`` through four stages:
+
+1. fetching   - the source page: the scan's stored copy for articles
+                created from a scan, otherwise a fetch through the
+                shared crawler
+2. extracting - title and main text (app/extraction.py)
+3. generating - chat completion with the article's prompt
+4. saving     - content, title, word count, search index and usage
+
+Every stage is written to the job row and pushed to the creator's
+WebSocket as ``article_generation_progress``; the job ends with
+``article_generation_completed`` or ``article_generation_failed``.
+
+The job id is the Celery task id and a partial unique index allows one
+queued or running job per article, so redelivered tasks and double clicks
+never generate an article twice. Timeouts, rate limits and server errors
+are retried with exponential backoff up to ``GENERATION_MAX_RETRIES``
+times; other errors fail the job and the article (status "failed"),
+which can be retried through the API. Completions are cached
+(app/response_cache.py), so the same source and prompt generated again
+costs nothing.
+
+Jobs for articles created from a scan (other than "high" priority) go to
+the batch lane instead: ``dispatch_batch`` waits
+``GENERATION_BATCH_WINDOW_SECONDS`` for the rest of a bulk request, claims
+up to ``GENERATION_BATCH_SIZE`` of them and sends their completions through
+the dispatcher (app/dispatcher.py), which groups requests sharing a prompt
+for the provider's prompt cache and paces them per API key. The lane is
+consumed by one worker process, so the dispatcher's caps hold for the
+whole deployment.
+"""
+
+import asyncio
+import logging
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy import and_, case, or_
+
+from app import response_cache
+from app.celery_app import BATCH_QUEUE, PRIORITY_QUEUES, celery_app
+from app.config import settings
+from app.crawler import FetchError, RobotsDisallowed
+from app.database import SessionLocal
+from app.dedup import remember, simhash
+from app.events import publish_event
+from app.extraction import ExtractionError, extract_url, parse_article
+from app.models import Article, GenerationJob, Prompt, ScanItem, UsageTracking
+from app.search import index_article
+from app.storage import get_blob_store
+from app.tokenizer import get_tokenizer
+from app.utils import strip_html
+
+logger = logging.getLogger(__name__)
+
+# Title of articles created from a manual URL until generation names them
+PLACEHOLDER_TITLE = "Processing..."
+
+# Progress (percent) reported when each stage starts
+STAGES = {"fetching": 5, "extracting": 20, "generating": 35, "saving": 90}
+
+MAX_RETRY_DELAY_SECONDS = 600
+
+# Part of the batch task's time limit kept for saving after the completions
+BATCH_SAVE_SECONDS = 60
+
+DEFAULT_PROMPT = (
+    "Bạn là biên tập viên của Báo Công Thương. Viết lại nội dung nguồn thành một bài báo "
+    "tiếng Việt hoàn chỉnh, chính xác và khách quan, không thêm thông tin không có trong nguồn. "
+    "Trả về HTML: tiêu đề trong <h1>, sau đó các đoạn <p>; có thể dùng <h2>, <ul>, <li>, <blockquote>."
+)
+
+H1_PATTERN = re.compile(r"<h1[^>]*>(.*?)</h1>", re.IGNORECASE | re.DOTALL)
+FENCE_PATTERN = re.compile(r"^```(?:html)?\s*|\s*```$")
+
+_client = None
+
+
+class GenerationError(Exception):
+    """Generation failed in a way retrying will not fix"""
+
+
+class TransientGenerationError(Exception):
+    """Generation failed in a way worth retrying (timeout, rate limit, server error)"""
+
+
+def queue_generation(db, article: Article, user_id, priority: str = "default", idempotency_key: str = None) -> GenerationJob:
+    """Add a queued generation job for article (not committed; call enqueue after the commit)"""
+    job = GenerationJob(
+        article_id=article.article_id,
+        created_by_id=user_id,
+        priority=priority,
+        idempotency_key=idempotency_key
+    )
+    db.add(job)
+    return job
+
+
+def _batched(job: GenerationJob) -> bool:
+    """Whether job goes to the batch lane: bulk work from a scan that no editor is waiting on"""
+    return settings.generation_batch_size > 1 and job.priority != "high" and job.article.source_job_id is not None
+
+
+def enqueue(job: GenerationJob) -> bool:
+    """Send a committed job to its priority lane or the batch lane; False if the broker is unreachable"""
+    retry_policy = {"max_retries": 3, "interval_start": 0, "interval_step": 0.5, "interval_max": 2}
+    try:
+        if _batched(job):
+            # Any batch run picks the job up; the window lets the rest of a bulk request arrive
+            dispatch_batch.apply_async(
+                queue=BATCH_QUEUE,
+                countdown=settings.generation_batch_window_seconds,
+                retry=True,
+                retry_policy=retry_policy,
+            )
+            return True
+        generate_article.apply_async(
+            args=[str(job.job_id)],
+            task_id=str(job.job_id),
+            queue=PRIORITY_QUEUES.get(job.priority, PRIORITY_QUEUES["default"]),
+            retry=True,
+            retry_policy=retry_policy,
+        )
+        return True
+    except Exception:
+        logger.exception("Could not queue generation job %s", job.job_id)
+        return False
+
+
+def _retry_delay(retries: int) -> float:
+    delay = min(MAX_RETRY_DELAY_SECONDS, settings.generation_retry_backoff_seconds * 2 ** retries)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _report(db, job: GenerationJob, stage: str):
+    job.stage = stage
+    job.progress = STAGES[stage]
+    db.commit()
+    publish_event(job.created_by_id, "article_generation_progress", {
+        "article_id": job.article_id,
+        "job_id": job.job_id,
+        "stage": stage,
+        "progress": job.progress
+    })
+
+
+def _source_page(db, article: Article) -> Dict:
+    """Extracted source page of article: the scan's stored copy if there is one, else a fresh fetch"""
+    if article.source_job_id:
+        item = db.query(ScanItem).filter(
+            ScanItem.scan_id == article.source_job_id,
+            ScanItem.url == article.source_url
+        ).first()
+        store = get_blob_store()
+        if item is not None and store.exists(item.content_hash):
+            body = store.read(item.content_hash)[:settings.extraction_max_bytes]
+            return parse_article(body, item.url)
+
+    try:
+        return extract_url(article.source_url)
+    except RobotsDisallowed as e:
+        raise GenerationError(str(e))
+    except FetchError as e:
+        if e.status_code is not None and e.status_code < 500 and e.status_code != 429:
+            raise GenerationError(str(e))
+        raise TransientGenerationError(str(e))
+    except ExtractionError as e:
+        raise GenerationError(str(e))
+
+
+def _prompt(db, article: Article) -> str:
+    """System prompt: the article's prompt by name, else the default prompt"""
+    prompt = None
+    if article.prompt_used:
+        prompt = db.query(Prompt).filter(Prompt.name == article.prompt_used).first()
+    if prompt is None:
+        prompt = db.query(Prompt).filter(Prompt.is_default == True).order_by(Prompt.created_at).first()
+    if prompt is None:
+        return DEFAULT_PROMPT
+    prompt.usage_count = (prompt.usage_count or 0) + 1
+    return prompt.content
+
+
+def _messages(system_prompt: str, article: Article, source: Dict) -> list:
+    text = get_tokenizer().truncate(source["text"], settings.generation_max_source_tokens)
+    request = f"Tiêu đề nguồn: {source['title'] or ''}\nURL: {article.source_url}\n\nNội dung nguồn:\n{text}"
+    if article.editor_instructions:
+        request += f"\n\nYêu cầu của biên tập viên:\n{article.editor_instructions}"
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": request},
+    ]
+
+
+def _cached_completion(key: str) -> Optional[Dict]:
+    cached = response_cache.get("generation", key)
+    if cached is None:
+        return None
+    return {
+        "content": cached["content"],
+        "tokens": 0,
+        "cache": "exact",
+        "tokens_saved": cached["prompt_tokens"] + cached["completion_tokens"],
+    }
+
+
+def _completion(key: str, messages: list, raw: str, finish_reason: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Dict:
+    """Completion from a model answer, cached if it is complete"""
+    content = FENCE_PATTERN.sub("", raw.strip())
+    if prompt_tokens is None:
+        # Some compatible servers omit usage; count locally
+        tokenizer = get_tokenizer()
+        prompt_tokens, completion_tokens = tokenizer.count_messages(messages), tokenizer.count(raw)
+    if finish_reason == "stop":
+        response_cache.put("generation", key, content, prompt_tokens, completion_tokens)
+    return {"content": content, "tokens": prompt_tokens + completion_tokens}
+
+
+def _api_error(e: Exception) -> Exception:
+    """Generation error for an exception raised by the OpenAI client"""
+    import openai
+
+    if not isinstance(e, openai.OpenAIError):
+        return e
+    if isinstance(e, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return TransientGenerationError(f"{type(e).__name__}: {e}")
+    return GenerationError(f"{type(e).__name__}: {e}")
+
+
+def _complete(messages: list) -> Dict:
+    """Chat completion: content, tokens charged and, for cached answers, cache details"""
+    global _client
+    key = response_cache.cache_key("generation", settings.ai_model, messages, temperature=settings.generation_temperature)
+    cached = _cached_completion(key)
+    if cached is not None:
+        return cached
+    if not settings.openai_api_key:
+        raise GenerationError("OPENAI_API_KEY is not configured")
+    import openai
+
+    if _client is None:
+        # Retries are Celery's, with backoff across workers
+        _client = openai.OpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            timeout=settings.generation_request_timeout_seconds,
+            max_retries=0
+        )
+    try:
+        response = _client.chat.completions.create(
+            model=settings.ai_model, messages=messages, temperature=settings.generation_temperature
+        )
+    except openai.OpenAIError as e:
+        raise _api_error(e)
+    usage = response.usage
+    return _completion(
+        key,
+        messages,
+        response.choices[0].message.content or "",
+        response.choices[0].finish_reason,
+        usage.prompt_tokens if usage else None,
+        usage.completion_tokens if usage else None
+    )
+
+
+def _prepare(db, job: GenerationJob, article: Article) -> Tuple[Dict, list]:
+    """Fetching and extracting stages: source page and completion messages"""
+    _report(db, job, "fetching")
+    source = _source_page(db, article)
+    _report(db, job, "extracting")
+    if not source["text"]:
+        raise GenerationError(f"{article.source_url}: no article text found")
+    system_prompt = _prompt(db, article)
+
+    _report(db, job, "generating")
+    return source, _messages(system_prompt, article, source)
+
+
+def _run(db, job: GenerationJob, article: Article):
+    source, messages = _prepare(db, job, article)
+    _save(db, job, article, source, _complete(messages))
+
+
+def _save(db, job: GenerationJob, article: Article, source: Dict, completion: Dict):
+    """Saving stage (not committed)"""
+    content_html, tokens = completion["content"], completion["tokens"]
+    if not content_html:
+        raise TransientGenerationError("Empty response from the AI model")
+
+    _report(db, job, "saving")
+    if article.title == PLACEHOLDER_TITLE:
+        heading = H1_PATTERN.search(content_html)
+        title = strip_html(heading.group(1)) if heading else None
+        article.title = (title or source["title"] or article.source_url)[:255]
+    article.content_html = content_html
+    article.word_count = len(strip_html(content_html).split())
+    article.status = "draft"
+    index_article(db, article)
+    # Later requests for a near copy of this source find the article
+    remember(db, article.source_url, simhash(source["text"]), article_id=article.article_id)
+    db.add(UsageTracking(
+        user_id=job.created_by_id,
+        action="article_generation",
+        tokens_used=tokens,
+        cost_usd=round(tokens / 1000 * settings.ai_cost_per_1k_tokens, 6),
+        usage_metadata={
+            "article_id": str(article.article_id),
+            "job_id": str(job.job_id),
+            "model": settings.ai_model,
+            **{key: completion[key] for key in ("cache", "tokens_saved", "cached_prompt_tokens") if key in completion}
+        }
+    ))
+    job.tokens_used = tokens
+
+
+def _running_elsewhere(job: GenerationJob) -> bool:
+    """Whether another worker is running job (a worker that died leaves it running past the time limit)"""
+    if job.status != "running" or job.started_at is None:
+        return False
+    started_at = job.started_at if job.started_at.tzinfo else job.started_at.replace(tzinfo=timezone.utc)
+    limit = timedelta(seconds=settings.generation_task_timeout_seconds + 60)
+    return datetime.now(timezone.utc) - started_at < limit
+
+
+def _fail(db, job: GenerationJob, article: Optional[Article], message: str):
+    job.status = "failed"
+    job.error_message = message
+    job.completed_at = datetime.now(timezone.utc)
+    if article is not None:
+        article.status = "failed"
+    db.commit()
+    publish_event(job.created_by_id, "article_generation_failed", {
+        "article_id": job.article_id,
+        "job_id": job.job_id,
+        "error": message
+    })
+
+
+def _succeed(db, job: GenerationJob, article: Article):
+    job.status = "completed"
+    job.progress = 100
+    job.completed_at = datetime.now(timezone.utc)
+    db.commit()
+    publish_event(job.created_by_id, "article_generation_completed", {
+        "article_id": article.article_id,
+        "job_id": job.job_id,
+        "title": article.title,
+        "word_count": article.word_count
+    })
+
+
+@celery_app.task(bind=True, name="generation.generate_article", max_retries=None)
+def generate_article(self, job_id: str):
+    """Run one generation job (Celery task; the task id is the job id)"""
+    with SessionLocal() as db:
+        job = db.query(GenerationJob).filter(GenerationJob.job_id == job_id).with_for_update().first()
+        if job is None or job.status in ("completed", "failed") or _running_elsewhere(job):
+            # Deleted, or a redelivery of a job that finished or is still running
+            db.rollback()
+            return
+        article = db.get(Article, job.article_id)
+        if article is None:
+            _fail(db, job, None, "Article was deleted")
+            return
+
+        job.status = "running"
+        job.attempts = (job.attempts or 0) + 1
+        job.started_at = datetime.now(timezone.utc)
+        job.error_message = None
+        db.commit()
+
+        try:
+            _run(db, job, article)
+        except TransientGenerationError as e:
+            db.rollback()
+            if self.request.retries < settings.generation_max_retries:
+                delay = _retry_delay(self.request.retries)
+                logger.warning("Generation %s failed (%s), retrying in %.0fs", job_id, e, delay)
+                job.status = "queued"
+                job.error_message = f"Attempt {job.attempts} failed: {e}"
+                db.commit()
+                raise self.retry(exc=e, countdown=delay)
+            _fail(db, job, article, str(e))
+            return
+        except GenerationError as e:
+            logger.warning("Generation %s failed: %s", job_id, e)
+            db.rollback()
+            _fail(db, job, article, str(e))
+            return
+        except Exception as e:
+            logger.exception("Generation %s failed", job_id)
+            db.rollback()
+            _fail(db, job, article, str(e) or type(e).__name__)
+            return
+
+        _succeed(db, job, article)
+
+
+def _claim_batch(db) -> List[Tuple[GenerationJob, Article]]:
+    """Claim up to GENERATION_BATCH_SIZE batch-lane jobs: queued ones (retries once their backoff has passed) and abandoned running ones"""
+    now = datetime.now(timezone.utc)
+    abandoned = now - timedelta(seconds=settings.generation_task_timeout_seconds + 60)
+    rows = db.query(GenerationJob, Article).join(
+        Article, Article.article_id == GenerationJob.article_id
+    ).filter(
+        Article.source_job_id.isnot(None),
+        GenerationJob.priority != "high",
+        or_(
+            and_(
+                GenerationJob.status == "queued",
+                or_(GenerationJob.next_attempt_at.is_(None), GenerationJob.next_attempt_at <= now)
+            ),
+            and_(GenerationJob.status == "running", GenerationJob.started_at < abandoned)
+        )
+    ).order_by(
+        case((GenerationJob.priority == "default", 0), else_=1),
+        GenerationJob.created_at
+    ).limit(settings.generation_batch_size).with_for_update(of=GenerationJob, skip_locked=True).all()
+
+    for job, article in rows:
+        job.status = "running"
+        job.attempts = (job.attempts or 0) + 1
+        job.started_at = now
+        job.next_attempt_at = None
+        job.error_message = None
+    db.commit()
+    return rows
+
+
+async def _dispatch(requests: List[list], timeout: float) -> List:
+    """Completions of many requests through the dispatcher; a failed or unanswered request's slot holds its exception"""
+    from app.dispatcher import get_dispatcher
+
+    dispatcher = get_dispatcher()
+    options = {"temperature": settings.generation_temperature}
+    try:
+        results = await dispatcher.run([(messages, options) for messages in requests], timeout=timeout)
+    finally:
+        await dispatcher.aclose()
+    logger.info("Dispatched %d generation requests (process totals: %s)", len(requests), dispatcher.snapshot())
+    return results
+
+
+def _requeue_or_fail(db, job: GenerationJob, article: Article, error: Exception):
+    """Failed batch-lane job: back to the queue after a backoff if the error is transient, else failed"""
+    db.rollback()
+    if isinstance(error, TransientGenerationError) and job.attempts <= settings.generation_max_retries:
+        delay = _retry_delay(job.attempts - 1)
+        logger.warning("Generation %s failed (%s), retrying in %.0fs", job.job_id, error, delay)
+        job.status = "queued"
+        job.error_message = f"Attempt {job.attempts} failed: {error}"
+        # Earlier batch runs skip the job until then
+        job.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        db.commit()
+        dispatch_batch.apply_async(queue=BATCH_QUEUE, countdown=delay)
+        return
+    if isinstance(error, (TransientGenerationError, GenerationError)):
+        logger.warning("Generation %s failed: %s", job.job_id, error)
+    else:
+        logger.error("Generation %s failed", job.job_id, exc_info=error)
+    _fail(db, job, article, str(error) or type(error).__name__)
+
+
+def _run_batch(db, claimed: List[Tuple[GenerationJob, Article]]):
+    # Work left at the deadline goes back to the queue before the soft time limit hits
+    deadline = time.monotonic() + settings.generation_task_timeout_seconds - BATCH_SAVE_SECONDS
+    out_of_time = TransientGenerationError("Batch ran out of time")
+
+    pending = []
+    for job, article in claimed:
+        if time.monotonic() >= deadline:
+            _requeue_or_fail(db, job, article, out_of_time)
+            continue
+        try:
+            source, messages = _prepare(db, job, article)
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as e:
+            _requeue_or_fail(db, job, article, e)
+            continue
+        key = response_cache.cache_key("generation", settings.ai_model, messages, temperature=settings.generation_temperature)
+        pending.append((job, article, source, messages, key, _cached_completion(key)))
+
+    uncached = [item for item in pending if item[5] is None]
+    if uncached and not settings.openai_api_key:
+        results = [GenerationError("OPENAI_API_KEY is not configured")] * len(uncached)
+    elif uncached:
+        results = asyncio.run(_dispatch([item[3] for item in uncached], max(0.0, deadline - time.monotonic())))
+    else:
+        results = []
+    answers = dict(zip((item[0].job_id for item in uncached), results))
+
+    for job, article, source, messages, key, completion in pending:
+        try:
+            if completion is None:
+                answer = answers[job.job_id]
+                if isinstance(answer, (asyncio.TimeoutError, SoftTimeLimitExceeded)):
+                    raise out_of_time
+                if isinstance(answer, Exception):
+                    raise _api_error(answer)
+                completion = _completion(
+                    key, messages, answer["content"], answer["finish_reason"],
+                    answer["prompt_tokens"], answer["completion_tokens"]
+                )
+                if answer["cached_tokens"]:
+                    completion["cached_prompt_tokens"] = answer["cached_tokens"]
+            _save(db, job, article, source, completion)
+        except SoftTimeLimitExceeded:
+            raise
+        except Exception as e:
+            _requeue_or_fail(db, job, article, e)
+            continue
+        _succeed(db, job, article)
+
+
+@celery_app.task(name="generation.dispatch_batch")
+def dispatch_batch():
+    """Run a batch of batch-lane jobs, their completions sent together through the dispatcher (Celery task)"""
+    with SessionLocal() as db:
+        claimed = _claim_batch(db)
+        if not claimed:
+            # Another run took the jobs this one was queued for
+            return
+        if len(claimed) == settings.generation_batch_size:
+            # More may be waiting
+            dispatch_batch.apply_async(queue=BATCH_QUEUE)
+
+        try:
+            _run_batch(db, claimed)
+        except SoftTimeLimitExceeded:
+            # Past the batch deadline anyway; requeue what has not finished rather than leave it running
+            db.rollback()
+            for job, article in claimed:
+                db.refresh(job)
+                if job.status == "running":
+                    _requeue_or_fail(db, job, article, TransientGenerationError("Batch ran out of time"))
\ No newline at end of file
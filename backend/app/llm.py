@@ -0,0 +1,133 @@
+"""
+Async client for the OpenAI-compatible chat completions API.
+
+One ``AsyncOpenAI`` client per event loop, so connections to the API are
+reused. ``OPENAI_BASE_URL`` points it at a gateway or a local server
+(scripts/mock_llm_server.py for benchmarks). ``ChatStream`` yields text
+deltas as the model produces them and keeps the token usage the server
+reports at the end of the stream.
+"""
+
+import asyncio
+import weakref
+from typing import AsyncIterator, Dict, List, Optional
+from app.config import settings
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+class LLMError(Exception):
+    """The chat completion request failed"""
+
+
+def llm_configured() -> bool:
+    return bool(settings.openai_api_key)
+
+
+def get_async_client():
+    """AsyncOpenAI client of the running event loop (created on first use)"""
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        import openai
+
+        _clients[loop] = openai.AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            timeout=settings.chat_request_timeout_seconds,
+            max_retries=1
+        )
+    return _clients[loop]
+
+
+async def close_client():
+    """Close the running loop's client, if any (application shutdown)"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def _usage_value(usage, name: str) -> Optional[int]:
+    if usage is None:
+        return None
+    return usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+
+
+class ChatStream:
+    """Async iterator over the text deltas of one streamed completion
+
+    After the iteration ends, ``prompt_tokens`` and ``completion_tokens``
+    hold the usage reported by the server (None if it sent none).
+    """
+
+    def __init__(self, messages: List[Dict], model: str = None, **options):
+        self.messages = messages
+        self.model = model or settings.ai_model
+        self.options = options
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.finish_reason: Optional[str] = None
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        import openai
+
+        try:
+            stream = await get_async_client().chat.completions.create(
+                model=self.model,
+                messages=self.messages,
+                stream=True,
+                # Usage arrives in a last chunk without choices
+                extra_body={"stream_options": {"include_usage": True}},
+                **self.options
+            )
+        except openai.OpenAIError as e:
+            raise LLMError(f"{type(e).__name__}: {e}")
+
+        try:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    self.prompt_tokens = _usage_value(usage, "prompt_tokens")
+                    self.completion_tokens = _usage_value(usage, "completion_tokens")
+                for choice in chunk.choices:
+                    if choice.finish_reason:
+                        self.finish_reason = choice.finish_reason
+                    if choice.delta and choice.delta.content:
+                        yield choice.delta.content
+        except openai.OpenAIError as e:
+            raise LLMError(f"{type(e).__name__}: {e}")
+        finally:
+            # Stops generation (and billing) when the consumer goes away early
+            await stream.response.aclose()
+
+
+async def complete_chat(messages: List[Dict], model: str = None, **options) -> Dict:
+    """Whole completion: content, finish_reason, prompt_tokens and completion_tokens"""
+    import openai
+
+    try:
+        response = await get_async_client().chat.completions.create(
+            model=model or settings.ai_model, messages=messages, **options
+        )
+    except openai.OpenAIError as e:
+        raise LLMError(f"{type(e).__name__}: {e}")
+    usage = response.usage
+    return {
+        "content": response.choices[0].message.content or "",
+        "finish_reason": response.choices[0].finish_reason,
+        "prompt_tokens": usage.prompt_tokens if usage else None,
+        "completion_tokens": usage.completion_tokens if usage else None,
+    }
+
+
+async def embed(text: str, model: str) -> List[float]:
+    """Embedding vector of text"""
+    import openai
+
+    try:
+        response = await get_async_client().embeddings.create(model=model, input=text)
+    except openai.OpenAIError as e:
+        raise LLMError(f"{type(e).__name__}: {e}")
+    return response.data[0].embedding
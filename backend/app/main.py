@@ -1,12 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
+from anyio import to_thread
 
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, Base, get_pool_status
+from app.crawler import close_crawler
+from app.extraction import shutdown_pool
+from app.llm import close_client
+from app.response_cache import cache_metrics
+from app.events import relay_events
+from app.auth import require_permission
+from app import rollups  # noqa: F401  (registers rollup flush hooks)
 from app.routers import (
     auth, users, departments, tasks, articles, scans, 
     prompts, sources, analytics, chat, notifications, websocket
@@ -17,9 +26,17 @@ from app.routers import (
 async def lifespan(app: FastAPI):
     # Startup
     Base.metadata.create_all(bind=engine)
+    # Sync handlers run in this threadpool, each holding a DB connection
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    # Forward worker events (AI generation progress) to this process's WebSockets
+    relay = asyncio.create_task(relay_events(websocket.manager))
     yield
     # Shutdown
-    pass
+    relay.cancel()
+    await asyncio.gather(relay, return_exceptions=True)
+    await close_crawler()
+    await close_client()
+    shutdown_pool()
 
 # Create FastAPI app
 app = FastAPI(
@@ -71,6 +88,16 @@ async def health_check():
         "timestamp": "2025-01-20T10:00:00Z"
     }
 
+@app.get("/api/v1/health/db-pool")
+async def db_pool_status(current_user=Depends(require_permission("quan-tri", "view"))):
+    """Database connection pool metrics"""
+    return get_pool_status()
+
+@app.get("/api/v1/health/ai-cache")
+async def ai_cache_status(current_user=Depends(require_permission("quan-tri", "view"))):
+    """AI response cache hit/miss metrics (this process)"""
+    return cache_metrics.snapshot()
+
 # Global exception handler
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -80,7 +107,8 @@ async def http_exception_handler(request, exc):
             "detail": exc.detail,
             "error_code": "HTTP_ERROR",
             "status_code": exc.status_code
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
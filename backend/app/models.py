@@ -1,10 +1,24 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON, Float
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, Date, Text, ForeignKey, JSON, Float, Index, DDL, event
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql import func, text
 import uuid
 from app.database import Base
 
+# Trigram indexes need the pg_trgm extension before tables are created
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+def trigram_index(table: str, column: str) -> Index:
+    """GIN trigram index so ILIKE '%term%' on column can use an index (Postgres)"""
+    return Index(
+        f"ix_{table}_{column}_trgm", column,
+        postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"}
+    ).ddl_if(dialect="postgresql")
+
 
 class User(Base):
     __tablename__ = "users"
@@ -25,6 +39,14 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        trigram_index("users", "full_name"),
+        trigram_index("users", "email"),
+        trigram_index("users", "username"),
+        Index("ix_users_created_at_id", "created_at", "user_id"),
+        Index("ix_users_department_id", "department_id"),
+    )
+    
     # Relationships
     department = relationship("Department", foreign_keys=[department_id], back_populates="members")
     created_tasks = relationship("Task", foreign_keys="Task.created_by_id", back_populates="creator")
@@ -48,7 +70,7 @@ class Department(Base):
     
     # Relationships
     leader = relationship("User", foreign_keys=[leader_id])
-    members = relationship("User", back_populates="department")
+    members = relationship("User", foreign_keys="User.department_id", back_populates="department")
     tasks = relationship("Task", back_populates="department")
 
 
@@ -75,6 +97,22 @@ class Task(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        trigram_index("tasks", "title"),
+        trigram_index("tasks", "description"),
+        # List keyset and per-filter orderings, dashboard/profile counts, overdue check
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        Index("ix_tasks_status_created_at", "status", "created_at", "id"),
+        Index("ix_tasks_assignee_created_at", "assignee_id", "created_at", "id"),
+        Index("ix_tasks_assignee_status", "assignee_id", "status"),
+        Index("ix_tasks_department_status", "department_id", "status"),
+        Index(
+            "ix_tasks_open_due_date", "due_date",
+            postgresql_where=text("status IN ('todo', 'in_progress')"),
+            sqlite_where=text("status IN ('todo', 'in_progress')")
+        ),
+    )
+    
     # Relationships
     assignee = relationship("User", foreign_keys=[assignee_id], back_populates="assigned_tasks")
     creator = relationship("User", foreign_keys=[created_by_id], back_populates="created_tasks")
@@ -97,6 +135,10 @@ class TaskUpdate(Base):
     changes = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_task_updates_task_created_at", "task_id", "created_at"),
+    )
+    
     # Relationships
     task = relationship("Task", back_populates="updates")
     user = relationship("User")
@@ -108,7 +150,7 @@ class Article(Base):
     article_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String(255), nullable=False)
     content_html = Column(Text, nullable=True)
-    status = Column(String(20), default="draft")  # draft, processing, published
+    status = Column(String(20), default="draft")  # draft, processing (AI generation), failed (generation failed), published
     created_by_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False)
     source_job_id = Column(UUID(as_uuid=True), ForeignKey("scan_jobs.scan_id"), nullable=True)
     source_url = Column(String(500), nullable=True)
@@ -117,15 +159,61 @@ class Article(Base):
     editor_instructions = Column(Text, nullable=True)
     prompt_used = Column(String(100), nullable=True)
     last_edited_at = Column(DateTime(timezone=True), nullable=True)
+    # Accent-folded plain text of title + body, and its weighted tsvector (see app/search.py)
+    search_text = deferred(Column(Text, nullable=True))
+    search_vector = deferred(Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
+    __table_args__ = (
+        Index("ix_articles_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_articles_created_at_id", "created_at", "article_id"),
+        Index("ix_articles_status_created_at", "status", "created_at", "article_id"),
+        Index("ix_articles_created_by_status", "created_by_id", "status"),
+    )
+    
     # Relationships
     creator = relationship("User", back_populates="created_articles")
     source_job = relationship("ScanJob", back_populates="articles")
     task = relationship("Task", back_populates="article")
 
 
+# One AI generation run for an article, executed by the Celery worker (app/generation.py)
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    
+    job_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)  # also the Celery task id
+    article_id = Column(UUID(as_uuid=True), ForeignKey("articles.article_id", ondelete="CASCADE"), nullable=False)
+    created_by_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False)
+    idempotency_key = Column(String(255), nullable=True)  # Idempotency-Key header of the create request
+    priority = Column(String(10), default="default")  # high, default, low
+    status = Column(String(20), default="queued")  # queued, running, completed, failed
+    stage = Column(String(20), nullable=True)  # fetching, extracting, generating, saving
+    progress = Column(Integer, default=0)  # percent
+    attempts = Column(Integer, default=0)
+    tokens_used = Column(Integer, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)  # batch lane: retry backoff ends
+    
+    __table_args__ = (
+        Index("ix_generation_jobs_article_created_at", "article_id", "created_at"),
+        Index("ix_generation_jobs_user_idempotency_key", "created_by_id", "idempotency_key", unique=True),
+        # At most one queued or running job per article
+        Index(
+            "ix_generation_jobs_active_article", "article_id", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')")
+        ),
+    )
+    
+    # Relationships
+    article = relationship("Article")
+    creator = relationship("User")
+
+
 class ScanJob(Base):
     __tablename__ = "scan_jobs"
     
@@ -143,9 +231,80 @@ class ScanJob(Base):
     error_message = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_scan_jobs_created_at_id", "created_at", "scan_id"),
+        Index("ix_scan_jobs_status_created_at", "status", "created_at", "scan_id"),
+    )
+    
     # Relationships
     creator = relationship("User")
     articles = relationship("Article", back_populates="source_job")
+    items = relationship("ScanItem", back_populates="scan_job", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class ScanItem(Base):
+    __tablename__ = "scan_items"
+    
+    item_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    scan_id = Column(UUID(as_uuid=True), ForeignKey("scan_jobs.scan_id", ondelete="CASCADE"), nullable=False)
+    url = Column(String(1000), nullable=False)
+    title = Column(String(500), nullable=True)
+    filename = Column(String(255), nullable=False)  # unique within the scan, used in download URLs
+    content_type = Column(String(100), nullable=True)
+    size = Column(Integer, default=0)
+    content_hash = Column(String(64), nullable=False)  # sha256 of the body, key in the blob store
+    status_code = Column(Integer, nullable=True)
+    duplicate_of = Column(String(1000), nullable=True)  # URL already seen with the same content (app/dedup.py)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_scan_items_scan_fetched_at", "scan_id", "fetched_at", "item_id"),
+        Index("ix_scan_items_scan_filename", "scan_id", "filename", unique=True),
+        Index("ix_scan_items_content_hash", "content_hash"),
+    )
+    
+    # Relationships
+    scan_job = relationship("ScanJob", back_populates="items")
+
+
+# HTTP validators from the last successful fetch of a URL (app/fetch_validators.py)
+class FetchValidator(Base):
+    __tablename__ = "fetch_validators"
+    
+    url_hash = Column(String(64), primary_key=True)  # sha256 of the exact URL
+    url = Column(String(1000), nullable=False)
+    etag = Column(String(255), nullable=True)
+    last_modified = Column(String(64), nullable=True)  # Last-Modified header as sent
+    content_hash = Column(String(64), nullable=True)  # sha256 of the last body
+    checked_at = Column(DateTime(timezone=True), server_default=func.now())
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# One row per normalized URL seen by scans or article creation (app/dedup.py)
+class ContentFingerprint(Base):
+    __tablename__ = "content_fingerprints"
+    
+    fingerprint_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    url_hash = Column(String(64), unique=True, nullable=False)  # sha256 of the normalized URL
+    url = Column(String(1000), nullable=False)
+    simhash = Column(BigInteger, nullable=True)  # 64-bit SimHash of the page text, stored signed
+    # 16-bit quarters of simhash; a near duplicate matches at least one exactly
+    simhash_band0 = Column(Integer, nullable=True)
+    simhash_band1 = Column(Integer, nullable=True)
+    simhash_band2 = Column(Integer, nullable=True)
+    simhash_band3 = Column(Integer, nullable=True)
+    article_id = Column(UUID(as_uuid=True), ForeignKey("articles.article_id", ondelete="SET NULL"), nullable=True)
+    scan_id = Column(UUID(as_uuid=True), ForeignKey("scan_jobs.scan_id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_content_fingerprints_band0", "simhash_band0"),
+        Index("ix_content_fingerprints_band1", "simhash_band1"),
+        Index("ix_content_fingerprints_band2", "simhash_band2"),
+        Index("ix_content_fingerprints_band3", "simhash_band3"),
+        Index("ix_content_fingerprints_article_id", "article_id"),
+    )
 
 
 class Prompt(Base):
@@ -160,6 +319,13 @@ class Prompt(Base):
     usage_count = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        trigram_index("prompts", "name"),
+        trigram_index("prompts", "description"),
+        trigram_index("prompts", "content"),
+        Index("ix_prompts_usage_created_at", "usage_count", "created_at", "prompt_id"),
+    )
 
 
 class Source(Base):
@@ -173,8 +339,21 @@ class Source(Base):
     auto_scan = Column(Boolean, default=False)
     scan_frequency = Column(String(20), default="daily")  # daily, hourly, weekly
     last_scan_at = Column(DateTime(timezone=True), nullable=True)
+    next_scan_at = Column(DateTime(timezone=True), server_default=func.now())  # when auto_scan is due (app/scheduler.py)
     total_scans = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        trigram_index("sources", "name"),
+        trigram_index("sources", "url"),
+        trigram_index("sources", "category"),
+        Index("ix_sources_total_scans_created_at", "total_scans", "created_at", "source_id"),
+        Index(
+            "ix_sources_next_scan_at", "next_scan_at",
+            postgresql_where=text("auto_scan AND is_active"),
+            sqlite_where=text("auto_scan = 1 AND is_active = 1")
+        ),
+    )
 
 
 class AuditLog(Base):
@@ -194,6 +373,12 @@ class AuditLog(Base):
     user_agent = Column(Text, nullable=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_audit_logs_timestamp_id", "timestamp", "log_id"),
+        Index("ix_audit_logs_user_timestamp", "user_id", "timestamp"),
+        Index("ix_audit_logs_module_timestamp", "module", "timestamp"),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="audit_logs")
 
@@ -207,6 +392,16 @@ class ChatSession(Base):
     page_context = Column(String(100), nullable=True)
     started_at = Column(DateTime(timezone=True), server_default=func.now())
     last_activity = Column(DateTime(timezone=True), server_default=func.now())
+    # Rolling summary of the messages up to summary_through (app/assistant.py)
+    summary = Column(Text, nullable=True)
+    summary_through = Column(DateTime(timezone=True), nullable=True)
+    summary_tokens = Column(Integer, default=0)
+    
+    __table_args__ = (
+        Index("ix_chat_sessions_last_activity_id", "last_activity", "session_id"),
+        Index("ix_chat_sessions_user_last_activity", "user_id", "last_activity", "session_id"),
+        Index("ix_chat_sessions_started_at", "started_at"),
+    )
     
     # Relationships
     user = relationship("User", back_populates="chat_sessions")
@@ -224,6 +419,11 @@ class ChatMessage(Base):
     quick_actions = Column(JSON, nullable=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_chat_messages_session_timestamp", "session_id", "timestamp"),
+        Index("ix_chat_messages_timestamp", "timestamp"),
+    )
+    
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
 
@@ -241,6 +441,15 @@ class Notification(Base):
     notification_metadata = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_notifications_user_created_at", "user_id", "created_at", "notification_id"),
+        Index(
+            "ix_notifications_user_unread", "user_id", "created_at",
+            postgresql_where=text("is_read = false"),
+            sqlite_where=text("is_read = 0")
+        ),
+    )
+    
     # Relationships
     user = relationship("User", back_populates="notifications")
 
@@ -255,6 +464,11 @@ class UsageTracking(Base):
     cost_usd = Column(Float, nullable=False)
     usage_metadata = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_usage_tracking_created_at_action", "created_at", "action"),
+        Index("ix_usage_tracking_user_created_at", "user_id", "created_at"),
+    )
 
 
 class SystemSettings(Base):
@@ -265,3 +479,22 @@ class SystemSettings(Base):
     value = Column(Text, nullable=False)
     description = Column(Text, nullable=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+    
+    # entity|day|bucket|department_id|user_id, used as the upsert target
+    rollup_key = Column(String(200), primary_key=True)
+    day = Column(Date, nullable=False, index=True)
+    entity = Column(String(20), nullable=False)  # task, article, scan_job, usage
+    bucket = Column(String(50), nullable=True)  # status for task/article/scan_job, action for usage
+    department_id = Column(UUID(as_uuid=True), nullable=True)
+    user_id = Column(UUID(as_uuid=True), nullable=True)
+    count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)  # items_found for scan_job, tokens_used for usage
+    cost_usd = Column(Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        Index("ix_daily_rollups_entity_day", "entity", "day"),
+    )
@@ -0,0 +1,138 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Rows are ordered by a fixed descending sort key that ends with the primary
+key, e.g. ``(created_at, id)``. The cursor returned with a page encodes the
+sort key of its last row, and the next page is read with
+``WHERE (created_at, id) < (:created_at, :id)`` so it costs the same index
+seek however deep the client pages. ``skip`` keeps working for clients that
+have not switched to cursors, and for ranked lists (``order_first``, e.g.
+search relevance), which cannot be expressed as a keyset.
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import desc, func, text, tuple_
+from sqlalchemy.orm import Query
+
+# Totals: "exact" runs COUNT(*), "estimate" stops counting at this many rows
+# (or reads the planner estimate for unfiltered tables), "none" skips it
+TOTAL_MODE_PATTERN = "^(exact|estimate|none)$"
+ESTIMATE_COUNT_CAP = 10000
+
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _decode_value(column, value: Any):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type in (datetime, uuid.UUID) and not isinstance(value, str):
+        raise ValueError(f"{column.key} must be a string")
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    return python_type(value)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor for the sort key values of a row"""
+    raw = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    """Sort key values from a cursor; 400 if it is malformed or for another list"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match sort key")
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def count_total(query: Query, mode: str = "exact") -> Tuple[Optional[int], bool]:
+    """Total rows of the filtered query as (total, is_estimate)"""
+    if mode == "none":
+        return None, False
+    if mode == "exact":
+        return query.order_by(None).count(), False
+
+    session = query.session
+    if query.whereclause is None and session.get_bind().dialect.name == "postgresql":
+        # Planner statistics, refreshed by autovacuum/ANALYZE
+        table = query.column_descriptions[0]["entity"].__table__
+        estimate = session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:name AS regclass)"),
+            {"name": table.name}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate), True
+
+    # Count at most cap + 1 rows: exact below the cap, a lower bound above it
+    capped = query.order_by(None).limit(ESTIMATE_COUNT_CAP + 1).subquery()
+    total = session.query(func.count()).select_from(capped).scalar()
+    return total, total > ESTIMATE_COUNT_CAP
+
+
+def paginate(
+    query: Query,
+    sort_key: Sequence,
+    limit: int,
+    skip: int = 0,
+    after: Optional[str] = None,
+    total_mode: Optional[str] = None,
+    options: Sequence = (),
+    order_first: Sequence = ()
+) -> dict:
+    """One page of query ordered by sort_key (all descending, unique last column)
+
+    Returns the keyword arguments for ``PaginatedResponse`` except ``items``,
+    plus ``rows`` holding the ORM objects of the page. Without an explicit
+    ``total_mode`` the exact total is computed for the first page only.
+    ``order_first`` expressions sort ahead of the key; such pages use skip
+    and return no cursor.
+    """
+    if total_mode is None:
+        total_mode = "exact" if after is None else "none"
+    total, total_is_estimate = count_total(query, total_mode)
+
+    if after is not None and not order_first:
+        values = decode_cursor(after, sort_key)
+        query = query.filter(tuple_(*sort_key) < tuple_(*values))
+        skip = 0
+
+    rows = query.options(*options)\
+        .order_by(*order_first, *[desc(column) for column in sort_key])\
+        .offset(skip).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and not order_first:
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in sort_key])
+
+    return {
+        "rows": rows,
+        "total": total,
+        "total_is_estimate": total_is_estimate,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }
@@ -0,0 +1,226 @@
+"""
+Cache of AI responses, so repeated questions and regenerations of the same
+source are not paid for twice.
+
+Exact tier: the key is a hash of the kind ("chat", "generation"), model,
+options and messages, with each message normalized (Unicode NFC, case and
+whitespace folded). Entries live in ``AI_CACHE_BACKEND`` (memory, disk or
+redis) with a TTL; memory and disk evict the least recently used entries
+past ``AI_CACHE_MAX_ENTRIES``, Redis by its maxmemory-policy.
+
+Semantic tier (chat only, ``AI_CACHE_SEMANTIC``): a question whose embedding
+is within ``AI_CACHE_SIMILARITY_THRESHOLD`` cosine similarity of a cached
+question asked in the same context (same system prompts, page context and
+options) gets that answer. The similarity index is kept per process; the
+answers it points to are in the shared store. Generation inputs are whole
+source articles, where only an exact match is the same request.
+
+Only complete answers (finish reason "stop") are stored. Hits, misses and
+the tokens they saved are counted per process (``cache_metrics``) and
+cached replies are recorded in ``UsageTracking`` at zero cost.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import operator
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import anyio
+
+from app.cache import MemoryCache, create_cache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("chat", "generation")
+SEMANTIC_ENTRIES_PER_CONTEXT = 256
+
+
+class CacheMetrics:
+    """Hit/miss counters of the response cache, per kind"""
+
+    FIELDS = ("exact_hits", "semantic_hits", "misses", "stores", "tokens_saved")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {kind: dict.fromkeys(self.FIELDS, 0) for kind in KINDS}
+
+    def add(self, kind: str, field: str, amount: int = 1):
+        with self._lock:
+            self.counts[kind][field] += amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = {}
+            for kind, counts in self.counts.items():
+                lookups = counts["exact_hits"] + counts["semantic_hits"] + counts["misses"]
+                hits = counts["exact_hits"] + counts["semantic_hits"]
+                state[kind] = dict(counts, lookups=lookups, hit_rate=round(hits / lookups, 4) if lookups else 0.0)
+        return {
+            "enabled": settings.ai_cache_enabled,
+            "backend": settings.ai_cache_backend,
+            "semantic": settings.ai_cache_semantic,
+            **state,
+        }
+
+
+cache_metrics = CacheMetrics()
+
+_store = None
+_semantic_index: Optional[MemoryCache] = None
+_recent_embeddings: Optional[MemoryCache] = None
+
+
+def _get_store():
+    global _store
+    if _store is None:
+        _store = create_cache(
+            "ai_responses", settings.ai_cache_ttl_seconds, settings.ai_cache_backend, settings.ai_cache_max_entries
+        )
+    return _store
+
+
+def _get_semantic_index() -> MemoryCache:
+    """Context hash -> OrderedDict of exact key -> unit question embedding"""
+    global _semantic_index
+    if _semantic_index is None:
+        _semantic_index = MemoryCache("ai_semantic", settings.ai_cache_ttl_seconds, max_entries=1024)
+    return _semantic_index
+
+
+def _get_recent_embeddings() -> MemoryCache:
+    """Exact key -> question embedding computed by a lookup that missed"""
+    global _recent_embeddings
+    if _recent_embeddings is None:
+        _recent_embeddings = MemoryCache("ai_embeddings", 600, max_entries=1024)
+    return _recent_embeddings
+
+
+def normalize(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text or "").casefold().split())
+
+
+def _hash(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def cache_key(kind: str, model: str, messages: List[Dict], **options) -> str:
+    """Exact-tier key of a completion request"""
+    normalized = [[m["role"], normalize(m["content"])] for m in messages]
+    return _hash({"kind": kind, "model": model, "options": options, "messages": normalized})
+
+
+def _context_key(kind: str, model: str, messages: List[Dict], **options) -> str:
+    """Key of everything but the final question, which the semantic tier compares"""
+    return cache_key(kind, model, messages[:-1], **options)
+
+
+def get(kind: str, key: str) -> Optional[Dict]:
+    """Exact-tier lookup: cached answer (content, prompt_tokens, completion_tokens) or None"""
+    if not settings.ai_cache_enabled:
+        return None
+    entry = _get_store().get(key)
+    if entry is None:
+        cache_metrics.add(kind, "misses")
+        return None
+    cache_metrics.add(kind, "exact_hits")
+    cache_metrics.add(kind, "tokens_saved", entry["prompt_tokens"] + entry["completion_tokens"])
+    return entry
+
+
+def put(kind: str, key: str, content: str, prompt_tokens: int, completion_tokens: int):
+    """Store a complete answer under key"""
+    if not settings.ai_cache_enabled or not content:
+        return
+    _get_store().set(key, {
+        "content": content,
+        "prompt_tokens": prompt_tokens or 0,
+        "completion_tokens": completion_tokens or 0,
+        "stored_at": time.time(),
+    })
+    cache_metrics.add(kind, "stores")
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+async def _embed(text: str) -> Optional[List[float]]:
+    from app.llm import LLMError, embed
+
+    try:
+        return _unit(await embed(text, settings.ai_cache_embedding_model))
+    except LLMError as e:
+        logger.warning("Semantic cache skipped, embedding failed: %s", e)
+        return None
+
+
+async def lookup_chat(messages: List[Dict], model: str, **options) -> Optional[Dict]:
+    """Cached answer to a chat request (exact, then semantic tier) or None
+
+    The answer carries ``cache``: "exact" or "semantic".
+    """
+    if not settings.ai_cache_enabled:
+        return None
+    key = cache_key("chat", model, messages, **options)
+    # Disk and Redis lookups block; keep them off the event loop
+    entry = await anyio.to_thread.run_sync(_get_store().get, key)
+    if entry is not None:
+        cache_metrics.add("chat", "exact_hits")
+        cache_metrics.add("chat", "tokens_saved", entry["prompt_tokens"] + entry["completion_tokens"])
+        return dict(entry, cache="exact")
+
+    if settings.ai_cache_semantic:
+        candidates = _get_semantic_index().get(_context_key("chat", model, messages, **options))
+        if candidates:
+            question = await _embed(messages[-1]["content"])
+            if question is not None:
+                # store_chat indexes the answer under the same embedding
+                _get_recent_embeddings().set(key, question)
+                best_key, best_score = None, -1.0
+                for candidate_key, vector in list(candidates.items()):
+                    score = sum(map(operator.mul, question, vector))
+                    if score > best_score:
+                        best_key, best_score = candidate_key, score
+                if best_score >= settings.ai_cache_similarity_threshold:
+                    entry = await anyio.to_thread.run_sync(_get_store().get, best_key)
+                    if entry is None:
+                        # Expired or evicted from the shared store
+                        candidates.pop(best_key, None)
+                    else:
+                        cache_metrics.add("chat", "semantic_hits")
+                        cache_metrics.add("chat", "tokens_saved", entry["prompt_tokens"] + entry["completion_tokens"])
+                        return dict(entry, cache="semantic", similarity=round(best_score, 4))
+
+    cache_metrics.add("chat", "misses")
+    return None
+
+
+async def store_chat(messages: List[Dict], model: str, content: str, prompt_tokens: int, completion_tokens: int, **options):
+    """Store a complete chat answer in both tiers"""
+    if not settings.ai_cache_enabled or not content:
+        return
+    key = cache_key("chat", model, messages, **options)
+    await anyio.to_thread.run_sync(put, "chat", key, content, prompt_tokens, completion_tokens)
+    if not settings.ai_cache_semantic:
+        return
+    vector = _get_recent_embeddings().get(key) or await _embed(messages[-1]["content"])
+    if vector is None:
+        return
+    index = _get_semantic_index()
+    context = _context_key("chat", model, messages, **options)
+    candidates = index.get(context)
+    if candidates is None:
+        candidates = OrderedDict()
+        index.set(context, candidates)
+    candidates[key] = vector
+    candidates.move_to_end(key)
+    while len(candidates) > SEMANTIC_ENTRIES_PER_CONTEXT:
+        candidates.popitem(last=False)
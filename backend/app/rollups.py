@@ -0,0 +1,338 @@
+"""
+Daily rollups for dashboard analytics.
+
+Tasks, articles, scan jobs and usage records are summarized per day in
+``daily_rollups``. Rows are kept up to date on every ORM flush (insert,
+status/owner change, delete), so analytics read a bounded number of rollup
+rows instead of scanning history. ``rebuild_rollups`` recomputes everything
+from the raw tables (backfill or repair).
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import event, func, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy import inspect as sa_inspect
+from app.models import Task, Article, ScanJob, UsageTracking, DailyRollup
+from app.utils import to_utc_naive
+
+# Which columns of each model feed the rollup dimensions and measures
+ROLLUP_SPECS = {
+    Task: {
+        "entity": "task",
+        "timestamp": "created_at",
+        "bucket": "status",
+        "department_id": "department_id",
+        "user_id": "assignee_id",
+    },
+    Article: {
+        "entity": "article",
+        "timestamp": "created_at",
+        "bucket": "status",
+        "user_id": "created_by_id",
+    },
+    ScanJob: {
+        "entity": "scan_job",
+        "timestamp": "created_at",
+        "bucket": "status",
+        "user_id": "created_by_id",
+        "quantity": "items_found",
+    },
+    UsageTracking: {
+        "entity": "usage",
+        "timestamp": "created_at",
+        "bucket": "action",
+        "user_id": "user_id",
+        "quantity": "tokens_used",
+        "cost_usd": "cost_usd",
+    },
+}
+
+ENTITY_MODELS = {spec["entity"]: model for model, spec in ROLLUP_SPECS.items()}
+
+DIMENSIONS = ("bucket", "department_id", "user_id")
+
+
+def _tracked_attributes(spec: dict) -> List[str]:
+    return [spec[name] for name in ("timestamp", "bucket", "department_id", "user_id", "quantity", "cost_usd")
+            if name in spec]
+
+
+def rollup_key(entity: str, day: date, bucket, department_id, user_id) -> str:
+    """Primary key of the rollup row for one combination of dimensions"""
+    return "|".join([
+        entity,
+        day.isoformat(),
+        str(bucket) if bucket is not None else "",
+        str(department_id) if department_id is not None else "",
+        str(user_id) if user_id is not None else "",
+    ])
+
+
+def _rollup_day(timestamp: Optional[datetime]) -> date:
+    if timestamp is None:
+        # Not inserted yet: server_default now() will stamp it today
+        return datetime.utcnow().date()
+    return to_utc_naive(timestamp).date()
+
+
+def _current_value(obj, attr: str, is_new: bool):
+    value = getattr(obj, attr)
+    if value is None and is_new:
+        # Python-side column defaults are only applied at INSERT time
+        column = obj.__table__.c[attr]
+        if column.default is not None and column.default.is_scalar:
+            value = column.default.arg
+    return value
+
+
+def _committed_value(obj, attr: str):
+    history = sa_inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _rollup_entry(spec: dict, read) -> Tuple[tuple, int, float]:
+    """Dimension tuple and measures of one row, using read(attr) for values"""
+    dims = (
+        spec["entity"],
+        _rollup_day(read(spec["timestamp"])),
+        read(spec["bucket"]),
+        read(spec["department_id"]) if "department_id" in spec else None,
+        read(spec["user_id"]) if "user_id" in spec else None,
+    )
+    quantity = (read(spec["quantity"]) or 0) if "quantity" in spec else 0
+    cost = (read(spec["cost_usd"]) or 0.0) if "cost_usd" in spec else 0.0
+    return dims, quantity, cost
+
+
+def _add_delta(deltas: dict, entry: Tuple[tuple, int, float], sign: int):
+    dims, quantity, cost = entry
+    delta = deltas[dims]
+    delta[0] += sign
+    delta[1] += sign * quantity
+    delta[2] += sign * cost
+
+
+def _collect_deltas(session: Session, flush_context, instances):
+    deltas = defaultdict(lambda: [0, 0, 0.0])
+
+    for obj in session.new:
+        spec = ROLLUP_SPECS.get(type(obj))
+        if spec:
+            _add_delta(deltas, _rollup_entry(spec, lambda attr: _current_value(obj, attr, True)), 1)
+
+    for obj in session.dirty:
+        spec = ROLLUP_SPECS.get(type(obj))
+        if not spec:
+            continue
+        state = sa_inspect(obj)
+        if not any(state.attrs[attr].history.has_changes() for attr in _tracked_attributes(spec)):
+            continue
+        _add_delta(deltas, _rollup_entry(spec, lambda attr: _committed_value(obj, attr)), -1)
+        _add_delta(deltas, _rollup_entry(spec, lambda attr: _current_value(obj, attr, False)), 1)
+
+    for obj in session.deleted:
+        spec = ROLLUP_SPECS.get(type(obj))
+        if spec:
+            _add_delta(deltas, _rollup_entry(spec, lambda attr: _committed_value(obj, attr)), -1)
+
+    session.info["rollup_deltas"] = {
+        dims: delta for dims, delta in deltas.items() if any(delta)
+    }
+
+
+def _apply_deltas(session: Session, flush_context):
+    deltas = session.info.pop("rollup_deltas", None)
+    if not deltas:
+        return
+
+    connection = session.connection()
+    rows = [
+        {
+            "rollup_key": rollup_key(*dims),
+            "entity": dims[0],
+            "day": dims[1],
+            "bucket": dims[2],
+            "department_id": dims[3],
+            "user_id": dims[4],
+            "count": delta[0],
+            "quantity": delta[1],
+            "cost_usd": delta[2],
+        }
+        for dims, delta in deltas.items()
+    ]
+
+    dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(DailyRollup).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[DailyRollup.rollup_key],
+        set_={
+            "count": DailyRollup.count + statement.excluded.count,
+            "quantity": DailyRollup.quantity + statement.excluded.quantity,
+            "cost_usd": DailyRollup.cost_usd + statement.excluded.cost_usd,
+        }
+    )
+    connection.execute(statement)
+
+
+def _track_old_values():
+    # Make sure the pre-update value is loaded when a tracked column is
+    # assigned on an expired instance, so the old bucket can be decremented.
+    for model, spec in ROLLUP_SPECS.items():
+        for attr in _tracked_attributes(spec):
+            event.listen(getattr(model, attr), "set", lambda *args: None, active_history=True)
+
+
+_track_old_values()
+event.listen(Session, "before_flush", _collect_deltas)
+event.listen(Session, "after_flush", _apply_deltas)
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute all rollup rows from the raw tables; returns number of rows written"""
+    db.execute(delete(DailyRollup))
+    # The UTC day, as _rollup_day buckets it (SQLite keeps naive UTC already)
+    postgres = db.get_bind().dialect.name == "postgresql"
+
+    written = 0
+    for model, spec in ROLLUP_SPECS.items():
+        timestamp = getattr(model, spec["timestamp"])
+        if postgres:
+            timestamp = func.timezone("UTC", timestamp)
+        dimensions = [
+            func.date(timestamp).label("day"),
+            getattr(model, spec["bucket"]).label("bucket"),
+        ]
+        for name in ("department_id", "user_id"):
+            if name in spec:
+                dimensions.append(getattr(model, spec[name]).label(name))
+        measures = [func.count().label("count")]
+        if "quantity" in spec:
+            measures.append(func.coalesce(func.sum(getattr(model, spec["quantity"])), 0).label("quantity"))
+        if "cost_usd" in spec:
+            measures.append(func.coalesce(func.sum(getattr(model, spec["cost_usd"])), 0).label("cost_usd"))
+
+        rows = db.query(*dimensions, *measures).group_by(*dimensions).all()
+        for row in rows:
+            values = row._mapping
+            day = values["day"]
+            if isinstance(day, str):
+                day = date.fromisoformat(day)
+            department_id = values.get("department_id")
+            user_id = values.get("user_id")
+            db.add(DailyRollup(
+                rollup_key=rollup_key(spec["entity"], day, values["bucket"], department_id, user_id),
+                entity=spec["entity"],
+                day=day,
+                bucket=values["bucket"],
+                department_id=department_id,
+                user_id=user_id,
+                count=values["count"],
+                quantity=values.get("quantity", 0),
+                cost_usd=float(values.get("cost_usd", 0.0))
+            ))
+            written += 1
+
+    db.commit()
+    return written
+
+
+def _split_range(date_from: datetime, date_to: datetime):
+    """Split [date_from, date_to] into whole days and partial-day edges
+
+    Returns ((first_day, end_day) or None, [(start, end, end_inclusive), ...]);
+    whole days are read from rollups, the edges (at most two partial days)
+    from raw rows.
+    """
+    date_from = to_utc_naive(date_from)
+    date_to = to_utc_naive(date_to)
+    if date_to < date_from:
+        return None, []
+
+    first_day = date_from.date()
+    if date_from.time() != time.min:
+        first_day += timedelta(days=1)
+    end_day = date_to.date()
+
+    if first_day >= end_day:
+        return None, [(date_from, date_to, True)]
+
+    edges = []
+    if date_from < datetime.combine(first_day, time.min):
+        edges.append((date_from, datetime.combine(first_day, time.min), False))
+    edges.append((datetime.combine(end_day, time.min), date_to, True))
+    return (first_day, end_day), edges
+
+
+def rollup_totals(
+    db: Session,
+    entity: str,
+    date_from: datetime,
+    date_to: datetime,
+    group_by: str = "bucket",
+    bucket: Optional[str] = None
+) -> Dict[Any, Dict[str, Any]]:
+    """Totals per dimension value for rows created in [date_from, date_to]
+
+    ``group_by`` is one of "bucket", "department_id", "user_id"; ``bucket``
+    optionally restricts to one status/action. Each value maps to
+    {"count", "quantity", "cost_usd"}.
+    """
+    if group_by not in DIMENSIONS:
+        raise ValueError(f"Unknown rollup dimension: {group_by}")
+
+    model = ENTITY_MODELS[entity]
+    spec = ROLLUP_SPECS[model]
+    totals = defaultdict(lambda: {"count": 0, "quantity": 0, "cost_usd": 0.0})
+
+    def accumulate(rows):
+        for key, count, quantity, cost in rows:
+            entry = totals[key]
+            entry["count"] += count or 0
+            entry["quantity"] += int(quantity or 0)
+            entry["cost_usd"] += float(cost or 0.0)
+
+    days, edges = _split_range(date_from, date_to)
+
+    if days:
+        dimension = getattr(DailyRollup, group_by)
+        query = db.query(
+            dimension,
+            func.sum(DailyRollup.count),
+            func.sum(DailyRollup.quantity),
+            func.sum(DailyRollup.cost_usd)
+        ).filter(
+            DailyRollup.entity == entity,
+            DailyRollup.day >= days[0],
+            DailyRollup.day < days[1]
+        )
+        if bucket is not None:
+            query = query.filter(DailyRollup.bucket == bucket)
+        accumulate(query.group_by(dimension).all())
+
+    if group_by not in spec:
+        # Entity has no such dimension; raw rows all fall under None
+        dimension = None
+    else:
+        dimension = getattr(model, spec[group_by])
+    timestamp = getattr(model, spec["timestamp"])
+    quantity = func.sum(getattr(model, spec["quantity"])) if "quantity" in spec else func.sum(0)
+    cost = func.sum(getattr(model, spec["cost_usd"])) if "cost_usd" in spec else func.sum(0)
+    for start, end, end_inclusive in edges:
+        columns = [func.count(), quantity, cost]
+        query = db.query(dimension, *columns) if dimension is not None else db.query(*columns)
+        query = query.filter(timestamp >= start, timestamp <= end if end_inclusive else timestamp < end)
+        if bucket is not None:
+            query = query.filter(getattr(model, spec["bucket"]) == bucket)
+        if dimension is not None:
+            accumulate(query.group_by(dimension).all())
+        else:
+            accumulate((None, *row) for row in query.all())
+
+    return dict(totals)
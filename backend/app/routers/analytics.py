@@ -1,8 +1,12 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc, extract
+from sqlalchemy import func, and_, or_, desc, extract, select, literal, union_all, DateTime
 from app.database import get_db
+from app.pagination import paginate, TOTAL_MODE_PATTERN
+from app.aggregates import aggregate, count_where
+from app.rollups import rollup_totals
+from app.utils import to_utc_naive
 from app.auth import get_current_user, require_permission
 from app.models import (
     User, Task, Article, ScanJob, UsageTracking, AuditLog,
@@ -19,7 +23,7 @@ router = APIRouter(prefix="/api/v1", tags=["Analytics & Reporting"])
 
 
 @router.get("/analytics/usage", response_model=UsageStatsResponse)
-async def get_usage_statistics(
+def get_usage_statistics(
     date_from: datetime = Query(..., description="Start date for statistics"),
     date_to: datetime = Query(..., description="End date for statistics"),
     group_by: Optional[str] = Query(None, description="Group by: user, department, day, week, month"),
@@ -27,107 +31,73 @@ async def get_usage_statistics(
     current_user: User = Depends(require_permission("bao-cao", "view"))
 ):
     """Get usage statistics for AI services"""
-    # Base query for usage tracking
-    query = db.query(UsageTracking).filter(
-        and_(
-            UsageTracking.created_at >= date_from,
-            UsageTracking.created_at <= date_to
-        )
-    )
+    # Per-action and per-user totals come from daily rollups (plus raw rows
+    # for the partial first/last day), so cost does not grow with history
+    by_action_totals = rollup_totals(db, "usage", date_from, date_to, group_by="bucket")
+    by_user_totals = rollup_totals(db, "usage", date_from, date_to, group_by="user_id")
     
     # Get total statistics
-    total_requests = query.count()
-    total_tokens = db.query(func.sum(UsageTracking.tokens_used)).filter(
-        and_(
-            UsageTracking.created_at >= date_from,
-            UsageTracking.created_at <= date_to
-        )
-    ).scalar() or 0
-    
-    total_cost_usd = db.query(func.sum(UsageTracking.cost_usd)).filter(
-        and_(
-            UsageTracking.created_at >= date_from,
-            UsageTracking.created_at <= date_to
-        )
-    ).scalar() or 0.0
+    total_requests = sum(stat["count"] for stat in by_action_totals.values())
+    total_tokens = sum(stat["quantity"] for stat in by_action_totals.values())
+    total_cost_usd = sum(stat["cost_usd"] for stat in by_action_totals.values())
     
     # Get statistics by action
     by_action = {}
     actions = ["article_generation", "ai_chat", "scan_job", "prompt_test"]
     for action in actions:
-        action_query = query.filter(UsageTracking.action == action)
-        count = action_query.count()
-        tokens = db.query(func.sum(UsageTracking.tokens_used)).filter(
-            and_(
-                UsageTracking.created_at >= date_from,
-                UsageTracking.created_at <= date_to,
-                UsageTracking.action == action
-            )
-        ).scalar() or 0
-        cost = db.query(func.sum(UsageTracking.cost_usd)).filter(
-            and_(
-                UsageTracking.created_at >= date_from,
-                UsageTracking.created_at <= date_to,
-                UsageTracking.action == action
-            )
-        ).scalar() or 0.0
-        
+        stat = by_action_totals.get(action, {"count": 0, "quantity": 0, "cost_usd": 0.0})
         by_action[action] = {
-            "count": count,
-            "tokens": tokens,
-            "cost_usd": cost
+            "count": stat["count"],
+            "tokens": stat["quantity"],
+            "cost_usd": stat["cost_usd"]
+        }
+    
+    users = {}
+    user_ids = [user_id for user_id in by_user_totals if user_id is not None]
+    if user_ids:
+        users = {
+            user.user_id: user
+            for user in db.query(User).filter(User.user_id.in_(user_ids)).all()
         }
     
     # Get statistics by user
     by_user = []
-    user_stats = db.query(
-        UsageTracking.user_id,
-        func.count(UsageTracking.id).label('requests'),
-        func.sum(UsageTracking.tokens_used).label('tokens'),
-        func.sum(UsageTracking.cost_usd).label('cost_usd')
-    ).filter(
-        and_(
-            UsageTracking.created_at >= date_from,
-            UsageTracking.created_at <= date_to
-        )
-    ).group_by(UsageTracking.user_id).all()
-    
-    for stat in user_stats:
-        user = db.query(User).filter(User.user_id == stat.user_id).first()
+    for user_id, stat in by_user_totals.items():
+        user = users.get(user_id)
         if user:
             by_user.append({
-                "user_id": str(stat.user_id),
+                "user_id": str(user_id),
                 "user_name": user.full_name,
-                "requests": stat.requests,
-                "tokens": stat.tokens or 0,
-                "cost_usd": float(stat.cost_usd or 0)
+                "requests": stat["count"],
+                "tokens": stat["quantity"],
+                "cost_usd": float(stat["cost_usd"])
             })
     
-    # Get statistics by department
-    by_department = []
-    dept_stats = db.query(
-        User.department_id,
-        func.count(UsageTracking.id).label('requests'),
-        func.sum(UsageTracking.tokens_used).label('tokens'),
-        func.sum(UsageTracking.cost_usd).label('cost_usd')
-    ).join(User, UsageTracking.user_id == User.user_id).filter(
-        and_(
-            UsageTracking.created_at >= date_from,
-            UsageTracking.created_at <= date_to
+    # Get statistics by department (users' current department)
+    department_totals = {}
+    for user_id, stat in by_user_totals.items():
+        user = users.get(user_id)
+        if not user or not user.department_id:
+            continue
+        totals = department_totals.setdefault(
+            user.department_id, {"requests": 0, "tokens": 0, "cost_usd": 0.0}
         )
-    ).group_by(User.department_id).all()
+        totals["requests"] += stat["count"]
+        totals["tokens"] += stat["quantity"]
+        totals["cost_usd"] += stat["cost_usd"]
     
-    for stat in dept_stats:
-        if stat.department_id:
-            dept = db.query(Department).filter(Department.id == stat.department_id).first()
-            if dept:
-                by_department.append({
-                    "department_id": str(stat.department_id),
-                    "department_name": dept.name,
-                    "requests": stat.requests,
-                    "tokens": stat.tokens or 0,
-                    "cost_usd": float(stat.cost_usd or 0)
-                })
+    by_department = []
+    if department_totals:
+        departments = db.query(Department).filter(Department.id.in_(list(department_totals))).all()
+        for dept in departments:
+            totals = department_totals[dept.id]
+            by_department.append({
+                "department_id": str(dept.id),
+                "department_name": dept.name,
+                "requests": totals["requests"],
+                "tokens": totals["tokens"],
+                "cost_usd": float(totals["cost_usd"])
+            })
     
     return UsageStatsResponse(
         period={"from": date_from, "to": date_to},
@@ -141,7 +111,7 @@ async def get_usage_statistics(
 
 
 @router.post("/analytics/track")
-async def track_api_usage(
+def track_api_usage(
     user_id: str,
     action: str,
     tokens_used: int,
@@ -158,7 +128,7 @@ async def track_api_usage(
         action=action,
         tokens_used=tokens_used,
         cost_usd=cost_usd,
-        metadata=metadata
+        usage_metadata=metadata
     )
     
     db.add(usage_record)
@@ -168,7 +138,7 @@ async def track_api_usage(
 
 
 @router.get("/analytics/dashboard", response_model=DashboardAnalyticsResponse)
-async def get_dashboard_analytics(
+def get_dashboard_analytics(
     period: str = Query("this_month", description="Period: today, this_week, this_month, last_30_days"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("bao-cao", "view"))
@@ -193,46 +163,55 @@ async def get_dashboard_analytics(
         date_from = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         date_to = now
     
+    # Task, article, scan and AI usage totals come from daily rollups
+    task_stats = rollup_totals(db, "task", date_from, date_to)
+    article_stats = rollup_totals(db, "article", date_from, date_to)
+    scan_stats = rollup_totals(db, "scan_job", date_from, date_to)
+    usage_stats = rollup_totals(db, "usage", date_from, date_to)
+    
+    def bucket_count(stats: dict, bucket: str) -> int:
+        return stats.get(bucket, {}).get("count", 0)
+    
     # Task statistics
-    task_query = db.query(Task).filter(Task.created_at >= date_from)
-    total_tasks = task_query.count()
-    completed_tasks = task_query.filter(Task.status == "completed").count()
-    in_progress_tasks = task_query.filter(Task.status == "in_progress").count()
-    overdue_tasks = task_query.filter(
-        and_(Task.due_date < now, Task.status.in_(["todo", "in_progress"]))
+    total_tasks = sum(stat["count"] for stat in task_stats.values())
+    completed_tasks = bucket_count(task_stats, "completed")
+    in_progress_tasks = bucket_count(task_stats, "in_progress")
+    # Overdue depends on the current time, so it is read from open tasks directly
+    overdue_tasks = db.query(Task).filter(
+        and_(
+            Task.created_at >= date_from,
+            Task.due_date < now,
+            Task.status.in_(["todo", "in_progress"])
+        )
     ).count()
     completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
     
     # Article statistics
-    article_query = db.query(Article).filter(Article.created_at >= date_from)
-    total_articles = article_query.count()
-    draft_articles = article_query.filter(Article.status == "draft").count()
-    published_articles = article_query.filter(Article.status == "published").count()
-    processing_articles = article_query.filter(Article.status == "processing").count()
+    total_articles = sum(stat["count"] for stat in article_stats.values())
+    draft_articles = bucket_count(article_stats, "draft")
+    published_articles = bucket_count(article_stats, "published")
+    processing_articles = bucket_count(article_stats, "processing")
     
     # Scan statistics
-    scan_query = db.query(ScanJob).filter(ScanJob.created_at >= date_from)
-    total_scans = scan_query.count()
-    completed_scans = scan_query.filter(ScanJob.status == "completed").count()
-    failed_scans = scan_query.filter(ScanJob.status == "failed").count()
-    total_items_found = db.query(func.sum(ScanJob.items_found)).filter(
-        and_(ScanJob.created_at >= date_from, ScanJob.status == "completed")
-    ).scalar() or 0
+    total_scans = sum(stat["count"] for stat in scan_stats.values())
+    completed_scans = bucket_count(scan_stats, "completed")
+    failed_scans = bucket_count(scan_stats, "failed")
+    total_items_found = scan_stats.get("completed", {}).get("quantity", 0)
     
     # User statistics
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.status == "active").count()
-    inactive_users = db.query(User).filter(User.status == "inactive").count()
+    user_stats = aggregate(db.query(User), {
+        "total": count_where(),
+        "active": count_where(User.status == "active"),
+        "inactive": count_where(User.status == "inactive")
+    })
+    total_users = user_stats["total"]
+    active_users = user_stats["active"]
+    inactive_users = user_stats["inactive"]
     
     # AI usage statistics
-    ai_usage_query = db.query(UsageTracking).filter(UsageTracking.created_at >= date_from)
-    total_ai_requests = ai_usage_query.count()
-    total_ai_tokens = db.query(func.sum(UsageTracking.tokens_used)).filter(
-        UsageTracking.created_at >= date_from
-    ).scalar() or 0
-    total_ai_cost = db.query(func.sum(UsageTracking.cost_usd)).filter(
-        UsageTracking.created_at >= date_from
-    ).scalar() or 0.0
+    total_ai_requests = sum(stat["count"] for stat in usage_stats.values())
+    total_ai_tokens = sum(stat["quantity"] for stat in usage_stats.values())
+    total_ai_cost = sum(stat["cost_usd"] for stat in usage_stats.values())
     
     return DashboardAnalyticsResponse(
         tasks={
@@ -267,8 +246,25 @@ async def get_dashboard_analytics(
     )
 
 
+TIMELINE_STEPS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1)
+}
+
+
+def _truncate(dt: datetime, unit: str) -> datetime:
+    """Truncate datetime to the start of its hour/day/week bucket (weeks start on Monday)"""
+    if unit == "hour":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    dt = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == "week":
+        dt = dt - timedelta(days=dt.weekday())
+    return dt
+
+
 @router.get("/analytics/activity-timeline")
-async def get_activity_timeline(
+def get_activity_timeline(
     date_from: datetime = Query(..., description="Start date for timeline"),
     date_to: datetime = Query(..., description="End date for timeline"),
     group_by: str = Query("day", description="Group by: hour, day, week"),
@@ -276,146 +272,66 @@ async def get_activity_timeline(
     current_user: User = Depends(require_permission("bao-cao", "view"))
 ):
     """Get activity timeline"""
-    timeline = []
+    step = TIMELINE_STEPS.get(group_by)
+    if step is None:
+        return {"timeline": []}
     
-    # Generate timeline based on group_by
-    if group_by == "hour":
-        # Group by hour
-        current = date_from.replace(minute=0, second=0, microsecond=0)
-        while current <= date_to:
-            next_hour = current + timedelta(hours=1)
-            
-            # Get activity counts for this hour
-            tasks_created = db.query(Task).filter(
-                and_(Task.created_at >= current, Task.created_at < next_hour)
-            ).count()
-            
-            tasks_completed = db.query(Task).filter(
-                and_(Task.completed_at >= current, Task.completed_at < next_hour)
-            ).count()
-            
-            articles_created = db.query(Article).filter(
-                and_(Article.created_at >= current, Article.created_at < next_hour)
-            ).count()
-            
-            articles_published = db.query(Article).filter(
-                and_(Article.updated_at >= current, Article.updated_at < next_hour, Article.status == "published")
-            ).count()
-            
-            scans_run = db.query(ScanJob).filter(
-                and_(ScanJob.started_at >= current, ScanJob.started_at < next_hour)
-            ).count()
-            
-            ai_requests = db.query(UsageTracking).filter(
-                and_(UsageTracking.created_at >= current, UsageTracking.created_at < next_hour)
-            ).count()
-            
-            timeline.append({
-                "timestamp": current.isoformat(),
-                "tasks_created": tasks_created,
-                "tasks_completed": tasks_completed,
-                "articles_created": articles_created,
-                "articles_published": articles_published,
-                "scans_run": scans_run,
-                "ai_requests": ai_requests
-            })
-            
-            current = next_hour
+    date_from = to_utc_naive(date_from)
+    date_to = to_utc_naive(date_to)
     
-    elif group_by == "day":
-        # Group by day
-        current = date_from.replace(hour=0, minute=0, second=0, microsecond=0)
-        while current <= date_to:
-            next_day = current + timedelta(days=1)
-            
-            # Get activity counts for this day
-            tasks_created = db.query(Task).filter(
-                and_(Task.created_at >= current, Task.created_at < next_day)
-            ).count()
-            
-            tasks_completed = db.query(Task).filter(
-                and_(Task.completed_at >= current, Task.completed_at < next_day)
-            ).count()
-            
-            articles_created = db.query(Article).filter(
-                and_(Article.created_at >= current, Article.created_at < next_day)
-            ).count()
-            
-            articles_published = db.query(Article).filter(
-                and_(Article.updated_at >= current, Article.updated_at < next_day, Article.status == "published")
-            ).count()
-            
-            scans_run = db.query(ScanJob).filter(
-                and_(ScanJob.started_at >= current, ScanJob.started_at < next_day)
-            ).count()
-            
-            ai_requests = db.query(UsageTracking).filter(
-                and_(UsageTracking.created_at >= current, UsageTracking.created_at < next_day)
-            ).count()
-            
-            timeline.append({
-                "timestamp": current.isoformat(),
-                "tasks_created": tasks_created,
-                "tasks_completed": tasks_completed,
-                "articles_created": articles_created,
-                "articles_published": articles_published,
-                "scans_run": scans_run,
-                "ai_requests": ai_requests
-            })
-            
-            current = next_day
+    # Bucket starts covering [date_from, date_to]
+    buckets = []
+    current = _truncate(date_from, group_by)
+    while current <= date_to:
+        buckets.append(current)
+        current += step
+    if not buckets:
+        return {"timeline": []}
+    range_start, range_end = buckets[0], buckets[-1] + step
     
-    elif group_by == "week":
-        # Group by week
-        current = date_from.replace(hour=0, minute=0, second=0, microsecond=0)
-        # Start from beginning of week
-        current = current - timedelta(days=current.weekday())
-        
-        while current <= date_to:
-            next_week = current + timedelta(weeks=1)
-            
-            # Get activity counts for this week
-            tasks_created = db.query(Task).filter(
-                and_(Task.created_at >= current, Task.created_at < next_week)
-            ).count()
-            
-            tasks_completed = db.query(Task).filter(
-                and_(Task.completed_at >= current, Task.completed_at < next_week)
-            ).count()
-            
-            articles_created = db.query(Article).filter(
-                and_(Article.created_at >= current, Article.created_at < next_week)
-            ).count()
-            
-            articles_published = db.query(Article).filter(
-                and_(Article.updated_at >= current, Article.updated_at < next_week, Article.status == "published")
-            ).count()
-            
-            scans_run = db.query(ScanJob).filter(
-                and_(ScanJob.started_at >= current, ScanJob.started_at < next_week)
-            ).count()
-            
-            ai_requests = db.query(UsageTracking).filter(
-                and_(UsageTracking.created_at >= current, UsageTracking.created_at < next_week)
-            ).count()
-            
-            timeline.append({
-                "timestamp": current.isoformat(),
-                "tasks_created": tasks_created,
-                "tasks_completed": tasks_completed,
-                "articles_created": articles_created,
-                "articles_published": articles_published,
-                "scans_run": scans_run,
-                "ai_requests": ai_requests
-            })
-            
-            current = next_week
+    # metric -> (timestamp column, extra conditions)
+    metrics = {
+        "tasks_created": (Task.created_at, []),
+        "tasks_completed": (Task.completed_at, []),
+        "articles_created": (Article.created_at, []),
+        "articles_published": (Article.updated_at, [Article.status == "published"]),
+        "scans_run": (ScanJob.started_at, []),
+        "ai_requests": (UsageTracking.created_at, [])
+    }
+    
+    # One grouped SELECT per metric, sent as a single UNION ALL statement
+    selects = []
+    for metric, (column, conditions) in metrics.items():
+        # Truncate the UTC wall time, like _truncate does for the Python-side buckets
+        bucket = func.date_trunc(group_by, func.timezone("UTC", column), type_=DateTime)
+        selects.append(
+            select(
+                literal(metric).label("metric"),
+                bucket.label("bucket"),
+                func.count().label("count")
+            ).where(
+                column >= range_start, column < range_end, *conditions
+            ).group_by(bucket)
+        )
+    rows = db.execute(union_all(*selects)).all()
+    
+    counts = {metric: {} for metric in metrics}
+    for row in rows:
+        counts[row.metric][to_utc_naive(row.bucket)] = row.count
+    
+    # Fill empty buckets with zeros
+    timeline = []
+    for bucket in buckets:
+        entry = {"timestamp": bucket.isoformat()}
+        for metric in metrics:
+            entry[metric] = counts[metric].get(bucket, 0)
+        timeline.append(entry)
     
     return {"timeline": timeline}
 
 
 @router.post("/analytics/export")
-async def export_report(
+def export_report(
     report_type: str,
     format: str,
     date_from: datetime,
@@ -438,9 +354,11 @@ async def export_report(
 
 
 @router.get("/analytics/audit-logs", response_model=PaginatedResponse)
-async def get_audit_logs(
+def get_audit_logs(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     user_id: Optional[str] = Query(None),
     action_type: Optional[str] = Query(None),
     module: Optional[str] = Query(None),
@@ -464,11 +382,9 @@ async def get_audit_logs(
     if date_to:
         query = query.filter(AuditLog.timestamp <= date_to)
     
-    # Get total count
-    total = query.count()
-    
-    # Apply pagination and ordering
-    logs = query.order_by(desc(AuditLog.timestamp)).offset(skip).limit(limit).all()
+    # Apply keyset pagination and ordering
+    page = paginate(query, (AuditLog.timestamp, AuditLog.log_id), limit, skip, after, total_mode)
+    logs = page.pop("rows")
     
     # Build response
     items = []
@@ -494,4 +410,4 @@ async def get_audit_logs(
             "timestamp": log.timestamp
         })
     
-    return PaginatedResponse(total=total, items=items)
+    return PaginatedResponse(items=items, **page)
@@ -1,10 +1,17 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, desc
+from sqlalchemy.exc import IntegrityError
 from app.database import get_db
+from app.pagination import paginate, TOTAL_MODE_PATTERN
+from app.search import apply_article_search, highlight, index_article, search_terms
+from app.utils import strip_html
+from app.dedup import find_duplicate, remember
+from app.generation import PLACEHOLDER_TITLE, enqueue, queue_generation
+from app.aggregates import aggregate_buckets, count_where, count_by_value, sum_where
 from app.auth import get_current_user, require_permission
-from app.models import Article, User, ScanJob, AuditLog
+from app.models import Article, User, ScanJob, AuditLog, GenerationJob
 from app.schemas import (
     ArticleCreateFromSource, ArticleCreateFromManualURL, ArticleUpdate,
     ArticleResponse, ArticleDetailResponse, ArticlePublishResponse,
@@ -18,10 +25,84 @@ import asyncio
 router = APIRouter(prefix="/api/v1", tags=["Article Management"])
 
 
+def _reject_duplicate(db: Session, url: str):
+    """409 if the page at url (or a near copy of it) already has an article"""
+    duplicate = find_duplicate(db, url, with_article=True)
+    if duplicate is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"An article already exists for this content ({duplicate.article_id})",
+            headers={"Location": f"/api/v1/articles/{duplicate.article_id}"}
+        )
+
+
+def _article_response(article: Article, created_by_name: str, generation_job_id=None) -> ArticleResponse:
+    return ArticleResponse(
+        article_id=article.article_id,
+        title=article.title,
+        status=article.status,
+        created_at=article.created_at,
+        created_by_id=article.created_by_id,
+        created_by_name=created_by_name,
+        source_job_id=article.source_job_id,
+        source_url=article.source_url,
+        published_url=article.published_url,
+        word_count=article.word_count,
+        last_edited_at=article.last_edited_at,
+        generation_job_id=generation_job_id
+    )
+
+
+def _idempotent_replay(db: Session, user: User, idempotency_key: Optional[str]) -> Optional[ArticleResponse]:
+    """Response of the earlier request with this Idempotency-Key, if there was one"""
+    if not idempotency_key:
+        return None
+    job = db.query(GenerationJob).filter(
+        GenerationJob.created_by_id == user.user_id,
+        GenerationJob.idempotency_key == idempotency_key
+    ).first()
+    if job is None:
+        return None
+    return _article_response(job.article, user.full_name, job.job_id)
+
+
+def _save_with_generation(
+    db: Session, article: Article, user: User, priority: str, idempotency_key: Optional[str]
+) -> Optional[GenerationJob]:
+    """Commit a new article with its queued generation job
+
+    None when a concurrent request with the same Idempotency-Key saved its article first.
+    """
+    index_article(db, article)
+    db.add(article)
+    db.flush()
+    job = queue_generation(db, article, user.user_id, priority, idempotency_key)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not idempotency_key:
+            raise
+        return None
+    db.refresh(article)
+    return job
+
+
+def _start_generation(db: Session, article: Article, job: GenerationJob):
+    """Hand a committed job to the Celery worker; fail it if the queue is unreachable"""
+    if not enqueue(job):
+        job.status = "failed"
+        job.error_message = "Could not queue AI generation, please retry"
+        article.status = "failed"
+        db.commit()
+
+
 @router.get("/articles", response_model=PaginatedResponse)
-async def get_all_articles(
+def get_all_articles(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     status: Optional[str] = Query(None),
     created_by_id: Optional[str] = Query(None),
     date_from: Optional[datetime] = Query(None),
@@ -42,18 +123,18 @@ async def get_all_articles(
         query = query.filter(Article.created_at >= date_from)
     if date_to:
         query = query.filter(Article.created_at <= date_to)
+    rank = None
     if search:
-        search_filter = or_(
-            Article.title.ilike(f"%{search}%"),
-            Article.content_html.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
-    
-    # Get total count
-    total = query.count()
+        # Full-text match on the accent-folded index, best matches first
+        query, rank = apply_article_search(db, query, search)
     
-    # Apply pagination and ordering
-    articles = query.order_by(desc(Article.created_at)).offset(skip).limit(limit).all()
+    # Apply keyset pagination and ordering
+    page = paginate(
+        query, (Article.created_at, Article.article_id), limit, skip, after, total_mode,
+        order_first=(desc(rank),) if rank is not None else ()
+    )
+    articles = page.pop("rows")
+    terms = search_terms(search) if search else []
     
     # Build response
     items = []
@@ -75,12 +156,60 @@ async def get_all_articles(
             "word_count": article.word_count,
             "last_edited_at": article.last_edited_at
         })
+        if terms:
+            items[-1]["highlight"] = {
+                "title": highlight(article.title, terms),
+                "content": highlight(strip_html(article.content_html or ""), terms)
+            }
     
-    return PaginatedResponse(total=total, items=items)
+    return PaginatedResponse(items=items, **page)
+
+
+@router.get("/articles/stats")
+def get_article_stats(
+    created_by_id: Optional[str] = Query(None),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get article statistics"""
+    query = db.query(Article)
+    
+    # Apply filters
+    if created_by_id:
+        query = query.filter(Article.created_by_id == created_by_id)
+    if date_from:
+        query = query.filter(Article.created_at >= date_from)
+    if date_to:
+        query = query.filter(Article.created_at <= date_to)
+    
+    # Counts and word totals in one scan over the filtered articles
+    stats = aggregate_buckets(
+        query,
+        columns={
+            "total": count_where(),
+            "total_words": sum_where(Article.word_count, Article.word_count > 0)
+        },
+        groups={
+            "by_status": count_by_value(Article.status, ["draft", "processing", "published"])
+        }
+    )
+    
+    avg_words = 0
+    if stats["total"] > 0:
+        avg_words = stats["total_words"] / stats["total"]
+    
+    return {
+        "total": stats["total"],
+        "by_status": stats["by_status"],
+        "total_words": stats["total_words"],
+        "avg_words": round(avg_words, 2)
+    }
 
 
 @router.get("/articles/{article_id}", response_model=ArticleDetailResponse)
-async def get_article_by_id(
+def get_article_by_id(
     article_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -113,7 +242,7 @@ async def get_article_by_id(
 
 
 @router.get("/articles/{article_id}/content")
-async def get_article_content(
+def get_article_content(
     article_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -127,18 +256,28 @@ async def get_article_content(
 
 
 @router.post("/articles/create-from-source", response_model=ArticleResponse)
-async def create_article_from_source(
+def create_article_from_source(
     request: ArticleCreateFromSource,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("noi-dung-ai", "create"))
 ):
     """Create article from scan source"""
+    # A retried request gets the article its first attempt created
+    replay = _idempotent_replay(db, current_user, idempotency_key)
+    if replay is not None:
+        return replay
+    
     # Validate source job exists
     source_job = db.query(ScanJob).filter(ScanJob.scan_id == request.source_job_id).first()
     if not source_job:
         raise HTTPException(status_code=404, detail="Source job not found")
     
-    # Create article
+    # Skip AI generation for content that already has an article
+    if not request.allow_duplicate:
+        _reject_duplicate(db, request.source_url)
+    
+    # Create article with its queued AI generation job
     new_article = Article(
         title=request.title,
         status="processing",
@@ -148,10 +287,11 @@ async def create_article_from_source(
         editor_instructions=request.editor_instructions,
         prompt_used=request.prompt_file
     )
+    job = _save_with_generation(db, new_article, current_user, request.priority, idempotency_key)
+    if job is None:
+        return _idempotent_replay(db, current_user, idempotency_key)
     
-    db.add(new_article)
-    db.commit()
-    db.refresh(new_article)
+    remember(db, new_article.source_url, article_id=new_article.article_id)
     
     # Log audit
     audit_log = AuditLog(
@@ -166,44 +306,44 @@ async def create_article_from_source(
     db.add(audit_log)
     db.commit()
     
-    # TODO: Start background task for AI content generation
-    # This would typically be handled by a background task queue like Celery
+    # The Celery worker generates the content (app/generation.py); progress
+    # is pushed over the WebSocket and readable at /articles/{id}/generation
+    _start_generation(db, new_article, job)
     
-    return ArticleResponse(
-        article_id=new_article.article_id,
-        title=new_article.title,
-        status=new_article.status,
-        created_at=new_article.created_at,
-        created_by_id=new_article.created_by_id,
-        created_by_name=current_user.full_name,
-        source_job_id=new_article.source_job_id,
-        source_url=new_article.source_url,
-        published_url=new_article.published_url,
-        word_count=new_article.word_count,
-        last_edited_at=new_article.last_edited_at
-    )
+    return _article_response(new_article, current_user.full_name, job.job_id)
 
 
 @router.post("/articles/create-from-manual-url", response_model=ArticleResponse)
-async def create_article_from_manual_url(
+def create_article_from_manual_url(
     request: ArticleCreateFromManualURL,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("noi-dung-ai", "create"))
 ):
     """Create article from manual URL"""
-    # Create article
+    # A retried request gets the article its first attempt created
+    replay = _idempotent_replay(db, current_user, idempotency_key)
+    if replay is not None:
+        return replay
+    
+    # Skip AI generation for content that already has an article
+    if not request.allow_duplicate:
+        _reject_duplicate(db, request.url)
+    
+    # Create article with its queued AI generation job
     new_article = Article(
-        title="Processing...",  # Will be updated by AI
+        title=PLACEHOLDER_TITLE,  # Will be updated by AI
         status="processing",
         created_by_id=current_user.user_id,
         source_url=request.url,
         editor_instructions=request.editor_instructions,
         prompt_used=request.prompt_file
     )
+    job = _save_with_generation(db, new_article, current_user, request.priority, idempotency_key)
+    if job is None:
+        return _idempotent_replay(db, current_user, idempotency_key)
     
-    db.add(new_article)
-    db.commit()
-    db.refresh(new_article)
+    remember(db, new_article.source_url, article_id=new_article.article_id)
     
     # Log audit
     audit_log = AuditLog(
@@ -218,26 +358,77 @@ async def create_article_from_manual_url(
     db.add(audit_log)
     db.commit()
     
-    # TODO: Start background task for URL scraping and AI content generation
-    # This would typically be handled by a background task queue like Celery
+    # The Celery worker scrapes the URL and generates the content (app/generation.py)
+    _start_generation(db, new_article, job)
     
-    return ArticleResponse(
-        article_id=new_article.article_id,
-        title=new_article.title,
-        status=new_article.status,
-        created_at=new_article.created_at,
-        created_by_id=new_article.created_by_id,
-        created_by_name=current_user.full_name,
-        source_job_id=new_article.source_job_id,
-        source_url=new_article.source_url,
-        published_url=new_article.published_url,
-        word_count=new_article.word_count,
-        last_edited_at=new_article.last_edited_at
-    )
+    return _article_response(new_article, current_user.full_name, job.job_id)
+
+
+@router.get("/articles/{article_id}/generation")
+def get_article_generation(
+    article_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("noi-dung-ai", "view"))
+):
+    """Get the latest AI generation job of an article"""
+    job = db.query(GenerationJob).filter(GenerationJob.article_id == article_id)\
+        .order_by(desc(GenerationJob.created_at)).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    
+    return {
+        "job_id": job.job_id,
+        "article_id": job.article_id,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "tokens_used": job.tokens_used,
+        "error_message": job.error_message,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "completed_at": job.completed_at
+    }
+
+
+@router.post("/articles/{article_id}/generation/retry")
+def retry_article_generation(
+    article_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_permission("noi-dung-ai", "create"))
+):
+    """Queue AI generation again for an article whose generation failed"""
+    article = db.query(Article).filter(Article.article_id == article_id).first()
+    if not article:
+        raise HTTPException(status_code=404, detail="Article not found")
+    
+    if article.status != "failed":
+        raise HTTPException(status_code=409, detail="Only articles whose generation failed can be retried")
+    
+    last_job = db.query(GenerationJob).filter(GenerationJob.article_id == article.article_id)\
+        .order_by(desc(GenerationJob.created_at)).first()
+    article.status = "processing"
+    job = queue_generation(db, article, current_user.user_id, last_job.priority if last_job else "default")
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another retry of this article was just queued
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Generation is already queued for this article")
+    
+    _start_generation(db, article, job)
+    
+    return {
+        "message": "Article generation queued",
+        "article_id": article.article_id,
+        "job_id": job.job_id,
+        "status": job.status
+    }
 
 
 @router.put("/articles/{article_id}/content")
-async def update_article_content(
+def update_article_content(
     article_id: str,
     request: ArticleUpdate,
     db: Session = Depends(get_db),
@@ -260,6 +451,8 @@ async def update_article_content(
             text_content = re.sub(r'<[^>]+>', '', request.content_html)
             word_count = len(text_content.split())
             article.word_count = word_count
+        
+        index_article(db, article)
     
     article.updated_at = datetime.utcnow()
     db.commit()
@@ -284,7 +477,7 @@ async def update_article_content(
 
 
 @router.post("/articles/{article_id}/publish", response_model=ArticlePublishResponse)
-async def publish_article(
+def publish_article(
     article_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("noi-dung-ai", "approve"))
@@ -328,7 +521,7 @@ async def publish_article(
 
 
 @router.delete("/articles/{article_id}")
-async def delete_article(
+def delete_article(
     article_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("noi-dung-ai", "delete"))
@@ -366,7 +559,7 @@ async def delete_article(
 
 
 @router.post("/articles/batch-update")
-async def batch_update_articles(
+def batch_update_articles(
     article_ids: List[str],
     updates: dict,
     db: Session = Depends(get_db),
@@ -395,53 +588,8 @@ async def batch_update_articles(
     }
 
 
-@router.get("/articles/stats")
-async def get_article_stats(
-    created_by_id: Optional[str] = Query(None),
-    date_from: Optional[datetime] = Query(None),
-    date_to: Optional[datetime] = Query(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Get article statistics"""
-    query = db.query(Article)
-    
-    # Apply filters
-    if created_by_id:
-        query = query.filter(Article.created_by_id == created_by_id)
-    if date_from:
-        query = query.filter(Article.created_at >= date_from)
-    if date_to:
-        query = query.filter(Article.created_at <= date_to)
-    
-    # Get counts
-    total = query.count()
-    
-    by_status = {
-        "draft": query.filter(Article.status == "draft").count(),
-        "processing": query.filter(Article.status == "processing").count(),
-        "published": query.filter(Article.status == "published").count()
-    }
-    
-    # Get word count statistics
-    total_words = db.query(func.sum(Article.word_count)).filter(
-        Article.word_count > 0
-    ).scalar() or 0
-    
-    avg_words = 0
-    if total > 0:
-        avg_words = total_words / total
-    
-    return {
-        "total": total,
-        "by_status": by_status,
-        "total_words": total_words,
-        "avg_words": round(avg_words, 2)
-    }
-
-
 @router.post("/articles/{article_id}/export")
-async def export_article(
+def export_article(
     article_id: str,
     format: str = "docx",  # docx, pdf, html
     db: Session = Depends(get_db),
@@ -1,15 +1,23 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import func, and_, or_, desc
-from app.database import get_db
+from app.database import get_db, get_async_db, get_async_session
+from app.pagination import paginate, TOTAL_MODE_PATTERN
 from app.auth import get_current_user, require_permission
 from app.models import ChatSession, ChatMessage, User, UsageTracking
+from app.assistant import (
+    build_context, get_ai_response, open_turn, reply_data, save_reply, schedule_summary, stream_reply
+)
+from app.llm import LLMError
 from app.schemas import (
     ChatMessageRequest, ChatMessageResponse, ChatSessionResponse, 
     ChatSessionDetailResponse, PaginatedResponse
 )
 from datetime import datetime
+import json
 import uuid
 import httpx
 import asyncio
@@ -18,9 +26,11 @@ router = APIRouter(prefix="/api/v1", tags=["AI Chat"])
 
 
 @router.get("/chat/sessions", response_model=PaginatedResponse)
-async def get_chat_sessions(
+def get_chat_sessions(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     user_id: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -35,11 +45,12 @@ async def get_chat_sessions(
         # Regular users can only see their own sessions
         query = query.filter(ChatSession.user_id == current_user.user_id)
     
-    # Get total count
-    total = query.count()
-    
-    # Apply pagination and ordering
-    sessions = query.order_by(desc(ChatSession.last_activity)).offset(skip).limit(limit).all()
+    # Apply keyset pagination and ordering
+    page = paginate(
+        query, (ChatSession.last_activity, ChatSession.session_id),
+        limit, skip, after, total_mode
+    )
+    sessions = page.pop("rows")
     
     # Build response
     items = []
@@ -62,11 +73,11 @@ async def get_chat_sessions(
             "page_context": session.page_context
         })
     
-    return PaginatedResponse(total=total, items=items)
+    return PaginatedResponse(items=items, **page)
 
 
 @router.get("/chat/sessions/{session_id}", response_model=ChatSessionDetailResponse)
-async def get_chat_session(
+def get_chat_session(
     session_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -104,6 +115,7 @@ async def get_chat_session(
         user_id=session.user_id,
         user_name=user_name,
         title=session.title,
+        message_count=len(messages_data),
         started_at=session.started_at,
         last_activity=session.last_activity,
         page_context=session.page_context,
@@ -114,116 +126,62 @@ async def get_chat_session(
 @router.post("/chat/send", response_model=ChatMessageResponse)
 async def send_chat_message(
     request: ChatMessageRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Send chat message and get AI response"""
-    # Get or create session
-    session = None
-    if request.session_id:
-        session = db.query(ChatSession).filter(ChatSession.session_id == request.session_id).first()
-        if not session:
-            raise HTTPException(status_code=404, detail="Chat session not found")
-        
-        # Check permissions
-        if str(session.user_id) != str(current_user.user_id):
-            raise HTTPException(status_code=403, detail="Access denied")
-    else:
-        # Create new session
-        session = ChatSession(
-            user_id=current_user.user_id,
-            title=request.message[:50] + "..." if len(request.message) > 50 else request.message,
-            page_context=request.page_context
-        )
-        db.add(session)
-        db.commit()
-        db.refresh(session)
+    turn = await open_turn(db, request, current_user)
+    context = await build_context(db, turn, request.context_data)
+    # Hand the connection back while the model answers; the reply is saved with a fresh session
+    await db.close()
     
-    # Create user message
-    user_message = ChatMessage(
-        session_id=session.session_id,
-        type="user",
-        content=request.message
-    )
-    db.add(user_message)
-    db.commit()
-    db.refresh(user_message)
-    
-    # Update session last activity
-    session.last_activity = datetime.utcnow()
-    db.commit()
-    
-    # TODO: Get AI response
-    # This would typically call OpenAI API or similar
-    ai_response_content = await get_ai_response(request.message, request.context_data)
+    try:
+        reply = await get_ai_response(context["messages"])
+    except LLMError as e:
+        raise HTTPException(status_code=503, detail=f"AI service is unavailable: {e}")
     
-    # Create AI message
-    ai_message = ChatMessage(
-        session_id=session.session_id,
-        type="ai",
-        content=ai_response_content,
-        suggestions=["Bạn có muốn tạo task mới?", "Xem thống kê công việc"],
-        quick_actions=[
-            {
-                "label": "Tạo công việc",
-                "action": "create_task",
-                "icon": "plus"
-            }
-        ]
-    )
-    db.add(ai_message)
-    db.commit()
-    db.refresh(ai_message)
+    usage = {key: value for key, value in reply.items() if key != "content"}
+    async with get_async_session() as reply_db:
+        ai_message = await save_reply(
+            reply_db, turn.session_id, current_user.user_id, reply["content"], usage,
+            history_messages=context["history_messages"]
+        )
     
-    # Track AI usage
-    usage_record = UsageTracking(
-        user_id=current_user.user_id,
-        action="ai_chat",
-        tokens_used=len(request.message) + len(ai_response_content),  # Rough estimation
-        cost_usd=0.001,  # Rough estimation
-        metadata={
-            "session_id": str(session.session_id),
-            "message_id": str(ai_message.message_id)
-        }
-    )
-    db.add(usage_record)
-    db.commit()
+    # Fold older messages into the session summary after the response
+    if context["summarize"]:
+        schedule_summary(turn.session_id)
     
     return ChatMessageResponse(
-        session_id=session.session_id,
+        session_id=turn.session_id,
         message_id=ai_message.message_id,
-        ai_response={
-            "message_id": ai_message.message_id,
-            "type": "ai",
-            "content": ai_response_content,
-            "timestamp": ai_message.timestamp,
-            "suggestions": ai_message.suggestions,
-            "quick_actions": ai_message.quick_actions
-        }
+        ai_response=reply_data(ai_message)
     )
 
 
-async def get_ai_response(message: str, context_data: Optional[dict] = None) -> str:
-    """Get AI response for chat message"""
-    # TODO: Implement actual AI integration
-    # This would typically call OpenAI API, Claude, or similar
-    
-    # Mock response for now
-    responses = [
-        "Tôi hiểu bạn đang hỏi về {}. Để giúp bạn tốt hơn, bạn có thể:",
-        "Dựa trên câu hỏi của bạn về {}, tôi khuyến nghị:",
-        "Để giải quyết vấn đề {}, bạn có thể thử:",
-        "Tôi có thể giúp bạn với {}. Dưới đây là một số gợi ý:"
-    ]
+@router.post("/chat/send/stream")
+async def stream_chat_message(
+    request: ChatMessageRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Send chat message and stream the AI response as Server-Sent Events"""
+    turn = await open_turn(db, request, current_user)
+    events = stream_reply(turn, current_user.user_id, request.context_data)
     
-    import random
-    response = random.choice(responses).format("hệ thống DocNhanh")
+    async def event_stream():
+        async for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
     
-    return f"{response}\n\n1. Kiểm tra dashboard để xem tổng quan\n2. Tạo task mới nếu cần\n3. Xem báo cáo thống kê\n4. Quản lý nội dung AI"
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Proxies must pass tokens through as they arrive
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.delete("/chat/sessions/{session_id}")
-async def delete_chat_session(
+def delete_chat_session(
     session_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -248,7 +206,7 @@ async def delete_chat_session(
 
 
 @router.get("/chat/analytics")
-async def get_chat_analytics(
+def get_chat_analytics(
     date_from: datetime = Query(..., description="Start date for analytics"),
     date_to: datetime = Query(..., description="End date for analytics"),
     db: Session = Depends(get_db),
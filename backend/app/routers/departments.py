@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 from app.database import get_db
+from app.pagination import paginate, TOTAL_MODE_PATTERN
 from app.auth import get_current_user, require_permission
 from app.models import Department, User, Task
 from app.schemas import (
@@ -16,17 +17,18 @@ router = APIRouter(prefix="/api/v1", tags=["Department Management"])
 
 
 @router.get("/departments", response_model=PaginatedResponse)
-async def get_all_departments(
+def get_all_departments(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get all departments with pagination"""
     query = db.query(Department)
-    total = query.count()
-    
-    departments = query.offset(skip).limit(limit).all()
+    page = paginate(query, (Department.created_at, Department.id), limit, skip, after, total_mode)
+    departments = page.pop("rows")
     
     items = []
     for dept in departments:
@@ -67,11 +69,11 @@ async def get_all_departments(
             "updated_at": dept.updated_at
         })
     
-    return PaginatedResponse(total=total, items=items)
+    return PaginatedResponse(items=items, **page)
 
 
 @router.get("/departments/{department_id}", response_model=DepartmentDetailResponse)
-async def get_department_by_id(
+def get_department_by_id(
     department_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -134,7 +136,7 @@ async def get_department_by_id(
 
 
 @router.post("/departments", response_model=DepartmentResponse)
-async def create_department(
+def create_department(
     department_data: DepartmentCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("nhan-su", "create"))
@@ -175,7 +177,7 @@ async def create_department(
 
 
 @router.put("/departments/{department_id}", response_model=DepartmentResponse)
-async def update_department(
+def update_department(
     department_id: str,
     department_data: DepartmentUpdate,
     db: Session = Depends(get_db),
@@ -240,7 +242,7 @@ async def update_department(
 
 
 @router.delete("/departments/{department_id}")
-async def delete_department(
+def delete_department(
     department_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("nhan-su", "delete"))
@@ -3,6 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, desc
 from app.database import get_db
+from app.pagination import paginate, TOTAL_MODE_PATTERN
+from app.aggregates import aggregate_buckets, count_where, count_by_value
 from app.auth import get_current_user
 from app.models import Notification, User
 from app.schemas import NotificationResponse, PaginatedResponse
@@ -13,9 +15,11 @@ router = APIRouter(prefix="/api/v1", tags=["Notifications"])
 
 
 @router.get("/notifications", response_model=PaginatedResponse)
-async def get_user_notifications(
+def get_user_notifications(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     unread_only: bool = Query(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -27,16 +31,17 @@ async def get_user_notifications(
     if unread_only:
         query = query.filter(Notification.is_read == False)
     
-    # Get total count
-    total = query.count()
-    
     # Get unread count
     unread_count = db.query(Notification).filter(
         and_(Notification.user_id == current_user.user_id, Notification.is_read == False)
     ).count()
     
-    # Apply pagination and ordering
-    notifications = query.order_by(desc(Notification.created_at)).offset(skip).limit(limit).all()
+    # Apply keyset pagination and ordering
+    page = paginate(
+        query, (Notification.created_at, Notification.notification_id),
+        limit, skip, after, total_mode
+    )
+    notifications = page.pop("rows")
     
     # Build response
     items = []
@@ -53,14 +58,14 @@ async def get_user_notifications(
         })
     
     return PaginatedResponse(
-        total=total,
         items=items,
-        unread_count=unread_count
+        unread_count=unread_count,
+        **page
     )
 
 
 @router.put("/notifications/{notification_id}/read")
-async def mark_notification_read(
+def mark_notification_read(
     notification_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -83,7 +88,7 @@ async def mark_notification_read(
 
 
 @router.post("/notifications/mark-all-read")
-async def mark_all_notifications_read(
+def mark_all_notifications_read(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -104,7 +109,7 @@ async def mark_all_notifications_read(
 
 
 @router.post("/notifications")
-async def create_notification(
+def create_notification(
     user_id: str,
     notification_type: str,
     title: str,
@@ -134,7 +139,7 @@ async def create_notification(
 
 
 @router.delete("/notifications/{notification_id}")
-async def delete_notification(
+def delete_notification(
     notification_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -157,30 +162,26 @@ async def delete_notification(
 
 
 @router.get("/notifications/stats")
-async def get_notification_stats(
+def get_notification_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get notification statistics for current user"""
-    # Get total notifications
-    total = db.query(Notification).filter(Notification.user_id == current_user.user_id).count()
-    
-    # Get unread count
-    unread = db.query(Notification).filter(
-        and_(Notification.user_id == current_user.user_id, Notification.is_read == False)
-    ).count()
+    query = db.query(Notification).filter(Notification.user_id == current_user.user_id)
     
-    # Get by type
-    by_type = {}
-    types = ["task_assigned", "task_completed", "article_published", "mention"]
-    for notification_type in types:
-        count = db.query(Notification).filter(
-            and_(Notification.user_id == current_user.user_id, Notification.type == notification_type)
-        ).count()
-        by_type[notification_type] = count
+    # Totals and per-type counts in one scan over the user's notifications
+    stats = aggregate_buckets(
+        query,
+        columns={
+            "total": count_where(),
+            "unread": count_where(Notification.is_read == False)
+        },
+        groups={
+            "by_type": count_by_value(
+                Notification.type,
+                ["task_assigned", "task_completed", "article_published", "mention"]
+            )
+        }
+    )
     
-    return {
-        "total": total,
-        "unread": unread,
-        "by_type": by_type
-    }
+    return stats
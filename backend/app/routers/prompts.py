@@ -3,6 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, desc
 from app.database import get_db
+from app.pagination import paginate, TOTAL_MODE_PATTERN
+from app.search import apply_text_search
 from app.auth import get_current_user, require_permission
 from app.models import Prompt, AuditLog, User
 from app.schemas import (
@@ -16,9 +18,11 @@ router = APIRouter(prefix="/api/v1", tags=["Prompt Management"])
 
 
 @router.get("/prompts", response_model=PaginatedResponse)
-async def get_all_prompts(
+def get_all_prompts(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     category: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     db: Session = Depends(get_db),
@@ -30,19 +34,18 @@ async def get_all_prompts(
     # Apply filters
     if category:
         query = query.filter(Prompt.category == category)
+    rank = None
     if search:
-        search_filter = or_(
-            Prompt.name.ilike(f"%{search}%"),
-            Prompt.description.ilike(f"%{search}%"),
-            Prompt.content.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
-    
-    # Get total count
-    total = query.count()
+        # Trigram-indexed substring match, closest matches first
+        query, rank = apply_text_search(db, query, Prompt, search)
     
-    # Apply pagination and ordering
-    prompts = query.order_by(desc(Prompt.usage_count), desc(Prompt.created_at)).offset(skip).limit(limit).all()
+    # Apply keyset pagination and ordering
+    page = paginate(
+        query, (Prompt.usage_count, Prompt.created_at, Prompt.prompt_id),
+        limit, skip, after, total_mode,
+        order_first=(desc(rank),) if rank is not None else ()
+    )
+    prompts = page.pop("rows")
     
     # Build response
     items = []
@@ -59,11 +62,11 @@ async def get_all_prompts(
             "updated_at": prompt.updated_at
         })
     
-    return PaginatedResponse(total=total, items=items)
+    return PaginatedResponse(items=items, **page)
 
 
 @router.get("/prompts/{prompt_id}", response_model=PromptResponse)
-async def get_prompt_by_id(
+def get_prompt_by_id(
     prompt_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -87,7 +90,7 @@ async def get_prompt_by_id(
 
 
 @router.post("/prompts", response_model=PromptResponse)
-async def create_prompt(
+def create_prompt(
     prompt_data: PromptCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("quan-tri", "edit"))
@@ -139,7 +142,7 @@ async def create_prompt(
 
 
 @router.put("/prompts/{prompt_id}", response_model=PromptResponse)
-async def update_prompt(
+def update_prompt(
     prompt_id: str,
     prompt_data: PromptUpdate,
     db: Session = Depends(get_db),
@@ -198,7 +201,7 @@ async def update_prompt(
 
 
 @router.delete("/prompts/{prompt_id}")
-async def delete_prompt(
+def delete_prompt(
     prompt_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("quan-tri", "edit"))
@@ -243,7 +246,7 @@ async def delete_prompt(
 
 
 @router.get("/prompts/categories")
-async def get_prompt_categories(
+def get_prompt_categories(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -262,7 +265,7 @@ async def get_prompt_categories(
 
 
 @router.get("/prompts/default/{category}")
-async def get_default_prompt(
+def get_default_prompt(
     category: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -289,7 +292,7 @@ async def get_default_prompt(
 
 
 @router.post("/prompts/{prompt_id}/use")
-async def use_prompt(
+def use_prompt(
     prompt_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
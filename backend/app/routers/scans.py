@@ -1,10 +1,13 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, desc
 from app.database import get_db
+from app.pagination import paginate, TOTAL_MODE_PATTERN
+from app.aggregates import aggregate_buckets, count_where, count_by_value, sum_where
 from app.auth import get_current_user, require_permission
-from app.models import ScanJob, User, AuditLog
+from app.models import ScanJob, ScanItem, User, AuditLog
+from app.storage import blob_response
 from app.schemas import (
     ScanJobCreate, ScanJobResponse, ScanJobDetailResponse,
     PaginatedResponse
@@ -16,11 +19,32 @@ import asyncio
 
 router = APIRouter(prefix="/api/v1", tags=["Scan Management"])
 
+# Items embedded in the scan detail response; the rest via /scans/{id}/items
+DETAIL_ITEMS_LIMIT = 20
+
+
+def _scan_item_dict(scan_id, item: ScanItem) -> dict:
+    return {
+        "item_id": item.item_id,
+        "url": item.url,
+        "title": item.title,
+        "filename": item.filename,
+        "content_type": item.content_type,
+        "size": item.size,
+        "content_hash": item.content_hash,
+        "status_code": item.status_code,
+        "duplicate_of": item.duplicate_of,
+        "fetched_at": item.fetched_at,
+        "file_url": f"/api/v1/scans/{scan_id}/items/{item.filename}"
+    }
+
 
 @router.get("/scans", response_model=PaginatedResponse)
-async def get_all_scan_jobs(
+def get_all_scan_jobs(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     status: Optional[str] = Query(None),
     date_from: Optional[datetime] = Query(None),
     date_to: Optional[datetime] = Query(None),
@@ -38,11 +62,9 @@ async def get_all_scan_jobs(
     if date_to:
         query = query.filter(ScanJob.created_at <= date_to)
     
-    # Get total count
-    total = query.count()
-    
-    # Apply pagination and ordering
-    scan_jobs = query.order_by(desc(ScanJob.created_at)).offset(skip).limit(limit).all()
+    # Apply keyset pagination and ordering
+    page = paginate(query, (ScanJob.created_at, ScanJob.scan_id), limit, skip, after, total_mode)
+    scan_jobs = page.pop("rows")
     
     # Build response
     items = []
@@ -65,11 +87,50 @@ async def get_all_scan_jobs(
             "error_message": scan_job.error_message
         })
     
-    return PaginatedResponse(total=total, items=items)
+    return PaginatedResponse(items=items, **page)
+
+
+@router.get("/scans/stats")
+def get_scan_stats(
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get scan statistics"""
+    query = db.query(ScanJob)
+    
+    # Apply filters
+    if date_from:
+        query = query.filter(ScanJob.created_at >= date_from)
+    if date_to:
+        query = query.filter(ScanJob.created_at <= date_to)
+    
+    # Counts and item totals in one scan over the filtered jobs
+    stats = aggregate_buckets(
+        query,
+        columns={
+            "total": count_where(),
+            "total_items_found": sum_where(ScanJob.items_found),
+            "total_items_processed": sum_where(ScanJob.items_processed)
+        },
+        groups={
+            "by_status": count_by_value(ScanJob.status, ["pending", "running", "completed", "failed"])
+        }
+    )
+    total = stats["total"]
+    
+    return {
+        "total": total,
+        "by_status": stats["by_status"],
+        "total_items_found": stats["total_items_found"],
+        "total_items_processed": stats["total_items_processed"],
+        "success_rate": round((stats["by_status"]["completed"] / total * 100) if total > 0 else 0, 2)
+    }
 
 
 @router.get("/scans/{scan_id}", response_model=ScanJobDetailResponse)
-async def get_scan_job_by_id(
+def get_scan_job_by_id(
     scan_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -83,9 +144,10 @@ async def get_scan_job_by_id(
     creator = db.query(User).filter(User.user_id == scan_job.created_by_id).first()
     creator_name = creator.full_name if creator else "Unknown"
     
-    # TODO: Get scan items from database or external storage
-    # For now, return empty items list
-    items = []
+    # Most recent items; the full list is paginated by /scans/{id}/items
+    items = db.query(ScanItem).filter(ScanItem.scan_id == scan_job.scan_id)\
+        .order_by(desc(ScanItem.fetched_at), desc(ScanItem.item_id))\
+        .limit(DETAIL_ITEMS_LIMIT).all()
     
     return ScanJobDetailResponse(
         scan_id=scan_job.scan_id,
@@ -99,12 +161,12 @@ async def get_scan_job_by_id(
         created_by_id=scan_job.created_by_id,
         created_by_name=creator_name,
         error_message=scan_job.error_message,
-        items=items
+        items=[_scan_item_dict(scan_job.scan_id, item) for item in items]
     )
 
 
 @router.post("/scans", response_model=ScanJobResponse)
-async def create_scan_job(
+def create_scan_job(
     scan_data: ScanJobCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("noi-dung-ai", "create"))
@@ -137,9 +199,7 @@ async def create_scan_job(
     db.add(audit_log)
     db.commit()
     
-    # TODO: Start background task for scanning
-    # This would typically be handled by a background task queue like Celery
-    # For now, we'll simulate the scan process
+    # Pending jobs are picked up by the scan worker (scripts/scan_worker.py)
     
     return ScanJobResponse(
         scan_id=new_scan_job.scan_id,
@@ -157,7 +217,7 @@ async def create_scan_job(
 
 
 @router.post("/scans/{scan_id}/retry")
-async def retry_failed_scan(
+def retry_failed_scan(
     scan_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("noi-dung-ai", "create"))
@@ -178,11 +238,9 @@ async def retry_failed_scan(
     scan_job.items_found = 0
     scan_job.items_processed = 0
     
+    # The scan worker picks the job up again now that it is pending
     db.commit()
     
-    # TODO: Start background task for scanning
-    # This would typically be handled by a background task queue like Celery
-    
     return {
         "message": "Scan job restarted",
         "scan_id": scan_job.scan_id,
@@ -190,11 +248,13 @@ async def retry_failed_scan(
     }
 
 
-@router.get("/scans/{scan_id}/items")
-async def get_scan_items(
+@router.get("/scans/{scan_id}/items", response_model=PaginatedResponse)
+def get_scan_items(
     scan_id: str,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -203,72 +263,30 @@ async def get_scan_items(
     if not scan_job:
         raise HTTPException(status_code=404, detail="Scan job not found")
     
-    # TODO: Get items from database or external storage
-    # For now, return mock data
-    items = []
+    query = db.query(ScanItem).filter(ScanItem.scan_id == scan_job.scan_id)
+    page = paginate(query, (ScanItem.fetched_at, ScanItem.item_id), limit, skip, after, total_mode)
+    items = page.pop("rows")
     
-    return {
-        "total": len(items),
-        "items": items[skip:skip + limit]
-    }
+    return PaginatedResponse(
+        items=[_scan_item_dict(scan_job.scan_id, item) for item in items],
+        **page
+    )
 
 
 @router.get("/scans/{scan_id}/items/{filename}")
-async def get_scan_item_file(
+def get_scan_item_file(
     scan_id: str,
     filename: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get scan job item file"""
-    scan_job = db.query(ScanJob).filter(ScanJob.scan_id == scan_id).first()
-    if not scan_job:
-        raise HTTPException(status_code=404, detail="Scan job not found")
+    """Download the stored content of a scan item (supports Range requests)"""
+    item = db.query(ScanItem).join(ScanJob).filter(
+        ScanJob.scan_id == scan_id,
+        ScanItem.filename == filename
+    ).first()
+    if not item:
+        raise HTTPException(status_code=404, detail="Scan item not found")
     
-    # TODO: Get file from storage
-    # For now, return mock content
-    return {
-        "filename": filename,
-        "content": "Mock file content",
-        "size": 1024,
-        "type": "text/plain"
-    }
-
-
-@router.get("/scans/stats")
-async def get_scan_stats(
-    date_from: Optional[datetime] = Query(None),
-    date_to: Optional[datetime] = Query(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Get scan statistics"""
-    query = db.query(ScanJob)
-    
-    # Apply filters
-    if date_from:
-        query = query.filter(ScanJob.created_at >= date_from)
-    if date_to:
-        query = query.filter(ScanJob.created_at <= date_to)
-    
-    # Get counts
-    total = query.count()
-    
-    by_status = {
-        "pending": query.filter(ScanJob.status == "pending").count(),
-        "running": query.filter(ScanJob.status == "running").count(),
-        "completed": query.filter(ScanJob.status == "completed").count(),
-        "failed": query.filter(ScanJob.status == "failed").count()
-    }
-    
-    # Get total items found and processed
-    total_items_found = db.query(func.sum(ScanJob.items_found)).scalar() or 0
-    total_items_processed = db.query(func.sum(ScanJob.items_processed)).scalar() or 0
-    
-    return {
-        "total": total,
-        "by_status": by_status,
-        "total_items_found": total_items_found,
-        "total_items_processed": total_items_processed,
-        "success_rate": round((by_status["completed"] / total * 100) if total > 0 else 0, 2)
-    }
+    return blob_response(request, item.content_hash, item.content_type or "application/octet-stream", item.filename)
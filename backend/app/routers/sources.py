@@ -3,22 +3,36 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, desc
 from app.database import get_db
+from app.pagination import paginate, TOTAL_MODE_PATTERN
+from app.search import apply_text_search
 from app.auth import get_current_user, require_permission
 from app.models import Source, AuditLog, User
+from app.scheduler import queue_scan, schedule_next_scan
+from app.crawler import FetchError, get_crawler
+from app.fetch_validators import conditional_headers, is_unchanged, load_validator
 from app.schemas import (
     SourceCreate, SourceUpdate, SourceResponse,
     PaginatedResponse
 )
+from anyio import from_thread
 from datetime import datetime
+import time
 import uuid
 
 router = APIRouter(prefix="/api/v1", tags=["Source Management"])
 
 
+async def _fetch_source_page(url: str, headers: dict) -> dict:
+    # Shared crawler: same connection pools, rate limits and robots.txt rules as scans
+    return await get_crawler().fetch(url, headers=headers)
+
+
 @router.get("/sources", response_model=PaginatedResponse)
-async def get_all_sources(
+def get_all_sources(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     category: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
     search: Optional[str] = Query(None),
@@ -33,19 +47,18 @@ async def get_all_sources(
         query = query.filter(Source.category == category)
     if is_active is not None:
         query = query.filter(Source.is_active == is_active)
+    rank = None
     if search:
-        search_filter = or_(
-            Source.name.ilike(f"%{search}%"),
-            Source.url.ilike(f"%{search}%"),
-            Source.category.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
-    
-    # Get total count
-    total = query.count()
+        # Trigram-indexed substring match, closest matches first
+        query, rank = apply_text_search(db, query, Source, search)
     
-    # Apply pagination and ordering
-    sources = query.order_by(desc(Source.total_scans), desc(Source.created_at)).offset(skip).limit(limit).all()
+    # Apply keyset pagination and ordering
+    page = paginate(
+        query, (Source.total_scans, Source.created_at, Source.source_id),
+        limit, skip, after, total_mode,
+        order_first=(desc(rank),) if rank is not None else ()
+    )
+    sources = page.pop("rows")
     
     # Build response
     items = []
@@ -59,15 +72,16 @@ async def get_all_sources(
             "auto_scan": source.auto_scan,
             "scan_frequency": source.scan_frequency,
             "last_scan_at": source.last_scan_at,
+            "next_scan_at": source.next_scan_at,
             "total_scans": source.total_scans,
             "created_at": source.created_at
         })
     
-    return PaginatedResponse(total=total, items=items)
+    return PaginatedResponse(items=items, **page)
 
 
 @router.get("/sources/{source_id}", response_model=SourceResponse)
-async def get_source_by_id(
+def get_source_by_id(
     source_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -86,13 +100,14 @@ async def get_source_by_id(
         auto_scan=source.auto_scan,
         scan_frequency=source.scan_frequency,
         last_scan_at=source.last_scan_at,
+        next_scan_at=source.next_scan_at,
         total_scans=source.total_scans,
         created_at=source.created_at
     )
 
 
 @router.post("/sources", response_model=SourceResponse)
-async def create_source(
+def create_source(
     source_data: SourceCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("quan-tri", "edit"))
@@ -139,13 +154,14 @@ async def create_source(
         auto_scan=new_source.auto_scan,
         scan_frequency=new_source.scan_frequency,
         last_scan_at=new_source.last_scan_at,
+        next_scan_at=new_source.next_scan_at,
         total_scans=new_source.total_scans,
         created_at=new_source.created_at
     )
 
 
 @router.put("/sources/{source_id}", response_model=SourceResponse)
-async def update_source(
+def update_source(
     source_id: str,
     source_data: SourceUpdate,
     db: Session = Depends(get_db),
@@ -175,6 +191,8 @@ async def update_source(
         source.auto_scan = source_data.auto_scan
     if source_data.scan_frequency is not None:
         source.scan_frequency = source_data.scan_frequency
+    if source_data.auto_scan is not None or source_data.scan_frequency is not None:
+        schedule_next_scan(source)
     
     db.commit()
     
@@ -200,13 +218,14 @@ async def update_source(
         auto_scan=source.auto_scan,
         scan_frequency=source.scan_frequency,
         last_scan_at=source.last_scan_at,
+        next_scan_at=source.next_scan_at,
         total_scans=source.total_scans,
         created_at=source.created_at
     )
 
 
 @router.delete("/sources/{source_id}")
-async def delete_source(
+def delete_source(
     source_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("quan-tri", "edit"))
@@ -244,7 +263,7 @@ async def delete_source(
 
 
 @router.post("/sources/{source_id}/test")
-async def test_source(
+def test_source(
     source_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -254,20 +273,37 @@ async def test_source(
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
     
-    # TODO: Implement actual source testing logic
-    # This would typically make a test request to the source URL
+    # Conditional request with the validators of the last scan: a 304 (or
+    # the same body) means the source has not changed since that scan
+    validator = load_validator(db, source.url)
+    started = time.monotonic()
+    try:
+        page = from_thread.run(_fetch_source_page, source.url, conditional_headers(validator))
+    except FetchError as e:
+        return {
+            "message": "Source test failed",
+            "source_id": source.source_id,
+            "status": "failed",
+            "error": str(e),
+            "response_time_ms": int((time.monotonic() - started) * 1000),
+            "last_checked": datetime.utcnow().isoformat()
+        }
     
     return {
         "message": "Source test completed",
         "source_id": source.source_id,
         "status": "success",
-        "response_time_ms": 150,
+        "http_status": page["status_code"],
+        "changed_since_last_scan": None if validator is None else not is_unchanged(validator, page),
+        "content_type": page["content_type"] or None,
+        "size": len(page["body"]),
+        "response_time_ms": int((time.monotonic() - started) * 1000),
         "last_checked": datetime.utcnow().isoformat()
     }
 
 
 @router.post("/sources/{source_id}/scan")
-async def trigger_manual_scan(
+def trigger_manual_scan(
     source_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("noi-dung-ai", "create"))
@@ -280,19 +316,33 @@ async def trigger_manual_scan(
     if not source.is_active:
         raise HTTPException(status_code=400, detail="Source is not active")
     
-    # TODO: Start background scan job
-    # This would typically be handled by a background task queue like Celery
+    # Queue a scan job; the scan worker (scripts/scan_worker.py) runs it.
+    # The next automatic scan moves to one interval from now.
+    scan_job = queue_scan(db, source, current_user.user_id)
+    db.flush()
+    
+    audit_log = AuditLog(
+        user_id=current_user.user_id,
+        action="scan_job_created",
+        action_type="create",
+        module="noi-dung-ai",
+        entity_type="scan_job",
+        entity_id=scan_job.scan_id,
+        entity_name=scan_job.source_name
+    )
+    db.add(audit_log)
+    db.commit()
     
     return {
         "message": "Manual scan triggered",
         "source_id": source.source_id,
-        "scan_job_id": f"manual_{source_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}",
-        "status": "pending"
+        "scan_job_id": scan_job.scan_id,
+        "status": scan_job.status
     }
 
 
 @router.get("/sources/categories")
-async def get_source_categories(
+def get_source_categories(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -311,7 +361,7 @@ async def get_source_categories(
 
 
 @router.get("/sources/stats")
-async def get_source_stats(
+def get_source_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -1,8 +1,11 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, and_, or_, desc
 from app.database import get_db
+from app.pagination import paginate, TOTAL_MODE_PATTERN
+from app.search import apply_text_search
+from app.aggregates import aggregate_buckets, count_where, count_by_value
 from app.auth import get_current_user, require_permission
 from app.models import Task, User, Department, TaskUpdate, Article, AuditLog
 from app.schemas import (
@@ -15,11 +18,50 @@ import uuid
 
 router = APIRouter(prefix="/api/v1", tags=["Task Management"])
 
+# Eager-load plan for the user/department columns shown on every task row
+TASK_RELATIONS_LOAD = (
+    joinedload(Task.assignee),
+    joinedload(Task.department),
+    joinedload(Task.creator),
+    joinedload(Task.reviewer),
+)
+
+
+def serialize_task(task: Task) -> dict:
+    """Build task response dict from a task with its relations loaded"""
+    return {
+        "id": task.id,
+        "title": task.title,
+        "description": task.description,
+        "assignee_id": task.assignee_id,
+        "assignee_name": task.assignee.full_name if task.assignee else "Unknown",
+        "assignee_avatar": task.assignee.avatar_url if task.assignee else None,
+        "department_id": task.department_id,
+        "department_name": task.department.name if task.department else "Unknown",
+        "status": task.status,
+        "priority": task.priority,
+        "due_date": task.due_date,
+        "created_at": task.created_at,
+        "updated_at": task.updated_at,
+        "started_at": task.started_at,
+        "completed_at": task.completed_at,
+        "created_by_id": task.created_by_id,
+        "created_by_name": task.creator.full_name if task.creator else "Unknown",
+        "submission_status": task.submission_status,
+        "submitted_at": task.submitted_at,
+        "reviewed_at": task.reviewed_at,
+        "reviewer_name": task.reviewer.full_name if task.reviewer else None,
+        "revision_notes": task.revision_notes,
+        "article_id": task.article_id
+    }
+
 
 @router.get("/tasks", response_model=PaginatedResponse)
-async def get_all_tasks(
+def get_all_tasks(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     status: Optional[str] = Query(None),
     priority: Optional[str] = Query(None),
     department_id: Optional[str] = Query(None),
@@ -49,112 +91,103 @@ async def get_all_tasks(
         query = query.filter(Task.due_date >= due_date_from)
     if due_date_to:
         query = query.filter(Task.due_date <= due_date_to)
+    rank = None
     if search:
-        search_filter = or_(
-            Task.title.ilike(f"%{search}%"),
-            Task.description.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
+        # Trigram-indexed substring match, closest matches first
+        query, rank = apply_text_search(db, query, Task, search)
+    
+    # Apply keyset pagination; related rows are loaded in the same round trip
+    page = paginate(
+        query, (Task.created_at, Task.id), limit, skip, after, total_mode,
+        options=TASK_RELATIONS_LOAD,
+        order_first=(desc(rank),) if rank is not None else ()
+    )
+    tasks = page.pop("rows")
     
-    # Get total count
-    total = query.count()
+    # Build response
+    items = [serialize_task(task) for task in tasks]
     
-    # Apply pagination and ordering
-    tasks = query.order_by(desc(Task.created_at)).offset(skip).limit(limit).all()
+    return PaginatedResponse(items=items, **page)
+
+
+@router.get("/tasks/stats", response_model=TaskStatsResponse)
+def get_task_stats(
+    department_id: Optional[str] = Query(None),
+    assignee_id: Optional[str] = Query(None),
+    date_from: Optional[datetime] = Query(None),
+    date_to: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get task statistics"""
+    query = db.query(Task)
     
-    # Build response
-    items = []
-    for task in tasks:
-        # Get assignee info
-        assignee = db.query(User).filter(User.user_id == task.assignee_id).first()
-        assignee_name = assignee.full_name if assignee else "Unknown"
-        assignee_avatar = assignee.avatar_url if assignee else None
-        
-        # Get department info
-        department = db.query(Department).filter(Department.id == task.department_id).first()
-        department_name = department.name if department else "Unknown"
-        
-        # Get creator info
-        creator = db.query(User).filter(User.user_id == task.created_by_id).first()
-        creator_name = creator.full_name if creator else "Unknown"
-        
-        # Get reviewer info
-        reviewer_name = None
-        if task.reviewer_id:
-            reviewer = db.query(User).filter(User.user_id == task.reviewer_id).first()
-            reviewer_name = reviewer.full_name if reviewer else None
-        
-        items.append({
-            "id": task.id,
-            "title": task.title,
-            "description": task.description,
-            "assignee_id": task.assignee_id,
-            "assignee_name": assignee_name,
-            "assignee_avatar": assignee_avatar,
-            "department_id": task.department_id,
-            "department_name": department_name,
-            "status": task.status,
-            "priority": task.priority,
-            "due_date": task.due_date,
-            "created_at": task.created_at,
-            "updated_at": task.updated_at,
-            "started_at": task.started_at,
-            "completed_at": task.completed_at,
-            "created_by_id": task.created_by_id,
-            "created_by_name": creator_name,
-            "submission_status": task.submission_status,
-            "submitted_at": task.submitted_at,
-            "reviewed_at": task.reviewed_at,
-            "reviewer_name": reviewer_name,
-            "revision_notes": task.revision_notes,
-            "article_id": task.article_id
-        })
+    # Apply filters
+    if department_id:
+        query = query.filter(Task.department_id == department_id)
+    if assignee_id:
+        query = query.filter(Task.assignee_id == assignee_id)
+    if date_from:
+        query = query.filter(Task.created_at >= date_from)
+    if date_to:
+        query = query.filter(Task.created_at <= date_to)
+    
+    now = datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    today_end = today_start + timedelta(days=1)
+    week_end = today_start + timedelta(days=7)
+    open_task = Task.status.in_(["todo", "in_progress"])
+    
+    # Every bucket is computed in one scan over the filtered tasks
+    stats = aggregate_buckets(
+        query,
+        columns={
+            "total": count_where(),
+            "overdue": count_where(and_(Task.due_date < now, open_task)),
+            "due_today": count_where(
+                and_(Task.due_date >= today_start, Task.due_date < today_end, open_task)
+            ),
+            "due_this_week": count_where(
+                and_(Task.due_date >= today_start, Task.due_date < week_end, open_task)
+            )
+        },
+        groups={
+            "by_status": count_by_value(Task.status, ["todo", "in_progress", "completed", "blocked"]),
+            "by_priority": count_by_value(Task.priority, ["low", "medium", "high", "urgent"])
+        }
+    )
+    
+    # Calculate completion rate
+    completion_rate = 0.0
+    if stats["total"] > 0:
+        completion_rate = (stats["by_status"]["completed"] / stats["total"]) * 100
     
-    return PaginatedResponse(total=total, items=items)
+    return TaskStatsResponse(**stats, completion_rate=completion_rate)
 
 
 @router.get("/tasks/{task_id}", response_model=TaskDetailResponse)
-async def get_task_by_id(
+def get_task_by_id(
     task_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get task by ID with updates"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = db.query(Task).options(*TASK_RELATIONS_LOAD).filter(Task.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # Get assignee info
-    assignee = db.query(User).filter(User.user_id == task.assignee_id).first()
-    assignee_name = assignee.full_name if assignee else "Unknown"
-    assignee_avatar = assignee.avatar_url if assignee else None
-    
-    # Get department info
-    department = db.query(Department).filter(Department.id == task.department_id).first()
-    department_name = department.name if department else "Unknown"
-    
-    # Get creator info
-    creator = db.query(User).filter(User.user_id == task.created_by_id).first()
-    creator_name = creator.full_name if creator else "Unknown"
-    
-    # Get reviewer info
-    reviewer_name = None
-    if task.reviewer_id:
-        reviewer = db.query(User).filter(User.user_id == task.reviewer_id).first()
-        reviewer_name = reviewer.full_name if reviewer else None
-    
     # Get task updates
-    updates = db.query(TaskUpdate).filter(TaskUpdate.task_id == task.id)\
+    updates = db.query(TaskUpdate).options(joinedload(TaskUpdate.user))\
+        .filter(TaskUpdate.task_id == task.id)\
         .order_by(desc(TaskUpdate.created_at)).all()
     
     updates_data = []
     for update in updates:
-        update_user = db.query(User).filter(User.user_id == update.user_id).first()
         updates_data.append({
             "id": update.id,
             "type": update.type,
             "user_id": update.user_id,
-            "user_name": update_user.full_name if update_user else "Unknown",
+            "user_name": update.user.full_name if update.user else "Unknown",
             "old_value": update.old_value,
             "new_value": update.new_value,
             "comment": update.comment,
@@ -162,36 +195,11 @@ async def get_task_by_id(
             "created_at": update.created_at
         })
     
-    return TaskDetailResponse(
-        id=task.id,
-        title=task.title,
-        description=task.description,
-        assignee_id=task.assignee_id,
-        assignee_name=assignee_name,
-        assignee_avatar=assignee_avatar,
-        department_id=task.department_id,
-        department_name=department_name,
-        status=task.status,
-        priority=task.priority,
-        due_date=task.due_date,
-        created_at=task.created_at,
-        updated_at=task.updated_at,
-        started_at=task.started_at,
-        completed_at=task.completed_at,
-        created_by_id=task.created_by_id,
-        created_by_name=creator_name,
-        submission_status=task.submission_status,
-        submitted_at=task.submitted_at,
-        reviewed_at=task.reviewed_at,
-        reviewer_name=reviewer_name,
-        revision_notes=task.revision_notes,
-        article_id=task.article_id,
-        updates=updates_data
-    )
+    return TaskDetailResponse(**serialize_task(task), updates=updates_data)
 
 
 @router.post("/tasks", response_model=TaskResponse)
-async def create_task(
+def create_task(
     task_data: TaskCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("giao-viec", "create"))
@@ -281,7 +289,7 @@ async def create_task(
 
 
 @router.put("/tasks/{task_id}", response_model=TaskResponse)
-async def update_task(
+def update_task(
     task_id: str,
     task_data: TaskUpdateSchema,
     db: Session = Depends(get_db),
@@ -426,7 +434,7 @@ async def update_task(
 
 
 @router.delete("/tasks/{task_id}")
-async def delete_task(
+def delete_task(
     task_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("giao-viec", "delete"))
@@ -456,7 +464,7 @@ async def delete_task(
 
 
 @router.post("/tasks/{task_id}/submit")
-async def submit_task_for_review(
+def submit_task_for_review(
     task_id: str,
     request: TaskSubmitRequest,
     db: Session = Depends(get_db),
@@ -495,7 +503,7 @@ async def submit_task_for_review(
 
 
 @router.post("/tasks/{task_id}/review")
-async def review_task(
+def review_task(
     task_id: str,
     request: TaskReviewRequest,
     db: Session = Depends(get_db),
@@ -542,7 +550,7 @@ async def review_task(
 
 
 @router.post("/tasks/bulk-update")
-async def bulk_update_tasks(
+def bulk_update_tasks(
     request: BulkUpdateRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("giao-viec", "edit"))
@@ -581,85 +589,3 @@ async def bulk_update_tasks(
         "message": f"Updated {updated_count} tasks successfully",
         "updated_count": updated_count
     }
-
-
-@router.get("/tasks/stats", response_model=TaskStatsResponse)
-async def get_task_stats(
-    department_id: Optional[str] = Query(None),
-    assignee_id: Optional[str] = Query(None),
-    date_from: Optional[datetime] = Query(None),
-    date_to: Optional[datetime] = Query(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Get task statistics"""
-    query = db.query(Task)
-    
-    # Apply filters
-    if department_id:
-        query = query.filter(Task.department_id == department_id)
-    if assignee_id:
-        query = query.filter(Task.assignee_id == assignee_id)
-    if date_from:
-        query = query.filter(Task.created_at >= date_from)
-    if date_to:
-        query = query.filter(Task.created_at <= date_to)
-    
-    # Get counts
-    total = query.count()
-    
-    by_status = {
-        "todo": query.filter(Task.status == "todo").count(),
-        "in_progress": query.filter(Task.status == "in_progress").count(),
-        "completed": query.filter(Task.status == "completed").count(),
-        "blocked": query.filter(Task.status == "blocked").count()
-    }
-    
-    by_priority = {
-        "low": query.filter(Task.priority == "low").count(),
-        "medium": query.filter(Task.priority == "medium").count(),
-        "high": query.filter(Task.priority == "high").count(),
-        "urgent": query.filter(Task.priority == "urgent").count()
-    }
-    
-    # Calculate overdue tasks
-    now = datetime.utcnow()
-    overdue = query.filter(
-        and_(Task.due_date < now, Task.status.in_(["todo", "in_progress"]))
-    ).count()
-    
-    # Calculate due today
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    today_end = today_start + timedelta(days=1)
-    due_today = query.filter(
-        and_(
-            Task.due_date >= today_start,
-            Task.due_date < today_end,
-            Task.status.in_(["todo", "in_progress"])
-        )
-    ).count()
-    
-    # Calculate due this week
-    week_end = today_start + timedelta(days=7)
-    due_this_week = query.filter(
-        and_(
-            Task.due_date >= today_start,
-            Task.due_date < week_end,
-            Task.status.in_(["todo", "in_progress"])
-        )
-    ).count()
-    
-    # Calculate completion rate
-    completion_rate = 0.0
-    if total > 0:
-        completion_rate = (by_status["completed"] / total) * 100
-    
-    return TaskStatsResponse(
-        total=total,
-        by_status=by_status,
-        by_priority=by_priority,
-        overdue=overdue,
-        due_today=due_today,
-        due_this_week=due_this_week,
-        completion_rate=completion_rate
-    )
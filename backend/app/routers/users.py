@@ -1,9 +1,11 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, desc
 from app.database import get_db
-from app.auth import get_current_user, require_permission, get_password_hash
+from app.pagination import paginate, TOTAL_MODE_PATTERN
+from app.search import apply_text_search
+from app.auth import get_current_user, require_permission, get_password_hash, invalidate_cached_user
 from app.models import User, Department, Task, Article, AuditLog
 from app.schemas import (
     StaffCreate, StaffUpdate, StaffResponse, StaffDetailResponse, 
@@ -16,9 +18,11 @@ router = APIRouter(prefix="/api/v1", tags=["User Management"])
 
 
 @router.get("/users", response_model=PaginatedResponse)
-async def get_all_users(
+def get_all_users(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    after: Optional[str] = Query(None),
+    total_mode: Optional[str] = Query(None, pattern=TOTAL_MODE_PATTERN),
     role: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
@@ -33,19 +37,17 @@ async def get_all_users(
         query = query.filter(User.role == role)
     if status:
         query = query.filter(User.status == status)
+    rank = None
     if search:
-        search_filter = or_(
-            User.full_name.ilike(f"%{search}%"),
-            User.email.ilike(f"%{search}%"),
-            User.username.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
-    
-    # Get total count
-    total = query.count()
+        # Trigram-indexed substring match, closest matches first
+        query, rank = apply_text_search(db, query, User, search)
     
-    # Apply pagination
-    users = query.offset(skip).limit(limit).all()
+    # Apply keyset pagination, newest accounts first
+    page = paginate(
+        query, (User.created_at, User.user_id), limit, skip, after, total_mode,
+        order_first=(desc(rank),) if rank is not None else ()
+    )
+    users = page.pop("rows")
     
     # Build response
     items = []
@@ -76,11 +78,11 @@ async def get_all_users(
             "completed_tasks": completed_tasks
         })
     
-    return PaginatedResponse(total=total, items=items)
+    return PaginatedResponse(items=items, **page)
 
 
 @router.get("/users/{user_id}", response_model=StaffDetailResponse)
-async def get_user_by_id(
+def get_user_by_id(
     user_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("nhan-su", "view"))
@@ -136,7 +138,7 @@ async def get_user_by_id(
 
 
 @router.post("/users", response_model=dict)
-async def create_user(
+def create_user(
     user_data: StaffCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("nhan-su", "create"))
@@ -198,7 +200,7 @@ async def create_user(
 
 
 @router.put("/users/{user_id}", response_model=StaffResponse)
-async def update_user(
+def update_user(
     user_id: str,
     user_data: StaffUpdate,
     db: Session = Depends(get_db),
@@ -247,6 +249,7 @@ async def update_user(
     
     user.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_cached_user(user.user_id)
     
     # Log audit
     if old_values:
@@ -286,7 +289,7 @@ async def update_user(
 
 
 @router.delete("/users/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("nhan-su", "delete"))
@@ -315,6 +318,7 @@ async def delete_user(
     user.status = "inactive"
     user.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_cached_user(user.user_id)
     
     # Log audit
     audit_log = AuditLog(
@@ -333,7 +337,7 @@ async def delete_user(
 
 
 @router.post("/users/{user_id}/reset-password")
-async def reset_password(
+def reset_password(
     user_id: str,
     request: ResetPasswordRequest,
     db: Session = Depends(get_db),
@@ -348,6 +352,7 @@ async def reset_password(
     user.password_hash = get_password_hash(request.new_password)
     user.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_cached_user(user.user_id)
     
     # Log audit
     audit_log = AuditLog(
@@ -366,7 +371,7 @@ async def reset_password(
 
 
 @router.get("/users/{user_id}/stats")
-async def get_user_stats(
+def get_user_stats(
     user_id: str,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_permission("nhan-su", "view"))
@@ -2,10 +2,13 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPExce
 from typing import Dict, List
 import json
 import asyncio
+import uuid
+from pydantic import ValidationError
 from app.auth import verify_token
-from app.database import get_db
-from sqlalchemy.orm import Session
+from app.assistant import open_turn, stream_reply
+from app.database import get_async_db, get_async_session
 from app.models import User
+from app.schemas import ChatMessageRequest
 
 router = APIRouter(prefix="/api/v1", tags=["WebSocket"])
 
@@ -58,8 +61,8 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
             return
         
         # Get user from database
-        db = next(get_db())
-        user = db.query(User).filter(User.user_id == user_id).first()
+        async for db in get_async_db():
+            user = await db.get(User, uuid.UUID(user_id))
         if not user:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
@@ -77,6 +80,9 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
             }
         }, user_id)
         
+        # Chat replies streaming to this connection
+        chat_tasks = set()
+        
         # Keep connection alive and handle messages
         while True:
             try:
@@ -90,18 +96,51 @@ async def websocket_endpoint(websocket: WebSocket, token: str = None):
                         "data": {"timestamp": "2025-01-20T10:00:00Z"}
                     }, user_id)
                 
+                elif message.get("event") == "chat_send":
+                    task = asyncio.create_task(relay_chat(user, message.get("data") or {}))
+                    chat_tasks.add(task)
+                    task.add_done_callback(chat_tasks.discard)
+                
             except WebSocketDisconnect:
                 manager.disconnect(user_id)
                 break
             except Exception as e:
                 print(f"WebSocket error: {e}")
                 break
+        
+        # Stop generating for a client that left (partial replies are saved)
+        for task in chat_tasks:
+            task.cancel()
                 
     except Exception as e:
         print(f"WebSocket connection error: {e}")
         await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
 
 
+async def relay_chat(user: User, data: dict):
+    """Answer a chat_send event, streaming the reply to the user as chat_* events"""
+    user_id = str(user.user_id)
+    try:
+        request = ChatMessageRequest(**data)
+        async with get_async_session() as db:
+            turn = await open_turn(db, request, user)
+    except ValidationError as e:
+        await manager.send_personal_message({
+            "event": "chat_error",
+            "data": {"session_id": data.get("session_id"), "message_id": None, "error": str(e)}
+        }, user_id)
+        return
+    except HTTPException as e:
+        await manager.send_personal_message({
+            "event": "chat_error",
+            "data": {"session_id": data.get("session_id"), "message_id": None, "error": e.detail}
+        }, user_id)
+        return
+    
+    async for event in stream_reply(turn, user.user_id, request.context_data):
+        await manager.send_personal_message(event, user_id)
+
+
 async def send_task_assigned_notification(user_id: str, task_data: dict):
     """Send task assigned notification via WebSocket"""
     await manager.send_personal_message({
@@ -0,0 +1,430 @@
+"""
+Scan engine.
+
+Scan jobs run in a separate worker process (scripts/scan_worker.py), never
+in API workers: the API only inserts ``ScanJob`` rows with status
+"pending". Workers claim pending jobs with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` so several can run side by side, crawl the source with a bounded
+pool of concurrent requests and write progress back as they go. Requests go
+through the worker's shared ``Crawler`` (app/crawler.py), which keeps
+per-host connections alive, rate-limits each domain, obeys robots.txt and
+retries transient failures.
+
+Crawling is breadth-first from ``source_url``: the source page itself is
+the listing, every same-site link found on it is an item. "deep" scans
+also follow links found on item pages. At most ``max_items`` items are
+collected per job. Item bodies go to the blob store (app/storage.py) and
+one ``ScanItem`` row per item is inserted with the progress writes. HTML
+items are parsed in the extraction process pool (app/extraction.py) for
+their title and main text. Items whose URL or main text was seen before
+are marked with ``duplicate_of`` (see app/dedup.py).
+
+Pages are fetched conditionally (app/fetch_validators.py). When the source
+page has not changed since the last scan the job ends without items; an
+unchanged item page is not downloaded or parsed again, its item reuses the
+stored content, and its links are not followed.
+"""
+
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import re
+import time
+import weakref
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+from sqlalchemy import delete, desc, select
+from app.config import settings
+from app.crawler import Crawler, FetchError
+from app.database import SessionLocal, get_async_session
+from app.dedup import find_duplicate, remember, simhash, url_hash
+from app.extraction import ExtractionError, declared_encoding, parse_in_pool, shutdown_pool
+from app.fetch_validators import body_hash, conditional_headers, is_unchanged, load_validator, save_validator
+from app.models import ScanItem, ScanJob
+from app.storage import get_blob_store
+from app.utils import generate_slug
+
+logger = logging.getLogger(__name__)
+
+# Link levels followed from the source page for each ScanJob.scan_depth
+SCAN_DEPTHS = {"shallow": 1, "deep": 2}
+
+# Seconds between progress writes while a job is running
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+# Error messages kept on a job (the first failures are the useful ones)
+MAX_RECORDED_ERRORS = 5
+
+HREF_PATTERN = re.compile(r"""<a\s[^>]*?href\s*=\s*["']([^"'#]+)""", re.IGNORECASE)
+
+# Per event loop: asyncio locks cannot be shared between loops
+_dedup_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+
+class ScanError(Exception):
+    """A source cannot be scanned"""
+
+
+def extract_links(base_url: str, html: str) -> List[str]:
+    """Absolute http(s) links on the same site as base_url, in page order"""
+    host = urlsplit(base_url).hostname
+    links = []
+    seen = set()
+    for href in HREF_PATTERN.findall(html):
+        url, _ = urldefrag(urljoin(base_url, href.strip()))
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or parts.hostname != host:
+            continue
+        if url not in seen:
+            seen.add(url)
+            links.append(url)
+    return links
+
+
+def page_text(page: Dict) -> str:
+    """Decoded body of a fetched page"""
+    return page["body"].decode(page["encoding"], errors="replace")
+
+
+def is_html(page: Dict) -> bool:
+    return "html" in page["content_type"] or not page["content_type"]
+
+
+def item_filename(url: str, content_type: str) -> str:
+    """Readable file name for an item, unique per URL"""
+    parts = urlsplit(url)
+    name = parts.path.rstrip("/").rsplit("/", 1)[-1] or parts.hostname or "index"
+    stem = generate_slug(name.rsplit(".", 1)[0])[:80] or "item"
+    extension = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ".bin"
+    url_hash = hashlib.sha1(url.encode()).hexdigest()[:10]
+    return f"{stem}-{url_hash}{extension}"
+
+
+def _dedup_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    if loop not in _dedup_locks:
+        _dedup_locks[loop] = asyncio.Lock()
+    return _dedup_locks[loop]
+
+
+def _load_validator(url: str) -> Optional[Dict]:
+    with SessionLocal() as db:
+        return load_validator(db, url)
+
+
+def _save_validator(url: str, page: Dict, content_hash: Optional[str]):
+    with SessionLocal() as db:
+        save_validator(db, url, page, content_hash)
+        db.commit()
+
+
+def record_page(scan_id, url: str, page: Dict, content_hash: str, fingerprint: Optional[int]) -> Optional[str]:
+    """Save the page's validators and fingerprint; returns the URL of an earlier copy, if any (blocking)"""
+    with SessionLocal() as db:
+        duplicate_of = None
+        if is_html(page):
+            match = find_duplicate(db, page["url"], fingerprint)
+            if match is not None and match.scan_id == scan_id and match.url_hash == url_hash(page["url"]):
+                # Fetched by an earlier run of this same job (retry)
+                match = None
+            duplicate_of = match.url if match is not None else None
+            remember(db, page["url"], fingerprint, scan_id=scan_id)
+        save_validator(db, url, page, content_hash)
+        db.commit()
+    return duplicate_of
+
+
+def unchanged_item(scan_id, url: str, page: Dict, validator: Dict) -> Optional[ScanItem]:
+    """Item for a page unchanged since the last scan, copied from its last item (blocking)
+
+    None when there is no earlier item with that content to copy from.
+    """
+    with SessionLocal() as db:
+        previous = db.query(ScanItem).filter(ScanItem.content_hash == validator["content_hash"])\
+            .order_by(desc(ScanItem.fetched_at)).first()
+        if previous is None or not get_blob_store().exists(previous.content_hash):
+            return None
+        save_validator(db, url, page, validator["content_hash"])
+        db.commit()
+        return ScanItem(
+            scan_id=scan_id,
+            url=page["url"][:1000],
+            title=previous.title,
+            filename=item_filename(url, previous.content_type or "text/html"),
+            content_type=previous.content_type,
+            size=previous.size,
+            content_hash=previous.content_hash,
+            status_code=page["status_code"],
+            duplicate_of=previous.url,
+            fetched_at=datetime.now(timezone.utc)
+        )
+
+
+async def store_item(job: ScanJob, url: str, page: Dict) -> ScanItem:
+    """Write the page body to the blob store and build its ScanItem row"""
+    content_hash = await asyncio.to_thread(get_blob_store().put, page["body"])
+    content_type = page["content_type"] or "text/html"
+    article = await parse_in_pool(page["body"], page["url"], declared_encoding(page)) if is_html(page) else None
+    # Main text only: pages of one site share navigation and footers
+    fingerprint = await asyncio.to_thread(simhash, article["text"]) if article else None
+    # One check at a time, so copies fetched at the same moment see each other
+    async with _dedup_lock():
+        duplicate_of = await asyncio.to_thread(record_page, job.scan_id, url, page, content_hash, fingerprint)
+    return ScanItem(
+        scan_id=job.scan_id,
+        url=page["url"][:1000],
+        title=article["title"] if article else None,
+        filename=item_filename(url, content_type),
+        content_type=content_type[:100],
+        size=len(page["body"]),
+        content_hash=content_hash,
+        status_code=page["status_code"],
+        duplicate_of=duplicate_of,
+        fetched_at=datetime.now(timezone.utc)
+    )
+
+
+class ScanProgress:
+    """Counters of a running job, flushed to the ScanJob row periodically"""
+
+    def __init__(self):
+        self.items_found = 0
+        self.items_processed = 0
+        self.failed = 0
+        self.unchanged = 0
+        self.errors: List[str] = []
+        self.new_items: List[ScanItem] = []
+
+    def record_error(self, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_RECORDED_ERRORS:
+            self.errors.append(message)
+
+
+async def crawl(
+    crawler: Crawler,
+    job: ScanJob,
+    progress: ScanProgress,
+    concurrency: int = None
+):
+    """Crawl job.source_url with at most `concurrency` requests in flight"""
+    concurrency = concurrency or settings.scan_fetch_concurrency
+    max_depth = SCAN_DEPTHS.get(job.scan_depth, 1)
+    max_items = job.max_items or 0
+
+    # The source page must load, otherwise the whole job fails
+    root_validator = await asyncio.to_thread(_load_validator, job.source_url)
+    root = await crawler.fetch(job.source_url, headers=conditional_headers(root_validator))
+    if is_unchanged(root_validator, root):
+        logger.info("Scan %s: %s unchanged since the last scan", job.scan_id, job.source_url)
+        return
+    if not is_html(root):
+        raise ScanError(f"{job.source_url}: not an HTML page ({root['content_type']})")
+
+    seen = {job.source_url, root["url"]}
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def discover(page: Dict, depth: int):
+        if depth > max_depth:
+            return
+        for link in extract_links(page["url"], page_text(page)):
+            if progress.items_found >= max_items:
+                return
+            if link in seen:
+                continue
+            seen.add(link)
+            progress.items_found += 1
+            queue.put_nowait((link, depth))
+
+    discover(root, 1)
+
+    async def worker():
+        while True:
+            url, depth = await queue.get()
+            try:
+                validator = await asyncio.to_thread(_load_validator, url)
+                page = await crawler.fetch(url, headers=conditional_headers(validator))
+                item = None
+                if is_unchanged(validator, page):
+                    item = await asyncio.to_thread(unchanged_item, job.scan_id, url, page, validator)
+                    if item is None and page["status_code"] == 304:
+                        # Nothing stored to reuse: download it after all
+                        page = await crawler.fetch(url)
+                if item is not None:
+                    progress.unchanged += 1
+                else:
+                    item = await store_item(job, url, page)
+                    if is_html(page):
+                        discover(page, depth + 1)
+                progress.new_items.append(item)
+                progress.items_processed += 1
+            except Exception as e:
+                progress.record_error(str(e) if isinstance(e, (FetchError, ExtractionError)) else f"{url}: {e}")
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    # Only a finished crawl lets the next scan skip an unchanged source page
+    await asyncio.to_thread(_save_validator, job.source_url, root, body_hash(root["body"]))
+
+
+async def claim_job(db) -> Optional[ScanJob]:
+    """Mark the oldest pending job running and return it (None if there is none)"""
+    result = await db.execute(
+        select(ScanJob)
+        .where(ScanJob.status == "pending")
+        .order_by(ScanJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    job = result.scalars().first()
+    if job is None:
+        await db.rollback()
+        return None
+    # A retried job starts over with no items
+    await db.execute(delete(ScanItem).where(ScanItem.scan_id == job.scan_id))
+    job.status = "running"
+    job.started_at = datetime.now(timezone.utc)
+    job.completed_at = None
+    job.error_message = None
+    job.items_found = 0
+    job.items_processed = 0
+    await db.commit()
+    return job
+
+
+async def fail_stale_jobs(db) -> int:
+    """Fail jobs left running by a worker that stopped; returns how many"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.scan_job_timeout_seconds * 2)
+    result = await db.execute(
+        select(ScanJob).where(ScanJob.status == "running", ScanJob.started_at < cutoff)
+    )
+    jobs = result.scalars().all()
+    for job in jobs:
+        job.status = "failed"
+        job.completed_at = datetime.now(timezone.utc)
+        job.error_message = "Scan worker stopped before the scan finished"
+    await db.commit()
+    return len(jobs)
+
+
+def _write_progress(db, job: ScanJob, progress: ScanProgress):
+    db.add_all(progress.new_items)
+    progress.new_items = []
+    job.items_found = progress.items_found
+    job.items_processed = progress.items_processed
+
+
+def _error_summary(progress: ScanProgress) -> Optional[str]:
+    if not progress.failed:
+        return None
+    return f"{progress.failed} of {progress.items_found} items failed:\n" + "\n".join(progress.errors)
+
+
+async def run_job(crawler: Crawler, job_id):
+    """Crawl one claimed job and record its outcome"""
+    async with get_async_session() as db:
+        job = await db.get(ScanJob, job_id)
+        progress = ScanProgress()
+        started = time.monotonic()
+
+        crawled = asyncio.Event()
+
+        async def flush_progress():
+            # Stopped through crawled, never cancelled: a commit cut short would leave the session unusable
+            while True:
+                try:
+                    await asyncio.wait_for(crawled.wait(), PROGRESS_INTERVAL_SECONDS)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+                _write_progress(db, job, progress)
+                await db.commit()
+
+        flusher = asyncio.create_task(flush_progress())
+        try:
+            await asyncio.wait_for(
+                crawl(crawler, job, progress), timeout=settings.scan_job_timeout_seconds
+            )
+            job.status = "completed"
+            job.error_message = _error_summary(progress)
+        except asyncio.TimeoutError:
+            job.status = "failed"
+            job.error_message = f"Scan timed out after {settings.scan_job_timeout_seconds}s"
+        except (ScanError, FetchError) as e:
+            logger.warning("Scan %s failed: %s", job_id, e)
+            job.status = "failed"
+            job.error_message = str(e)
+        except Exception as e:
+            logger.exception("Scan %s failed", job_id)
+            job.status = "failed"
+            job.error_message = str(e)
+        finally:
+            crawled.set()
+            flushed, = await asyncio.gather(flusher, return_exceptions=True)
+            if isinstance(flushed, Exception):
+                logger.error("Progress of scan %s not saved: %s", job_id, flushed)
+                await db.rollback()
+
+        _write_progress(db, job, progress)
+        job.completed_at = datetime.now(timezone.utc)
+        await db.commit()
+        logger.info(
+            "Scan %s %s: %d/%d items (%d unchanged) in %.1fs",
+            job_id, job.status, progress.items_processed, progress.items_found,
+            progress.unchanged, time.monotonic() - started
+        )
+
+
+async def run_worker(stop: asyncio.Event):
+    """Claim and run pending jobs until stop is set"""
+    slots = asyncio.Semaphore(settings.scan_worker_concurrency)
+    running = set()
+
+    async with get_async_session() as db:
+        stale = await fail_stale_jobs(db)
+        if stale:
+            logger.warning("Marked %d stale running scans as failed", stale)
+
+    # One crawler for all jobs: domain limits hold across concurrent scans
+    async with Crawler() as crawler:
+        while not stop.is_set():
+            await slots.acquire()
+            try:
+                async with get_async_session() as db:
+                    job = await claim_job(db)
+            except Exception:
+                logger.exception("Could not claim a scan job")
+                job = None
+
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=settings.scan_poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(run_job(crawler, job.scan_id))
+            running.add(task)
+
+            def done(finished, running=running):
+                running.discard(finished)
+                slots.release()
+
+            task.add_done_callback(done)
+
+        # Let jobs in progress finish before the crawler closes
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    shutdown_pool()
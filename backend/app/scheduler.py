@@ -0,0 +1,124 @@
+"""
+Automatic source scans.
+
+Sources with ``auto_scan`` keep ``next_scan_at``; ``queue_due_scans``
+finds due sources with one range scan of the partial index
+``ix_sources_next_scan_at`` and inserts pending ``ScanJob`` rows for the
+scan worker. It runs every ``SCAN_SCHEDULER_INTERVAL_SECONDS`` in
+scripts/scan_scheduler.py and is safe to run in several replicas: on
+Postgres a transaction-level advisory lock lets one replica at a time do a
+run, and due rows are read ``FOR UPDATE SKIP LOCKED``.
+
+Each queued source gets its next scan one ``scan_frequency`` interval
+later plus random jitter, so sources added together drift apart. At most
+``SCAN_MAX_JOBS_PER_DOMAIN`` jobs per host are pending or running; sources
+over the limit are retried on the next run.
+"""
+
+import logging
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from urllib.parse import urlsplit
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import ScanJob, Source, User
+
+logger = logging.getLogger(__name__)
+
+SCAN_INTERVALS = {
+    "hourly": timedelta(hours=1),
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+}
+
+# Key of the Postgres advisory lock held while queueing
+SCHEDULER_LOCK_KEY = 0x5CA9_0001
+
+
+def source_domain(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def schedule_next_scan(source: Source, after: Optional[datetime] = None):
+    """Set next_scan_at one interval (plus jitter) after `after`, by default the last scan"""
+    after = after or source.last_scan_at
+    if after is None:
+        source.next_scan_at = datetime.now(timezone.utc)
+        return
+    interval = SCAN_INTERVALS.get(source.scan_frequency, SCAN_INTERVALS["daily"])
+    jitter = interval * random.uniform(0, settings.scan_schedule_jitter)
+    source.next_scan_at = after + interval + jitter
+
+
+def queue_scan(db: Session, source: Source, created_by_id, scan_depth: str = "shallow") -> ScanJob:
+    """Add a pending scan job for source and move its schedule forward (not committed)"""
+    now = datetime.now(timezone.utc)
+    scan_job = ScanJob(
+        source_name=source.name,
+        source_url=source.url,
+        scan_depth=scan_depth,
+        status="pending",
+        created_by_id=created_by_id
+    )
+    db.add(scan_job)
+    source.last_scan_at = now
+    source.total_scans = (source.total_scans or 0) + 1
+    schedule_next_scan(source, after=now)
+    return scan_job
+
+
+def _acquire_lock(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return db.execute(
+        text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SCHEDULER_LOCK_KEY}
+    ).scalar()
+
+
+def queue_due_scans(db: Session, now: Optional[datetime] = None) -> int:
+    """Queue scan jobs for due auto-scan sources; returns the number queued"""
+    now = now or datetime.now(timezone.utc)
+    if not _acquire_lock(db):
+        # Another replica is queueing right now
+        db.rollback()
+        return 0
+
+    scheduler_user = db.query(User).filter(User.username == settings.scan_scheduler_username).first()
+    if scheduler_user is None:
+        logger.error("Scan scheduler user '%s' not found", settings.scan_scheduler_username)
+        db.rollback()
+        return 0
+
+    due_sources = db.query(Source).filter(
+        Source.auto_scan == True,
+        Source.is_active == True,
+        Source.next_scan_at <= now
+    ).order_by(Source.next_scan_at)\
+        .limit(settings.scan_scheduler_batch_size)\
+        .with_for_update(skip_locked=True).all()
+    if not due_sources:
+        db.rollback()
+        return 0
+
+    active_jobs = Counter(
+        source_domain(url) for (url,) in
+        db.query(ScanJob.source_url).filter(ScanJob.status.in_(["pending", "running"]))
+    )
+    retry_at = now + timedelta(seconds=settings.scan_scheduler_interval_seconds)
+
+    queued = 0
+    for source in due_sources:
+        domain = source_domain(source.url)
+        if active_jobs[domain] >= settings.scan_max_jobs_per_domain:
+            source.next_scan_at = retry_at
+            continue
+        queue_scan(db, source, scheduler_user.user_id)
+        active_jobs[domain] += 1
+        queued += 1
+
+    db.commit()
+    return queued
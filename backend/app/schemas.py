@@ -234,12 +234,28 @@ class ArticleCreateFromSource(BaseModel):
     title: str
     prompt_file: Optional[str] = None
     editor_instructions: Optional[str] = None
+    allow_duplicate: bool = False  # generate even if the content already has an article
+    priority: str = "default"  # generation queue lane: high, default, low
+
+    @validator('priority')
+    def validate_priority(cls, v):
+        if v not in ('high', 'default', 'low'):
+            raise ValueError('Priority must be high, default or low')
+        return v
 
 
 class ArticleCreateFromManualURL(BaseModel):
     url: str
     prompt_file: Optional[str] = None
     editor_instructions: Optional[str] = None
+    allow_duplicate: bool = False  # generate even if the content already has an article
+    priority: str = "default"  # generation queue lane: high, default, low
+
+    @validator('priority')
+    def validate_priority(cls, v):
+        if v not in ('high', 'default', 'low'):
+            raise ValueError('Priority must be high, default or low')
+        return v
 
 
 class ArticleUpdate(BaseModel):
@@ -258,6 +274,7 @@ class ArticleResponse(BaseModel):
     published_url: Optional[str] = None
     word_count: int
     last_edited_at: Optional[datetime] = None
+    generation_job_id: Optional[UUID] = None  # AI generation job started by the request
 
 
 class ArticleDetailResponse(ArticleResponse):
@@ -367,6 +384,7 @@ class SourceResponse(BaseModel):
     auto_scan: bool
     scan_frequency: str
     last_scan_at: Optional[datetime] = None
+    next_scan_at: Optional[datetime] = None
     total_scans: int
     created_at: datetime
 
@@ -479,8 +497,12 @@ class SystemSettingsUpdate(BaseModel):
 
 # Pagination schemas
 class PaginatedResponse(BaseModel):
-    total: int
+    total: Optional[int] = None
+    total_is_estimate: bool = False
     items: List[Any]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+    unread_count: Optional[int] = None
 
 
 # Error schemas
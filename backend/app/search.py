@@ -0,0 +1,182 @@
+"""
+Search for list endpoints.
+
+Articles use full-text search. Every article keeps ``search_text``: its title and body stripped of HTML and
+folded to unaccented lowercase with ``utils.fold_accents``. On Postgres it
+also keeps ``search_vector``, a weighted tsvector (title A, body B) over the
+same folded text, indexed with GIN. Queries are folded the same way, so
+"dong bo" matches "Đồng bộ". The ``simple`` configuration is used because
+Vietnamese words are syllables and do not stem.
+
+Tasks, users, prompts and sources use substring search through a search
+backend: ``TrigramSearchBackend`` on Postgres, where ILIKE '%term%' is served
+by the pg_trgm GIN indexes declared in app/models.py and matches are ranked
+by trigram word similarity, and ``LikeSearchBackend`` elsewhere (SQLite).
+"""
+
+import re
+from html import escape
+from typing import List, Optional, Tuple
+from sqlalchemy import cast, func, or_
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.elements import ColumnElement
+from app.models import Article, Prompt, Source, Task, User
+from app.utils import fold_accents, strip_html
+
+SEARCH_CONFIG = "simple"
+SNIPPET_LENGTH = 200
+
+# Columns matched by the search parameter of each list endpoint; each has a
+# trigram index (models.trigram_index)
+SEARCH_COLUMNS = {
+    Task: (Task.title, Task.description),
+    User: (User.full_name, User.email, User.username),
+    Prompt: (Prompt.name, Prompt.description, Prompt.content),
+    Source: (Source.name, Source.url, Source.category),
+}
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def search_terms(text: str) -> List[str]:
+    """Folded words of a search query"""
+    return re.findall(r"[a-z0-9]+", fold_accents(text or ""))
+
+
+def _tsvector(text: str, weight: str) -> ColumnElement:
+    return func.setweight(func.to_tsvector(cast(SEARCH_CONFIG, REGCONFIG), text), weight)
+
+
+def index_article(db: Session, article: Article):
+    """Refresh the search columns of an article from its title and content"""
+    title = fold_accents(article.title or "")
+    body = fold_accents(strip_html(article.content_html or ""))
+    article.search_text = f"{title}\n{body}"
+    if _is_postgres(db):
+        article.search_vector = _tsvector(title, "A").op("||")(_tsvector(body, "B"))
+
+
+def apply_article_search(db: Session, query: Query, text: str) -> Tuple[Query, Optional[ColumnElement]]:
+    """Restrict query to articles matching every search term
+
+    Returns the filtered query and a relevance expression to order by
+    (None when the database has no full-text index).
+    """
+    terms = search_terms(text)
+    if not terms:
+        return query, None
+
+    if _is_postgres(db):
+        # Prefix match on every term so partially typed words still hit
+        tsquery = func.to_tsquery(
+            cast(SEARCH_CONFIG, REGCONFIG), " & ".join(f"{term}:*" for term in terms)
+        )
+        rank = func.ts_rank_cd(Article.search_vector, tsquery)
+        return query.filter(Article.search_vector.op("@@")(tsquery)), rank
+
+    for term in terms:
+        query = query.filter(Article.search_text.like(f"%{term}%"))
+    return query, None
+
+
+def highlight(text: str, terms: List[str], max_length: int = SNIPPET_LENGTH) -> str:
+    """HTML-escaped excerpt of text around the first match, with matches in <mark>"""
+    if not text:
+        return ""
+    if not terms:
+        return escape(text[:max_length])
+
+    # fold_accents keeps one character per character, so match positions in
+    # the folded text are positions in the original text
+    folded = fold_accents(text)
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")\w*")
+    first = pattern.search(folded)
+
+    start = 0
+    if first and len(text) > max_length:
+        start = max(0, min(first.start() - max_length // 4, len(text) - max_length))
+    end = min(len(text), start + max_length)
+
+    parts = ["…" if start > 0 else ""]
+    position = start
+    for match in pattern.finditer(folded, start, end):
+        match_end = min(match.end(), end)
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f"<mark>{escape(text[match.start():match_end])}</mark>")
+        position = match_end
+    parts.append(escape(text[position:end]))
+    parts.append("…" if end < len(text) else "")
+    return "".join(parts)
+
+
+def reindex_articles(db: Session, batch_size: int = 500) -> int:
+    """Rebuild search columns for all articles; returns number indexed"""
+    indexed = 0
+    last_id = None
+    while True:
+        query = db.query(Article).order_by(Article.article_id)
+        if last_id is not None:
+            query = query.filter(Article.article_id > last_id)
+        batch = query.limit(batch_size).all()
+        if not batch:
+            break
+        for article in batch:
+            index_article(db, article)
+        last_id = batch[-1].article_id
+        db.commit()
+        indexed += len(batch)
+        db.expunge_all()
+    return indexed
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+class LikeSearchBackend:
+    """Case-insensitive substring match on any column; no ranking"""
+
+    name = "like"
+
+    def filter(self, query: Query, columns, text: str) -> Query:
+        pattern = _like_pattern(text)
+        return query.filter(or_(*[column.ilike(pattern, escape="\\") for column in columns]))
+
+    def rank(self, columns, text: str) -> Optional[ColumnElement]:
+        return None
+
+
+class TrigramSearchBackend(LikeSearchBackend):
+    """ILIKE served by pg_trgm GIN indexes, ranked by best word similarity"""
+
+    name = "trigram"
+
+    def rank(self, columns, text: str) -> Optional[ColumnElement]:
+        return func.greatest(*[func.word_similarity(text, column) for column in columns])
+
+
+_backends = {"postgresql": TrigramSearchBackend()}
+_fallback_backend = LikeSearchBackend()
+
+
+def get_search_backend(db: Session) -> LikeSearchBackend:
+    """Search backend for the session's database"""
+    return _backends.get(db.get_bind().dialect.name, _fallback_backend)
+
+
+def apply_text_search(db: Session, query: Query, model, text: str) -> Tuple[Query, Optional[ColumnElement]]:
+    """Restrict query to rows of model whose search columns contain text
+
+    Returns the filtered query and a relevance expression to order by
+    (None when the backend does not rank).
+    """
+    text = (text or "").strip()
+    if not text:
+        return query, None
+    backend = get_search_backend(db)
+    columns = SEARCH_COLUMNS[model]
+    return backend.filter(query, columns, text), backend.rank(columns, text)
@@ -0,0 +1,174 @@
+"""
+Content-addressed blob storage on local disk.
+
+Blobs live under ``settings.upload_dir``/blobs and are named by the SHA-256
+of their content (``blobs/ab/cd/abcd...``), so identical pages fetched by
+different scans are stored once and writing a blob twice is a no-op. Files
+are written under a temporary name and renamed into place, so readers never
+see a partial blob.
+
+``blob_response`` serves a blob from disk in chunks, honouring single
+``Range`` requests and ``If-None-Match`` (the content hash is the ETag).
+Blobs are scraped third-party content: they are served sandboxed and
+unsniffed, and markup that a browser would run (HTML, SVG, XML) is sent as
+a download rather than rendered on the API origin.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+from fastapi import HTTPException, Request, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from app.config import settings
+
+CHUNK_SIZE = 64 * 1024
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9._ -]')
+
+# Types a browser would execute scripts in; never rendered inline
+ACTIVE_CONTENT_TYPES = {
+    "text/html", "application/xhtml+xml", "image/svg+xml", "text/xml", "application/xml",
+}
+
+
+class BlobStore:
+    """Immutable blobs keyed by the sha256 of their content"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, content_hash: str) -> str:
+        if not HASH_PATTERN.match(content_hash or ""):
+            raise ValueError(f"Invalid blob hash: {content_hash!r}")
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], content_hash)
+
+    def exists(self, content_hash: str) -> bool:
+        return os.path.exists(self.path(content_hash))
+
+    def put(self, data: bytes) -> str:
+        """Store data and return its hash"""
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self.path(content_hash)
+        if os.path.exists(path):
+            return content_hash
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return content_hash
+
+    def read(self, content_hash: str) -> bytes:
+        with open(self.path(content_hash), "rb") as f:
+            return f.read()
+
+    def delete(self, content_hash: str):
+        try:
+            os.remove(self.path(content_hash))
+        except FileNotFoundError:
+            pass
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Blob store under the configured upload directory"""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore(os.path.join(settings.upload_dir, "blobs"))
+    return _blob_store
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single byte range; None to send everything
+
+    Multiple ranges and malformed headers are answered with the whole body,
+    which RFC 9110 allows. Unsatisfiable ranges raise 416.
+    """
+    match = RANGE_PATTERN.match((header or "").strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def _iter_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def content_disposition(disposition: str, filename: str) -> str:
+    """Content-Disposition with an ASCII fallback name and the exact name in RFC 5987 form"""
+    filename = filename or "download"
+    fallback = UNSAFE_FILENAME_CHARS.sub("_", filename) or "download"
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def blob_response(request: Request, content_hash: str, media_type: str, filename: str) -> Response:
+    """Stream a stored blob to the client"""
+    store = get_blob_store()
+    path = store.path(content_hash)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="File content not found")
+
+    mime = media_type.split(";", 1)[0].strip().lower()
+    etag = f'"{content_hash}"'
+    headers = {
+        # Sent as stored (Starlette would append a second charset to text/*)
+        "Content-Type": media_type,
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": "private, max-age=86400",
+        "Content-Disposition": content_disposition("attachment" if mime in ACTIVE_CONTENT_TYPES else "inline", filename),
+        "X-Content-Type-Options": "nosniff",
+        "Content-Security-Policy": "sandbox",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    size = os.path.getsize(path)
+    byte_range = parse_range(request.headers.get("range"), size)
+    if byte_range is None:
+        return FileResponse(path, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        headers=headers
+    )
@@ -0,0 +1,104 @@
+"""
+Token counting for the AI models.
+
+Counts use the model's BPE encoding through tiktoken. Encodings are loaded
+on first use and cached per model. Their BPE files are read from
+``settings.tokenizer_dir``, which scripts/download_tokenizers.py fills (the
+Docker image does it at build time), so counting needs no network at run
+time. Models tiktoken does not know (gateways, fine-tunes) use
+``TOKENIZER_DEFAULT_ENCODING``. If no encoding can be loaded, counts are
+estimated from the UTF-8 length and ``Tokenizer.exact`` is False.
+"""
+
+import logging
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Chat format overhead: per message, and for priming the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+_tokenizers: Dict[str, "Tokenizer"] = {}
+_lock = threading.Lock()
+
+
+def _estimate(text: str) -> int:
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+class Tokenizer:
+    """Token counter for one model"""
+
+    def __init__(self, model: str, encoding=None):
+        self.model = model
+        self.encoding = encoding
+        self.exact = encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is None:
+            return _estimate(text)
+        # Special-token markers in user text are counted as plain text
+        return len(self.encoding.encode_ordinary(text))
+
+    def count_batch(self, texts: Sequence[str]) -> List[int]:
+        if self.encoding is None:
+            return [_estimate(text) if text else 0 for text in texts]
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch([text or "" for text in texts])]
+
+    def count_messages(self, messages: Sequence[Dict]) -> int:
+        """Prompt tokens of a chat completion request"""
+        texts = [m["role"] for m in messages] + [m.get("content") or "" for m in messages]
+        return sum(self.count_batch(texts)) + TOKENS_PER_MESSAGE * len(messages) + TOKENS_PER_REPLY
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of text within max_tokens"""
+        if self.encoding is None:
+            return text.encode("utf-8")[:max_tokens * 4].decode("utf-8", errors="ignore")
+        tokens = self.encoding.encode_ordinary(text)
+        if len(tokens) <= max_tokens:
+            return text
+        # A cut inside a multi-byte character decodes to U+FFFD
+        return self.encoding.decode(tokens[:max_tokens]).rstrip("�")
+
+
+def _load_encoding(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken is not installed, token counts for %s are estimates", model)
+        return None
+
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", os.path.abspath(settings.tokenizer_dir))
+    try:
+        name = tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        name = settings.tokenizer_default_encoding
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning("Could not load the %s encoding (%s), token counts for %s are estimates", name, e, model)
+        return None
+
+
+def get_tokenizer(model: Optional[str] = None) -> Tokenizer:
+    """Tokenizer of model (default ``settings.ai_model``), loaded on first use"""
+    model = model or settings.ai_model
+    tokenizer = _tokenizers.get(model)
+    if tokenizer is None:
+        with _lock:
+            tokenizer = _tokenizers.get(model)
+            if tokenizer is None:
+                tokenizer = _tokenizers[model] = Tokenizer(model, _load_encoding(model))
+    return tokenizer
+
+
+def count_tokens(texts: Sequence[str], model: Optional[str] = None) -> List[int]:
+    """Token count of each text, for budget checks before a request"""
+    return get_tokenizer(model).count_batch(texts)
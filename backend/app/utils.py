@@ -1,5 +1,5 @@
 from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import hashlib
 import secrets
 import string
@@ -58,6 +58,12 @@ def format_datetime(dt: datetime) -> str:
     """Format datetime to ISO string"""
     return dt.isoformat() if dt else None
 
+def to_utc_naive(dt: datetime) -> datetime:
+    """Convert aware datetime to naive UTC; naive values are assumed to be UTC"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
 def parse_datetime(dt_str: str) -> Optional[datetime]:
     """Parse ISO datetime string"""
     try:
@@ -119,17 +125,26 @@ def format_file_size(size_bytes: int) -> str:
     
     return f"{size_bytes:.1f} {size_names[i]}"
 
+def fold_accents(text: str) -> str:
+    """Lowercase and strip Vietnamese/Latin diacritics, one output char per input char"""
+    import unicodedata
+    
+    folded = []
+    for char in text.lower():
+        if char == 'đ':
+            folded.append('d')
+            continue
+        base = ''.join(c for c in unicodedata.normalize('NFD', char) if unicodedata.category(c) != 'Mn')
+        # Keep positions aligned with the original text (used for highlighting)
+        folded.append(base if len(base) == 1 else char)
+    return ''.join(folded)
+
 def generate_slug(text: str) -> str:
     """Generate URL-friendly slug from text"""
     import re
-    import unicodedata
-    
-    # Convert to lowercase
-    text = text.lower()
     
-    # Remove accents
-    text = unicodedata.normalize('NFD', text)
-    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    # Convert to lowercase and remove accents
+    text = fold_accents(text)
     
     # Replace spaces and special characters with hyphens
     text = re.sub(r'[^a-z0-9\s-]', '', text)
@@ -140,6 +155,15 @@ def generate_slug(text: str) -> str:
     
     return text
 
+def strip_html(html_content: str) -> str:
+    """Plain text of an HTML fragment"""
+    import re
+    from html import unescape
+    
+    text = re.sub(r'<(script|style)[^>]*>.*?</\1>', ' ', html_content, flags=re.S | re.I)
+    text = re.sub(r'<[^>]+>', ' ', text)
+    return re.sub(r'\s+', ' ', unescape(text)).strip()
+
 def truncate_text(text: str, max_length: int = 100, suffix: str = "...") -> str:
     """Truncate text to specified length"""
     if len(text) <= max_length:
@@ -147,16 +171,9 @@ def truncate_text(text: str, max_length: int = 100, suffix: str = "...") -> str:
     return text[:max_length - len(suffix)] + suffix
 
 def extract_metadata_from_url(url: str) -> Dict[str, Any]:
-    """Extract metadata from URL (mock implementation)"""
-    # TODO: Implement actual URL metadata extraction
-    return {
-        "title": "Sample Article Title",
-        "description": "Sample article description",
-        "author": "Unknown Author",
-        "published_date": "2025-01-20T10:00:00Z",
-        "image_url": None,
-        "word_count": 0
-    }
+    """Fetch URL and extract its article metadata and main text (blocking, see app/extraction.py)"""
+    from app.extraction import extract_url
+    return extract_url(url)
 
 def calculate_reading_time(word_count: int, words_per_minute: int = 200) -> int:
     """Calculate reading time in minutes"""
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-token benchmark for the AI chat
+
+Sends the same questions to /api/v1/chat/send (whole reply) and
+/api/v1/chat/send/stream (Server-Sent Events) of a running server and
+reports, for each, the time until the user sees the first text and until
+the reply is complete. Run the server against the mock LLM so the numbers
+measure the API, not the model:
+
+    python scripts/mock_llm_server.py --port 8100
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=mock uvicorn app.main:app
+
+Usage:
+    python scripts/benchmark_chat_stream.py [--requests N] [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+BASE_URL = "http://localhost:8000"
+
+QUESTION = "Tôi có những công việc nào sắp đến hạn trong tuần này?"
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    """Get access token"""
+    response = await client.post(
+        f"{BASE_URL}/api/v1/auth/login",
+        json={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def send(client: httpx.AsyncClient, headers: dict) -> tuple:
+    """Whole reply: the first text arrives with the last"""
+    started = time.perf_counter()
+    response = await client.post(f"{BASE_URL}/api/v1/chat/send", json={"message": QUESTION}, headers=headers)
+    response.raise_for_status()
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, elapsed
+
+
+async def send_stream(client: httpx.AsyncClient, headers: dict) -> tuple:
+    """Streamed reply: time to the first chat_token event and to chat_done"""
+    started = time.perf_counter()
+    first_token = None
+    event = None
+    async with client.stream("POST", f"{BASE_URL}/api/v1/chat/send/stream", json={"message": QUESTION}, headers=headers) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+                if event == "chat_token" and first_token is None:
+                    first_token = (time.perf_counter() - started) * 1000
+                elif event == "chat_error":
+                    raise RuntimeError("chat_error event")
+    return first_token, (time.perf_counter() - started) * 1000
+
+
+async def measure(name: str, call, client: httpx.AsyncClient, headers: dict, total_requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    errors = []
+
+    async def one():
+        async with semaphore:
+            try:
+                results.append(await call(client, headers))
+            except (httpx.HTTPError, RuntimeError) as e:
+                errors.append(str(e))
+
+    await asyncio.gather(*[one() for _ in range(total_requests)])
+    if not results:
+        print(f"❌ {name}: all {len(errors)} requests failed (first: {errors[0]})")
+        return
+
+    def summary(values: list) -> str:
+        values = sorted(values)
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        return f"p50={statistics.median(values):.0f} p95={p95:.0f}"
+
+    print(f"📍 {name}")
+    print(f"⏱️  First token ms: {summary([r[0] for r in results])}")
+    print(f"⏱️  Complete ms:    {summary([r[1] for r in results])}")
+    if errors:
+        print(f"❌ Errors: {len(errors)} (first: {errors[0]})")
+
+
+async def run(total_requests: int, concurrency: int, username: str, password: str):
+    async with httpx.AsyncClient(timeout=120) as client:
+        token = await login(client, username, password)
+        headers = {"Authorization": f"Bearer {token}"}
+        await measure("POST /api/v1/chat/send", send, client, headers, total_requests, concurrency)
+        await measure("POST /api/v1/chat/send/stream", send_stream, client, headers, total_requests, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocNhanh chat time-to-first-token benchmark")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args.requests, args.concurrency, args.username, args.password))
+    except httpx.HTTPError as e:
+        print(f"❌ Benchmark failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for API endpoints
+
+Fires requests with a fixed number of concurrent clients against a running
+server and reports throughput and latency percentiles. Run it once with a
+slow query in flight (e.g. a wide activity timeline) to check that other
+requests keep being served while the database is busy.
+
+Usage:
+    python scripts/benchmark_concurrency.py [path] [--concurrency N] [--requests N]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+BASE_URL = "http://localhost:8000"
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    """Get access token"""
+    response = await client.post(
+        f"{BASE_URL}/api/v1/auth/login",
+        json={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(client: httpx.AsyncClient, path: str, headers: dict, remaining: list, latencies: list, errors: list):
+    """Issue requests until the shared budget is used up"""
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"{BASE_URL}{path}", headers=headers)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run(path: str, concurrency: int, total_requests: int, username: str, password: str):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        token = await login(client, username, password)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        remaining = [total_requests]
+        latencies = []
+        errors = []
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            worker(client, path, headers, remaining, latencies, errors)
+            for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    print(f"📍 {path} — {total_requests} requests, concurrency {concurrency}")
+    print(f"✅ Throughput: {len(latencies) / elapsed:.1f} req/s ({elapsed:.2f}s total)")
+    print(f"⏱️  Latency ms: p50={percentile(0.5):.1f} p95={percentile(0.95):.1f} "
+          f"p99={percentile(0.99):.1f} mean={statistics.mean(latencies):.1f}")
+    if errors:
+        print(f"❌ Errors: {len(errors)} (first: {errors[0]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DocNhanh API concurrency benchmark")
+    parser.add_argument("path", nargs="?", default="/api/v1/tasks?limit=50")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args.path, args.concurrency, args.requests, args.username, args.password))
+    except httpx.HTTPError as e:
+        print(f"❌ Benchmark failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
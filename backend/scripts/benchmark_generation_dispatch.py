@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Bulk generation benchmark for the dispatcher (app/dispatcher.py)
+
+Starts the mock LLM (scripts/mock_llm_server.py) in process, limited to
+--max-concurrent requests in flight like a rate-limited API key, and sends
+the same bulk of generation requests twice:
+
+- naive:      every request at once, each retried on 429 after Retry-After,
+              like independent generation tasks
+- dispatcher: grouped by system prompt and paced per key by the dispatcher
+
+For each it reports the total time, the 429s the server answered, the
+most requests it saw in flight and the share of prompt tokens served from
+its (simulated) prompt cache.
+
+Usage:
+    python scripts/benchmark_generation_dispatch.py [--requests N] [--prompts N] [--max-concurrent N]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openai
+import uvicorn
+
+from app.config import settings
+from app.dispatcher import Dispatcher
+from scripts.mock_llm_server import create_app
+
+SOURCE = "Bộ Công Thương vừa công bố số liệu xuất khẩu tháng này. " * 40
+
+
+def start_server(app) -> str:
+    """Run app on a free local port in a background thread; its base URL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def bulk_requests(total: int, prompts: int) -> list:
+    """total requests spread over prompts long system prompts"""
+    system_prompts = [f"Bạn là biên tập viên số {i}. " + "Viết lại nội dung nguồn thành bài báo. " * 300 for i in range(prompts)]
+    return [
+        [
+            {"role": "system", "content": system_prompts[i % prompts]},
+            {"role": "user", "content": f"Bài {i}\n\n{SOURCE}"},
+        ]
+        for i in range(total)
+    ]
+
+
+async def naive(base_url: str, requests: list):
+    client = openai.AsyncOpenAI(api_key="mock", base_url=base_url, max_retries=0)
+
+    async def one(messages):
+        while True:
+            try:
+                return await client.chat.completions.create(model=settings.ai_model, messages=messages)
+            except openai.RateLimitError as e:
+                await asyncio.sleep(float(e.response.headers.get("retry-after", 1)))
+
+    responses = await asyncio.gather(*[one(messages) for messages in requests])
+    await client.close()
+    prompt_tokens = sum(response.usage.prompt_tokens for response in responses)
+    cached_tokens = sum((getattr(response.usage, "prompt_tokens_details", None) or {}).get("cached_tokens", 0) for response in responses)
+    return prompt_tokens, cached_tokens
+
+
+async def dispatched(base_url: str, requests: list, max_in_flight: int):
+    client = openai.AsyncOpenAI(api_key="mock", base_url=base_url, max_retries=0)
+    dispatcher = Dispatcher(keys=["mock"], clients={"mock": client}, max_in_flight=max_in_flight)
+    results = await dispatcher.run([(messages, {}) for messages in requests])
+    await dispatcher.aclose()
+    failed = [result for result in results if isinstance(result, Exception)]
+    if failed:
+        print(f"   ❌ {len(failed)} failed: {failed[0]}")
+    return dispatcher.snapshot()
+
+
+def report(name: str, app, elapsed: float, prompt_tokens: int, cached_tokens: int):
+    cached = cached_tokens / prompt_tokens if prompt_tokens else 0
+    print(f"{name:<11} {elapsed:>7.1f}s {app.state.rate_limited:>6} {app.state.max_in_flight:>10} {cached:>10.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk generation benchmark against the mock LLM")
+    parser.add_argument("--requests", type=int, default=40, help="generation requests in the bulk")
+    parser.add_argument("--prompts", type=int, default=3, help="distinct system prompts among them")
+    parser.add_argument("--max-concurrent", type=int, default=6, help="requests the mock accepts in flight")
+    parser.add_argument("--max-in-flight", type=int, default=16, help="dispatcher cap per key (it adapts below)")
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    requests = bulk_requests(args.requests, args.prompts)
+    print(f"🚀 {args.requests} requests, {args.prompts} prompts, mock accepts {args.max_concurrent} in flight")
+    print(f"{'mode':<11} {'time':>8} {'429s':>6} {'in flight':>10} {'cached':>10}")
+
+    app = create_app(args.first_token_ms, args.token_ms, 100, args.max_concurrent)
+    base_url = start_server(app)
+    started = time.perf_counter()
+    prompt_tokens, cached_tokens = asyncio.run(naive(base_url, requests))
+    report("naive", app, time.perf_counter() - started, prompt_tokens, cached_tokens)
+
+    app = create_app(args.first_token_ms, args.token_ms, 100, args.max_concurrent)
+    base_url = start_server(app)
+    started = time.perf_counter()
+    stats = asyncio.run(dispatched(base_url, requests, args.max_in_flight))
+    report("dispatcher", app, time.perf_counter() - started, stats["prompt_tokens"], stats["cached_tokens"])
+    print(f"📉 Final in-flight limit: {stats['limits']}")
+
+
+if __name__ == "__main__":
+    main()
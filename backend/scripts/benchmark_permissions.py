@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for per-request authorization overhead
+"""
+
+import sys
+import os
+import timeit
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.auth import has_permission, get_user_permissions
+
+
+class _User:
+    def __init__(self, role: str):
+        self.role = role
+
+
+def main():
+    number = 200000
+    checks = [
+        ("editor_in_chief", "giao-viec", "delete"),
+        ("reporter", "nhan-su", "view"),
+        ("department_head", "bao-cao", "export"),
+        ("secretary", "noi-dung-ai", "view"),
+    ]
+
+    elapsed = timeit.timeit(
+        lambda: [has_permission(*check) for check in checks], number=number
+    )
+    per_check_ns = elapsed / (number * len(checks)) * 1e9
+    print(f"✅ has_permission: {per_check_ns:.0f} ns/check")
+
+    user = _User("department_head")
+    elapsed = timeit.timeit(lambda: get_user_permissions(user), number=number // 10)
+    print(f"✅ get_user_permissions: {elapsed / (number // 10) * 1e6:.2f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
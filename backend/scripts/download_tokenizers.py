@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Download the BPE files of the configured AI model's tokenizer
+
+Stores them in TOKENIZER_DIR, where app/tokenizer.py reads them, so token
+counting works without network access at run time. The Docker image runs
+this at build time.
+
+Usage:
+    python scripts/download_tokenizers.py [model ...]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.tokenizer import get_tokenizer
+
+
+def main():
+    models = sys.argv[1:] or [settings.ai_model]
+    print(f"📁 Tokenizer directory: {os.path.abspath(settings.tokenizer_dir)}")
+
+    failed = False
+    for model in models:
+        tokenizer = get_tokenizer(model)
+        if tokenizer.exact:
+            print(f"✅ {model}: {tokenizer.encoding.name}")
+        else:
+            print(f"❌ {model}: no encoding loaded")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
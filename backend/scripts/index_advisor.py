@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Index advisor for API queries
+
+Calls the read endpoints in-process against the configured database,
+captures every SELECT they issue and runs EXPLAIN on it. Sequential scans
+over tables larger than --min-rows are reported together with the filter
+that caused them, so missing indexes show up before they hurt in
+production. Works on Postgres (EXPLAIN FORMAT JSON) and SQLite (EXPLAIN
+QUERY PLAN).
+
+Usage:
+    python scripts/index_advisor.py [--username admin] [--min-rows 1000] [--days 30]
+"""
+
+import argparse
+import json
+import sys
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.auth import create_access_token
+from app.database import SessionLocal, engine
+from app.main import app
+from app.models import User
+
+
+def default_endpoints(user: User, days: int) -> list:
+    """Read endpoints with the filters the frontend uses most"""
+    date_to = datetime.utcnow()
+    date_from = date_to - timedelta(days=days)
+    period = {"date_from": date_from.isoformat(), "date_to": date_to.isoformat()}
+    user_id = str(user.user_id)
+    department_id = str(user.department_id) if user.department_id else None
+
+    endpoints = [
+        ("/api/v1/tasks", {}),
+        ("/api/v1/tasks", {"status": "in_progress"}),
+        ("/api/v1/tasks", {"assignee_id": user_id}),
+        ("/api/v1/tasks", {"search": "bao cao"}),
+        ("/api/v1/tasks/stats", {}),
+        ("/api/v1/articles", {}),
+        ("/api/v1/articles", {"status": "published"}),
+        ("/api/v1/articles", {"search": "cong thuong"}),
+        ("/api/v1/scans", {}),
+        ("/api/v1/sources", {}),
+        ("/api/v1/prompts", {}),
+        ("/api/v1/users", {}),
+        ("/api/v1/users", {"search": "nguyen"}),
+        (f"/api/v1/users/{user_id}", {}),
+        ("/api/v1/notifications", {}),
+        ("/api/v1/notifications", {"unread_only": "true"}),
+        ("/api/v1/chat/sessions", {}),
+        ("/api/v1/analytics/audit-logs", {}),
+        ("/api/v1/analytics/audit-logs", {"user_id": user_id}),
+        ("/api/v1/analytics/dashboard", period),
+        ("/api/v1/analytics/usage", period),
+        ("/api/v1/analytics/activity-timeline", {**period, "group_by": "day"}),
+    ]
+    if department_id:
+        endpoints.append(("/api/v1/tasks", {"department_id": department_id}))
+        endpoints.append((f"/api/v1/departments/{department_id}", {}))
+    return endpoints
+
+
+def capture_queries(client: TestClient, headers: dict, endpoints: list) -> "OrderedDict":
+    """Map each distinct SELECT statement to (parameters, endpoint that issued it)"""
+    captured = OrderedDict()
+    current = {"endpoint": None}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and statement not in captured:
+            captured[statement] = (parameters, current["endpoint"])
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for path, params in endpoints:
+            current["endpoint"] = f"{path}?{'&'.join(f'{k}={v}' for k, v in params.items())}".rstrip("?")
+            response = client.get(path, params=params, headers=headers)
+            if response.status_code >= 400:
+                print(f"⚠️  {current['endpoint']} returned {response.status_code}")
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def _walk_plan(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk_plan(child)
+
+
+def explain_postgres(connection, statement: str, parameters, min_rows: int) -> list:
+    """Sequential scans in the Postgres plan over tables estimated above min_rows"""
+    raw = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    findings = []
+    for node in _walk_plan(plan):
+        if node["Node Type"] == "Seq Scan":
+            table = node.get("Relation Name")
+            rows = connection.exec_driver_sql(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %(name)s::regclass",
+                {"name": table}
+            ).scalar() or 0
+            if rows >= min_rows:
+                findings.append(f"Seq Scan on {table} (~{rows} rows) filter: {node.get('Filter', '-')}")
+    return findings
+
+
+def explain_sqlite(connection, statement: str, parameters, min_rows: int) -> list:
+    """Full table scans in the SQLite query plan"""
+    findings = []
+    for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all():
+        detail = row[-1]
+        if detail.startswith("SCAN ") and "USING" not in detail and "SUBQUERY" not in detail:
+            findings.append(detail)
+    return findings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report sequential scans in API queries")
+    parser.add_argument("--username", default="admin", help="User whose permissions the requests use")
+    parser.add_argument("--min-rows", type=int, default=1000, help="Ignore seq scans of smaller tables")
+    parser.add_argument("--days", type=int, default=30, help="Analytics period")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == args.username).first()
+    finally:
+        db.close()
+    if not user:
+        print(f"❌ User '{args.username}' not found")
+        sys.exit(1)
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.user_id)})}"}
+    client = TestClient(app, raise_server_exceptions=False)
+    captured = capture_queries(client, headers, default_endpoints(user, args.days))
+    print(f"📍 Captured {len(captured)} distinct queries")
+
+    explain = explain_postgres if engine.dialect.name == "postgresql" else explain_sqlite
+    flagged = 0
+    with engine.connect() as connection:
+        for statement, (parameters, endpoint) in captured.items():
+            try:
+                findings = explain(connection, statement, parameters, args.min_rows)
+            except Exception as e:
+                connection.rollback()
+                print(f"⚠️  Could not explain query from {endpoint}: {str(e).splitlines()[0]}")
+                continue
+            if findings:
+                flagged += 1
+                print(f"\n❌ {endpoint}")
+                print("   " + " ".join(statement.split())[:300])
+                for finding in findings:
+                    print(f"   → {finding}")
+
+    if flagged:
+        print(f"\n⚠️  {flagged} queries scan whole tables")
+        sys.exit(1)
+    print("✅ No sequential scans over large tables")
+
+
+if __name__ == "__main__":
+    main()
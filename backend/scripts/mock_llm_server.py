@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible chat completions server for benchmarks
+
+Answers POST /v1/chat/completions, streamed or not, with a fixed Vietnamese
+reply after a set time to first token and delay between tokens, and reports
+token usage like the real API. With --max-concurrent it answers 429 (with
+Retry-After) past that many requests in flight, like a rate-limited key, and
+a system prompt it has answered before is reported as cached prompt tokens,
+like the provider's prompt cache. Point the backend at it:
+
+    python scripts/mock_llm_server.py --port 8100 --first-token-ms 400 --token-ms 25
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=mock uvicorn app.main:app
+
+Usage:
+    python scripts/mock_llm_server.py [--port N] [--first-token-ms N] [--token-ms N] [--tokens N]
+                                      [--max-concurrent N] [--retry-after S]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY_WORDS = (
+    "Dựa trên dữ liệu hiện có, bạn có thể kiểm tra dashboard để xem tổng quan công việc, "
+    "tạo task mới cho phóng viên, xem báo cáo thống kê theo tuần và quản lý nội dung AI "
+    "trong mục bài viết. Nếu cần, tôi có thể tóm tắt các công việc đang quá hạn."
+).split(" ")
+
+
+def create_app(first_token_ms: float = 400, token_ms: float = 25, tokens: int = 60,
+               max_concurrent: int = None, retry_after: float = 1) -> FastAPI:
+    """Mock server answering every request with tokens words"""
+    app = FastAPI(title="Mock LLM")
+    words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(tokens)]
+    app.state.requests = 0
+    app.state.rate_limited = 0
+    app.state.in_flight = 0
+    app.state.max_in_flight = 0
+    app.state.cached_prefixes = set()
+
+    def message_tokens(message: dict) -> int:
+        return len(str(message.get("content", ""))) // 4 + 4
+
+    def prompt_tokens(body: dict) -> int:
+        return sum(message_tokens(m) for m in body.get("messages", []))
+
+    @app.middleware("http")
+    async def count_in_flight(request: Request, call_next):
+        if max_concurrent is not None and app.state.in_flight >= max_concurrent:
+            app.state.rate_limited += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)}
+            )
+        app.state.in_flight += 1
+        app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+        try:
+            return await call_next(request)
+        finally:
+            app.state.in_flight -= 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        messages = body.get("messages", [])
+        # Prompt cache: a system prompt answered before is billed as cached
+        prefix = messages[0]["content"] if messages and messages[0].get("role") == "system" else None
+        cached_tokens = message_tokens(messages[0]) if prefix in app.state.cached_prefixes else 0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "mock")
+        usage = {
+            "prompt_tokens": prompt_tokens(body),
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens(body) + len(words),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+
+        def chunk(delta: dict, finish_reason=None) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        if not body.get("stream"):
+            await asyncio.sleep((first_token_ms + token_ms * len(words)) / 1000)
+            if prefix is not None:
+                app.state.cached_prefixes.add(prefix)
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        async def stream():
+            await asyncio.sleep(first_token_ms / 1000)
+            yield chunk({"role": "assistant", "content": ""})
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(token_ms / 1000)
+                yield chunk({"content": word if i == 0 else " " + word})
+            yield chunk({}, "stop")
+            if prefix is not None:
+                app.state.cached_prefixes.add(prefix)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                final = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                         "model": model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--first-token-ms", type=float, default=400, help="delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=25, help="delay between tokens")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per reply")
+    parser.add_argument("--max-concurrent", type=int, default=None, help="answer 429 past this many requests in flight")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After of 429 answers, in seconds")
+    args = parser.parse_args()
+
+    print(f"🤖 Mock LLM on http://{args.host}:{args.port}/v1 "
+          f"(first token {args.first_token_ms:.0f}ms, {args.tokens} tokens every {args.token_ms:.0f}ms)")
+    if args.max_concurrent:
+        print(f"🚦 429 past {args.max_concurrent} requests in flight (Retry-After {args.retry_after:g}s)")
+    app = create_app(args.first_token_ms, args.token_ms, args.tokens, args.max_concurrent, args.retry_after)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Rebuild daily analytics rollups from raw tables
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal, engine
+from app.models import Base
+from app.rollups import rebuild_rollups
+
+
+def main():
+    """Recompute daily_rollups (initial backfill or repair)"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        written = rebuild_rollups(db)
+        print(f"✅ Rebuilt {written} rollup rows")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Rollup rebuild failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Rebuild the article full-text search index
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.search import reindex_articles
+
+
+def main():
+    """Recompute search_text/search_vector for every article (after migration 0001 or repair)"""
+    db = SessionLocal()
+    try:
+        indexed = reindex_articles(db)
+        print(f"✅ Indexed {indexed} articles")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Article reindex failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Auto-scan scheduler
+
+Queues scan jobs for sources with auto_scan enabled according to their
+scan_frequency; the scan worker (scripts/scan_worker.py) runs them. Several
+schedulers may run at once, only one queues at a time.
+
+Usage:
+    python scripts/scan_scheduler.py [--once]
+"""
+
+import argparse
+import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apscheduler.schedulers.blocking import BlockingScheduler
+from app.config import settings
+from app.database import SessionLocal
+from app.scheduler import queue_due_scans
+
+logger = logging.getLogger("scan_scheduler")
+
+
+def run_once() -> int:
+    """Queue due scans in a fresh session"""
+    db = SessionLocal()
+    try:
+        queued = queue_due_scans(db)
+        if queued:
+            logger.info("Queued %d scan jobs", queued)
+        return queued
+    except Exception:
+        db.rollback()
+        logger.exception("Queueing due scans failed")
+        return 0
+    finally:
+        db.close()
+
+
+def main():
+    """Queue due scans every SCAN_SCHEDULER_INTERVAL_SECONDS"""
+    parser = argparse.ArgumentParser(description="Queue automatic source scans")
+    parser.add_argument("--once", action="store_true", help="Queue due scans once and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.once:
+        print(f"✅ Queued {run_once()} scan jobs")
+        return
+
+    scheduler = BlockingScheduler(timezone="UTC")
+    scheduler.add_job(
+        run_once, "interval",
+        seconds=settings.scan_scheduler_interval_seconds,
+        # Replicas started together should not all wake at the same instant
+        jitter=max(1, settings.scan_scheduler_interval_seconds // 10),
+        max_instances=1,
+        coalesce=True
+    )
+    print(f"🚀 Scan scheduler started (every {settings.scan_scheduler_interval_seconds}s)")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        print("✅ Scan scheduler stopped")
+
+
+if __name__ == "__main__":
+    main()
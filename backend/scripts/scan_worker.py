@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Scan worker
+
+Runs pending scan jobs created through the API. Start one or more of these
+next to the API server; jobs are claimed with SKIP LOCKED so workers never
+pick the same job. Stops on SIGINT/SIGTERM after the running jobs finish.
+
+Usage:
+    python scripts/scan_worker.py
+"""
+
+import asyncio
+import logging
+import signal
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.scanner import run_worker
+
+
+async def run():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await run_worker(stop)
+
+
+def main():
+    """Run scan jobs until stopped"""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    print(
+        f"🚀 Scan worker started ({settings.scan_worker_concurrency} jobs, "
+        f"{settings.scan_fetch_concurrency} requests per job)"
+    )
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        print(f"❌ Scan worker stopped: {e}")
+        sys.exit(1)
+    print("✅ Scan worker stopped")
+
+
+if __name__ == "__main__":
+    main()
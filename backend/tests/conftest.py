@@ -0,0 +1,161 @@
+"""
+Shared fixtures: the API on a throwaway database, with a statement counter.
+
+Set TEST_DATABASE_URL to run against PostgreSQL (the tables are created
+and dropped); by default the tests use a temporary SQLite file, with the
+few PostgreSQL pieces the models rely on (UUID columns, date_trunc)
+provided for SQLite.
+"""
+
+import os
+import tempfile
+import uuid
+from datetime import datetime
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+SQLITE = TEST_DATABASE_URL.startswith("sqlite")
+
+if SQLITE:
+    @compiles(UUID, "sqlite")
+    def _uuid_sqlite(type_, compiler, **kw):
+        return "CHAR(32)"
+
+    _uuid_bind_processor = UUID.bind_processor
+
+    def _bind_processor(self, dialect):
+        # Ids arrive as strings from paths and tokens; PostgreSQL casts them itself
+        process = _uuid_bind_processor(self, dialect)
+        if process is None:
+            return None
+        return lambda value: process(uuid.UUID(value) if isinstance(value, str) else value)
+
+    UUID.bind_processor = _bind_processor
+
+from app.auth import create_access_token
+from app.database import Base, get_db
+from app.main import app
+from app.models import Department, User
+
+
+def _date_trunc(unit, value):
+    if value is None:
+        return None
+    moment = datetime.fromisoformat(str(value))
+    if unit == "hour":
+        moment = moment.replace(minute=0, second=0, microsecond=0)
+    else:
+        moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.isoformat(sep=" ")
+
+
+class QueryCounter:
+    """Statements sent to the database while active"""
+
+    def __init__(self):
+        self.statements = []
+        self.active = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    engine = create_engine(TEST_DATABASE_URL)
+    if SQLITE:
+        event.listen(engine, "connect", lambda conn, record: conn.create_function("date_trunc", 2, _date_trunc))
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    yield session
+    session.close()
+    # Each test starts from empty tables (users and departments reference each other)
+    with engine.begin() as conn:
+        if SQLITE:
+            for table in Base.metadata.tables.values():
+                conn.execute(table.delete())
+        else:
+            conn.execute(text(f"TRUNCATE {', '.join(Base.metadata.tables)} CASCADE"))
+
+
+@pytest.fixture
+def queries(engine):
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter)
+
+
+@pytest.fixture
+def client(engine):
+    Session = sessionmaker(bind=engine)
+
+    def override_get_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture
+def department(db):
+    department = Department(name="Thời sự")
+    db.add(department)
+    db.commit()
+    return department
+
+
+@pytest.fixture
+def admin(db, department):
+    user = User(
+        username="admin",
+        email="admin@example.vn",
+        full_name="Admin",
+        password_hash="x",
+        role="admin",
+        position="Tổng biên tập",
+        department_id=department.id
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def auth_headers(admin):
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(admin.user_id)})}"}
@@ -0,0 +1,143 @@
+"""
+Chat turns: no database connection is held while the model answers, and
+a long session keeps a flat prompt by folding its oldest messages into
+the summary.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, select
+
+from app import assistant, database
+from app.models import ChatMessage, ChatSession, UsageTracking
+from app.routers import chat
+
+
+@pytest.fixture
+def checked_out(engine):
+    """Connections of the async engine currently checked out of its pool"""
+    async_engine = database.get_async_engine()
+    count = [0]
+
+    def checkout(*args):
+        count[0] += 1
+
+    def checkin(*args):
+        count[0] -= 1
+
+    event.listen(async_engine.sync_engine, "checkout", checkout)
+    event.listen(async_engine.sync_engine, "checkin", checkin)
+    yield count
+    event.remove(async_engine.sync_engine, "checkout", checkout)
+    event.remove(async_engine.sync_engine, "checkin", checkin)
+
+
+def test_send_releases_the_connection_during_the_model_call(client, db, auth_headers, checked_out, monkeypatch):
+    during_call = []
+
+    async def get_ai_response(messages):
+        during_call.append(checked_out[0])
+        return {"content": "Đã nhận câu hỏi.", "prompt_tokens": 12, "completion_tokens": 4, "counted_by": "api"}
+
+    monkeypatch.setattr(chat, "get_ai_response", get_ai_response)
+    response = client.post("/api/v1/chat/send", json={"message": "Có bao nhiêu việc quá hạn?"}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert during_call == [0]
+    assert checked_out[0] == 0
+    assert response.json()["ai_response"]["content"] == "Đã nhận câu hỏi."
+    messages = db.execute(select(ChatMessage.type).order_by(ChatMessage.timestamp)).scalars().all()
+    assert sorted(messages) == ["ai", "user"]
+    assert db.query(UsageTracking).filter(UsageTracking.action == "ai_chat").count() == 1
+
+
+STARTED = datetime(2026, 1, 5, 8, 0)
+
+
+def _folded(request: str) -> list:
+    """Message contents in the transcript of a summary request, in order"""
+    transcript = request.split("Tin nhắn mới:\n" if "Tin nhắn mới:" in request else "Tin nhắn:\n", 1)[1]
+    return [line.split(": ", 1)[1] for line in transcript.split("\n\n")]
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    """Small context budget; the summary model's requests, answered with a short summary"""
+    monkeypatch.setattr(assistant.settings, "chat_context_tokens", 300)
+    monkeypatch.setattr(assistant.settings, "chat_history_max_messages", 12)
+    requests = []
+
+    async def complete_chat(messages, **options):
+        requests.append(messages[1]["content"])
+        return {"content": f"Tóm tắt lần {len(requests)}.", "prompt_tokens": 50, "completion_tokens": 5, "finish_reason": "stop"}
+
+    monkeypatch.setattr(assistant, "complete_chat", complete_chat)
+    return requests
+
+
+@pytest.fixture
+def conversation(db, admin):
+    """Chat session and a function adding a message to it, one second after the previous one"""
+    session = ChatSession(user_id=admin.user_id, title="Dài")
+    db.add(session)
+    db.commit()
+    contents = []
+
+    def add(kind, content):
+        # Explicit timestamps: SQLite's now() has one-second resolution
+        message = ChatMessage(session_id=session.session_id, type=kind, content=content,
+                              timestamp=STARTED + timedelta(seconds=len(contents)))
+        contents.append(content)
+        db.add(message)
+        db.commit()
+        return message
+
+    add.session = session
+    add.contents = contents
+    return add
+
+
+def test_refresh_summary_folds_the_oldest_backlog_first(db, summaries, conversation):
+    # More unsummarized messages than one refresh reads
+    for i in range(30):
+        conversation("user" if i % 2 == 0 else "ai", f"Tin số {i}: " + "tình hình xuất khẩu " * 6)
+
+    assert asyncio.run(assistant.refresh_summary(conversation.session.session_id))
+
+    assert _folded(summaries[0]) == conversation.contents[:12]
+    db.refresh(conversation.session)
+    assert conversation.session.summary_through == STARTED + timedelta(seconds=11)
+
+
+def test_long_session_keeps_the_context_flat(db, summaries, conversation):
+    async def build_context(turn):
+        async with database.get_async_session() as async_db:
+            return await assistant.build_context(async_db, turn)
+
+    tokenizer = assistant.get_tokenizer()
+    prompt_tokens = []
+    for i in range(40):
+        turn = conversation("user", f"Câu hỏi số {i}: " + "tình hình xuất khẩu " * 6)
+        context = asyncio.run(build_context(turn))
+        prompt_tokens.append(tokenizer.count_messages(context["messages"]))
+        conversation("ai", f"Trả lời số {i}: " + "số liệu tăng đều " * 6)
+        if context["summarize"]:
+            asyncio.run(assistant.refresh_summary(conversation.session.session_id))
+
+    # Folded oldest first, each message once, with no gaps
+    folded = [content for request in summaries for content in _folded(request)]
+    assert summaries and folded == conversation.contents[:len(folded)]
+    db.refresh(conversation.session)
+    assert conversation.session.summary == f"Tóm tắt lần {len(summaries)}."
+    assert conversation.session.summary_through == STARTED + timedelta(seconds=len(folded) - 1)
+
+    # Summary plus the newest messages stay within the budget however long the session gets
+    overhead = tokenizer.count_messages([
+        {"role": "system", "content": assistant.SYSTEM_PROMPT},
+        {"role": "system", "content": assistant.SUMMARY_HEADING},
+        {"role": "user", "content": conversation.contents[-2]},
+    ])
+    assert max(prompt_tokens) <= overhead + 300
+    assert max(prompt_tokens[20:]) <= max(prompt_tokens[:20])
@@ -0,0 +1,67 @@
+"""
+URL normalization, SimHash bands and the duplicate lookup over them.
+"""
+
+from app import dedup
+from app.dedup import find_duplicate, hamming_distance, normalize_url, remember, simhash, simhash_bands
+
+TEXT = " ".join(f"Bộ Công Thương công bố kim ngạch xuất khẩu tháng {i} tăng so với cùng kỳ năm trước." for i in range(1, 13))
+
+
+def _flip(fingerprint: int, *bits: int) -> int:
+    """fingerprint with the given bits flipped, signed as stored"""
+    value = dedup._to_unsigned(fingerprint)
+    for bit in bits:
+        value ^= 1 << bit
+    return dedup._to_signed(value)
+
+
+def test_normalize_url_ignores_presentation_differences():
+    canonical = normalize_url("https://congthuong.vn/xuat-khau?id=5&trang=2")
+
+    assert normalize_url("http://www.congthuong.vn/xuat-khau/?trang=2&id=5#binh-luan") == canonical
+    assert normalize_url("https://CongThuong.vn:443/xuat-khau?utm_source=fb&id=5&fbclid=abc&trang=2") == canonical
+    assert normalize_url("http://congthuong.vn:80//xuat-khau?zarsrc=30&id=5&trang=2") == canonical
+    assert normalize_url("https://congthuong.vn:8443/xuat-khau?id=5&trang=2") != canonical
+    assert normalize_url("https://congthuong.vn/xuat-khau?id=6&trang=2") != canonical
+
+
+def test_bands_round_trip_signed_fingerprints():
+    for fingerprint in (simhash(TEXT), -1, -(1 << 63), (1 << 63) - 1, 0x1234):
+        bands = simhash_bands(fingerprint)
+        assert all(0 <= band < 1 << dedup.BAND_BITS for band in bands)
+        unsigned = sum(band << (dedup.BAND_BITS * i) for i, band in enumerate(bands))
+        assert dedup._to_signed(unsigned) == fingerprint
+
+
+def test_near_duplicate_is_found_through_a_band(db):
+    fingerprint = simhash(TEXT)
+    original = remember(db, "https://congthuong.vn/bai-goc", fingerprint)
+    # Three bits apart, one in each of three bands: only the fourth band still matches
+    near = _flip(fingerprint, 3, 20, 40)
+    far = _flip(fingerprint, 3, 20, 40, 60)
+
+    assert hamming_distance(near, fingerprint) == 3
+    assert find_duplicate(db, "https://baomoi.vn/dang-lai", near) is original
+    assert find_duplicate(db, "https://baomoi.vn/dang-lai", far) is None
+
+
+def test_changed_page_at_the_same_url_is_not_a_duplicate(db):
+    fingerprint = simhash(TEXT)
+    remember(db, "https://congthuong.vn/bai-goc", fingerprint)
+    rewritten = simhash(TEXT.replace("tăng", "giảm mạnh"))
+
+    assert hamming_distance(rewritten, fingerprint) > dedup.NEAR_DUPLICATE_DISTANCE
+    assert find_duplicate(db, "https://congthuong.vn/bai-goc", rewritten) is None
+    assert find_duplicate(db, "https://www.congthuong.vn/bai-goc/", fingerprint) is not None
+
+
+def test_exact_url_is_kept_ahead_of_the_candidate_cap(db):
+    fingerprint = simhash(TEXT)
+    # More band candidates than the lookup reads, all sharing band 0 but too far to count
+    for i in range(60):
+        remember(db, f"https://congthuong.vn/lien-quan/{i}", _flip(fingerprint, *range(16, 26)))
+    # Written last: a bitmap OR scan (PostgreSQL) returns rows in table order, after all the candidates
+    own = remember(db, "https://congthuong.vn/bai-goc", fingerprint)
+
+    assert find_duplicate(db, "https://congthuong.vn/bai-goc", fingerprint) is own
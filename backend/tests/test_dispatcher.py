@@ -0,0 +1,129 @@
+"""
+Dispatcher pacing with fake API clients: the per-key AIMD limit, pauses
+on 429, the batch deadline and the prompt cache warm-up.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.config import settings
+from app.dispatcher import Dispatcher, KeyLimit
+
+
+def _response(content: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+        usage=SimpleNamespace(prompt_tokens=100, completion_tokens=10, prompt_tokens_details={"cached_tokens": 0}),
+    )
+
+
+def _rate_limited(retry_after: str) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+class FakeClient:
+    """AsyncOpenAI stand-in: answers after delay seconds (requests marked slow never answer)"""
+
+    def __init__(self, delay: float = 0.0, rate_limits: int = 0, retry_after: str = "0.2"):
+        self.delay = delay
+        self.rate_limits = rate_limits
+        self.retry_after = retry_after
+        self.events = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **options):
+        name = messages[-1]["content"]
+        self.events.append(("start", name, time.monotonic()))
+        if self.rate_limits:
+            self.rate_limits -= 1
+            raise _rate_limited(self.retry_after)
+        await asyncio.sleep(3600 if name.startswith("chậm") else self.delay)
+        self.events.append(("end", name, time.monotonic()))
+        return _response(f"Bài viết: {name}")
+
+    async def close(self):
+        pass
+
+
+def _request(system: str, name: str) -> tuple:
+    return [{"role": "system", "content": system}, {"role": "user", "content": name}], {}
+
+
+def test_rate_limit_halves_the_limit_and_pauses_for_retry_after():
+    key = KeyLimit("sk-test", max_in_flight=16, target_latency=5.0)
+    assert key.limit == 8
+
+    key.on_rate_limited(2.0)
+
+    now = time.monotonic()
+    assert key.limit == 4 and key.rate_limited == 1
+    assert not key.ready(now)
+    assert key.ready(now + 2.1)
+
+
+def test_rate_limited_request_is_retried_after_the_pause():
+    client = FakeClient(rate_limits=1, retry_after="0.2")
+    dispatcher = Dispatcher(keys=["sk-test"], clients={"sk-test": client}, max_in_flight=16)
+
+    started = time.monotonic()
+    result = asyncio.run(dispatcher.complete([{"role": "user", "content": "bài 1"}]))
+
+    assert result["content"] == "Bài viết: bài 1"
+    starts = [at for kind, _, at in client.events if kind == "start"]
+    assert len(starts) == 2 and starts[1] - starts[0] >= 0.2
+    assert time.monotonic() - started >= 0.2
+    assert dispatcher.stats["rate_limited"] == 1
+    # Halved from 8, then one fast response: 4 + 1/4
+    assert dispatcher.keys[0].limit == pytest.approx(4.25)
+
+
+def test_limit_grows_to_max_in_flight_and_shrinks_when_slow():
+    key = KeyLimit("sk-test", max_in_flight=4, target_latency=5.0)
+
+    for _ in range(50):
+        key.on_success(0.1)
+    assert key.limit == 4 and key.capacity == 4
+
+    key.on_success(10.0)
+    assert key.limit == pytest.approx(3.6)
+    assert key.capacity == 3
+
+
+def test_unanswered_requests_time_out_at_the_deadline():
+    client = FakeClient(delay=0.01)
+    dispatcher = Dispatcher(keys=["sk-test"], clients={"sk-test": client}, max_in_flight=8)
+    requests = [_request("Biên tập viên", name) for name in ("bài 1", "chậm 2", "bài 3", "chậm 4")]
+
+    started = time.monotonic()
+    results = asyncio.run(dispatcher.run(requests, timeout=0.3))
+
+    assert time.monotonic() - started < 2
+    assert [result["content"] for result in (results[0], results[2])] == ["Bài viết: bài 1", "Bài viết: bài 3"]
+    assert all(isinstance(result, asyncio.TimeoutError) for result in (results[1], results[3]))
+    # Cancelled requests gave their slots back
+    assert dispatcher.keys[0].in_flight == 0
+
+
+def test_first_request_of_a_shared_prompt_goes_alone(monkeypatch):
+    monkeypatch.setattr(settings, "generation_prefix_cache_min_tokens", 10)
+    client = FakeClient(delay=0.05)
+    dispatcher = Dispatcher(keys=["sk-test"], clients={"sk-test": client}, max_in_flight=16)
+    system = "Bạn là biên tập viên. " + "Viết lại nội dung nguồn thành bài báo. " * 20
+    requests = [_request(system, f"bài {i}") for i in range(5)] + [_request("Ngắn", "ngắn 1"), _request("Ngắn", "ngắn 2")]
+
+    results = asyncio.run(dispatcher.run(requests))
+
+    assert all(isinstance(result, dict) for result in results)
+    events = [(kind, name) for kind, name, _ in client.events if name.startswith("bài")]
+    assert events[:2] == [("start", "bài 0"), ("end", "bài 0")]
+    assert sorted(events[2:6]) == [("start", f"bài {i}") for i in range(1, 5)]
+    # Below the cache threshold the group fans out at once
+    short = [kind for kind, name, _ in client.events if name.startswith("ngắn")]
+    assert short[:2] == ["start", "start"]
@@ -0,0 +1,59 @@
+"""
+Source page of an article without a stored scan copy: fetched and parsed
+in the task's own process, never through the extraction process pool
+(a prefork Celery worker child cannot start one).
+"""
+
+import httpx
+import pytest
+
+from app import crawler, extraction
+from app.generation import GenerationError, _source_page
+from app.models import Article
+
+PAGE = f"""<html><head><title>Xuất khẩu tăng mạnh</title></head><body><article>
+<h1>Xuất khẩu tăng mạnh</h1>
+<p>{"Bộ Công Thương vừa công bố số liệu xuất khẩu tháng này. " * 10}</p>
+<p>{"Kim ngạch tăng so với cùng kỳ năm trước. " * 10}</p>
+</article></body></html>"""
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/robots.txt":
+        return httpx.Response(404)
+    if request.url.path == "/bai-viet":
+        return httpx.Response(200, text=PAGE, headers={"content-type": "text/html; charset=utf-8"})
+    return httpx.Response(404)
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    class OfflineCrawler(crawler.Crawler):
+        def __init__(self, transport=None, respect_robots=None):
+            super().__init__(transport=httpx.MockTransport(_handler), respect_robots=respect_robots)
+
+    def no_pool():
+        raise AssertionError("daemonic processes are not allowed to have children")
+
+    monkeypatch.setattr(crawler, "Crawler", OfflineCrawler)
+    monkeypatch.setattr(extraction, "get_pool", no_pool)
+
+
+def _article(db, admin, url):
+    article = Article(title="Bài nhập tay", source_url=url, created_by_id=admin.user_id)
+    db.add(article)
+    db.commit()
+    return article
+
+
+def test_article_without_scan_item_is_fetched_and_parsed(db, admin):
+    source = _source_page(db, _article(db, admin, "https://tin.example.vn/bai-viet"))
+
+    assert source["title"] == "Xuất khẩu tăng mạnh"
+    assert "Kim ngạch tăng" in source["text"]
+    assert source["truncated"] is False
+
+
+def test_missing_page_fails_the_job(db, admin):
+    with pytest.raises(GenerationError):
+        _source_page(db, _article(db, admin, "https://tin.example.vn/khong-co"))
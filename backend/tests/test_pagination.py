@@ -0,0 +1,87 @@
+"""
+Keyset pagination: cursors over equal sort keys, the last page, and
+cursors the client got wrong.
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Department
+from app.pagination import decode_cursor, encode_cursor, paginate
+
+STARTED = datetime(2026, 1, 5, 8, 0)
+SORT_KEY = (Department.created_at, Department.id)
+
+
+def _departments(db, offsets):
+    """Departments created offsets seconds after STARTED (repeats share a timestamp)"""
+    departments = [
+        Department(name=f"Ban {i}", created_at=STARTED + timedelta(seconds=offset))
+        for i, offset in enumerate(offsets)
+    ]
+    db.add_all(departments)
+    db.commit()
+    return sorted(departments, key=lambda department: (department.created_at, department.id), reverse=True)
+
+
+def _pages(db, limit):
+    pages, after = [], None
+    while True:
+        page = paginate(db.query(Department), SORT_KEY, limit, after=after)
+        pages.append(page)
+        if not page["has_more"]:
+            return pages
+        after = page["next_cursor"]
+
+
+def test_equal_sort_keys_are_neither_skipped_nor_repeated(db):
+    expected = _departments(db, [0, 0, 0, 0, 1, 1, 2, -1, 0])
+
+    pages = _pages(db, 2)
+
+    assert [len(page["rows"]) for page in pages] == [2, 2, 2, 2, 1]
+    assert [row.id for page in pages for row in page["rows"]] == [department.id for department in expected]
+
+
+def test_last_page_has_no_cursor(db):
+    _departments(db, range(6))
+
+    first, last = _pages(db, 3)
+
+    assert first["has_more"] and first["next_cursor"] is not None
+    assert first["total"] == 6
+    assert len(last["rows"]) == 3
+    assert last["has_more"] is False and last["next_cursor"] is None
+    # Later pages skip the count unless asked
+    assert last["total"] is None
+
+
+def test_cursor_round_trip(db):
+    department, = _departments(db, [0])
+
+    values = decode_cursor(encode_cursor([department.created_at, department.id]), SORT_KEY)
+
+    assert values == [department.created_at, department.id]
+
+
+def _cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("after", [
+    "không-phải-cursor",
+    "%%%",
+    _cursor({"created_at": "2026-01-05"}),
+    _cursor(["2026-01-05T08:00:00"]),
+    _cursor(["hôm qua", "7d2c1f0e-6a51-4c47-9b7a-3f1e2d4c5b6a"]),
+    _cursor(["2026-01-05T08:00:00", "không-phải-uuid"]),
+    _cursor(["2026-01-05T08:00:00", 42]),
+])
+def test_malformed_cursor_is_a_bad_request(client, auth_headers, after):
+    response = client.get("/api/v1/departments", params={"after": after}, headers=auth_headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor"
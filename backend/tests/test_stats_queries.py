@@ -0,0 +1,88 @@
+"""Stats endpoints: every count, sum and bucket comes from one statement"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import Article, Notification, ScanJob, Task
+
+
+def _stats(client, headers, queries, path, **params):
+    # Warm the authenticated-user cache so only the aggregate is counted
+    client.get(path, params=params, headers=headers)
+    with queries:
+        response = client.get(path, params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json(), queries.count
+
+
+def test_task_stats_single_statement(client, db, admin, department, auth_headers, queries):
+    now = datetime.utcnow()
+    db.add_all([
+        Task(title=f"Task {i}", description="Mô tả", assignee_id=admin.user_id, department_id=department.id,
+             created_by_id=admin.user_id, status=status, priority=priority, due_date=now + timedelta(days=days))
+        for i, (status, priority, days) in enumerate([
+            ("todo", "low", -1), ("in_progress", "high", 3), ("completed", "urgent", -2), ("blocked", "medium", 10)
+        ])
+    ])
+    db.commit()
+
+    stats, count = _stats(client, auth_headers, queries, "/api/v1/tasks/stats", department_id=str(department.id))
+
+    assert count == 1
+    assert stats["total"] == 4
+    assert stats["overdue"] == 1
+    assert stats["due_this_week"] == 1
+    assert stats["by_status"] == {"todo": 1, "in_progress": 1, "completed": 1, "blocked": 1}
+    assert stats["by_priority"] == {"low": 1, "medium": 1, "high": 1, "urgent": 1}
+    assert stats["completion_rate"] == 25.0
+
+
+def test_article_stats_single_statement(client, db, admin, auth_headers, queries):
+    db.add_all([
+        Article(title="A", status="draft", word_count=300, created_by_id=admin.user_id),
+        Article(title="B", status="published", word_count=500, created_by_id=admin.user_id),
+        Article(title="C", status="processing", word_count=0, created_by_id=admin.user_id),
+    ])
+    db.commit()
+
+    stats, count = _stats(client, auth_headers, queries, "/api/v1/articles/stats", created_by_id=str(admin.user_id))
+
+    assert count == 1
+    assert stats["total"] == 3
+    assert stats["by_status"] == {"draft": 1, "processing": 1, "published": 1}
+    assert stats["total_words"] == 800
+    assert stats["avg_words"] == pytest.approx(266.67)
+
+
+def test_scan_stats_single_statement(client, db, admin, auth_headers, queries):
+    db.add_all([
+        ScanJob(source_name="S", source_url="https://example.vn", created_by_id=admin.user_id,
+                status=status, items_found=found, items_processed=processed)
+        for status, found, processed in [("completed", 10, 8), ("failed", 4, 0), ("pending", 0, 0)]
+    ])
+    db.commit()
+
+    stats, count = _stats(client, auth_headers, queries, "/api/v1/scans/stats")
+
+    assert count == 1
+    assert stats["total"] == 3
+    assert stats["by_status"] == {"pending": 1, "running": 0, "completed": 1, "failed": 1}
+    assert stats["total_items_found"] == 14
+    assert stats["total_items_processed"] == 8
+    assert stats["success_rate"] == pytest.approx(33.33)
+
+
+def test_notification_stats_single_statement(client, db, admin, auth_headers, queries):
+    db.add_all([
+        Notification(user_id=admin.user_id, type=kind, title="T", message="M", is_read=read)
+        for kind, read in [("task_assigned", False), ("task_assigned", True), ("mention", False)]
+    ])
+    db.commit()
+
+    stats, count = _stats(client, auth_headers, queries, "/api/v1/notifications/stats")
+
+    assert count == 1
+    assert stats["total"] == 3
+    assert stats["unread"] == 2
+    assert stats["by_type"] == {"task_assigned": 2, "task_completed": 0, "article_published": 0, "mention": 1}
@@ -0,0 +1,70 @@
+"""Query budget of the task list: related rows load with the page, not per task"""
+
+from datetime import datetime, timedelta
+
+from app.models import Task, User
+
+
+def _seed_tasks(db, admin, department, count):
+    reporters = [
+        User(
+            username=f"reporter{i}",
+            email=f"reporter{i}@example.vn",
+            full_name=f"Phóng viên {i}",
+            password_hash="x",
+            role="reporter",
+            position="Phóng viên",
+            department_id=department.id
+        )
+        for i in range(5)
+    ]
+    db.add_all(reporters)
+    db.flush()
+    db.add_all([
+        Task(
+            title=f"Task {i}",
+            description="Mô tả",
+            assignee_id=reporters[i % 5].user_id,
+            department_id=department.id,
+            due_date=datetime.utcnow() + timedelta(days=i),
+            created_by_id=admin.user_id,
+            reviewer_id=admin.user_id if i % 2 else None,
+            status="todo",
+            priority="medium"
+        )
+        for i in range(count)
+    ])
+    db.commit()
+
+
+def _list_tasks(client, headers, queries, limit):
+    # Warm the authenticated-user cache so only the listing is counted
+    client.get("/api/v1/tasks", params={"limit": 1}, headers=headers)
+    with queries:
+        response = client.get("/api/v1/tasks", params={"limit": limit}, headers=headers)
+    assert response.status_code == 200
+    return response.json(), queries.count
+
+
+def test_task_list_query_count_does_not_grow_with_page_size(client, db, admin, department, auth_headers, queries):
+    _seed_tasks(db, admin, department, 40)
+
+    small, small_count = _list_tasks(client, auth_headers, queries, 1)
+    large, large_count = _list_tasks(client, auth_headers, queries, 40)
+
+    assert len(small["items"]) == 1
+    assert len(large["items"]) == 40
+    assert large_count == small_count
+    assert large_count <= 3
+
+
+def test_task_list_serializes_related_names(client, db, admin, department, auth_headers, queries):
+    _seed_tasks(db, admin, department, 4)
+
+    body, _ = _list_tasks(client, auth_headers, queries, 10)
+
+    names = {item["assignee_name"] for item in body["items"]}
+    assert names == {"Phóng viên 0", "Phóng viên 1", "Phóng viên 2", "Phóng viên 3"}
+    assert {item["department_name"] for item in body["items"]} == {"Thời sự"}
+    assert {item["created_by_name"] for item in body["items"]} == {"Admin"}
+    assert {item["reviewer_name"] for item in body["items"]} == {None, "Admin"}